@@ -1,11 +1,19 @@
+import os
+import threading
 from textwrap import dedent
 import flask
 import dash
-from dash import html, dcc
+from dash import html, dcc, dash_table
 from dash.dependencies import Input, Output
-import plotly.express as px
+import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 
+from src.comparables import ComparablesIndex
+from src.data_provider import DataProvider
+from src.figure_cache import FigureCache, get_data_version
+from src.pricing import PricingEngine
+from src.text_index import TextIndex
 from src.config.app_template import (
     row_heights,
     template
@@ -28,10 +36,180 @@ def blank_fig(height):
         },
     }
 
-# Read data and extract the list of brands
+# Figures only depend on (brand, data version): cache them, on disk when
+# FIGURE_CACHE_DIR is set so that gunicorn workers share them
+figure_cache = FigureCache(
+    max_size=int(os.environ.get("FIGURE_CACHE_SIZE", 256)),
+    cache_dir=os.environ.get("FIGURE_CACHE_DIR"),
+)
+n_warmup_brands = int(os.environ.get("FIGURE_CACHE_WARMUP", 0))
+
+
+def on_data_load(snapshot):
+    figure_cache.set_version(snapshot.version)
+    if n_warmup_brands:
+        threading.Thread(
+            target=warm_up_figures, args=(snapshot,), daemon=True
+        ).start()
+
+
+# Data is read on the first request and reloaded when the file changes
 DATA_PATH = "data/preprocessed/pages_data.parquet.gz"
-df = pd.read_parquet(DATA_PATH)
-brand_list = df["brand"].unique()
+data_provider = DataProvider(
+    DATA_PATH,
+    poll_interval=int(os.environ.get("DATA_POLL_INTERVAL", 30)),
+    on_load=on_data_load,
+    ipc_dir=os.environ.get("DATA_IPC_DIR"),
+    rollups_path="data/preprocessed/pages_daily_rollups.parquet",
+)
+
+
+def get_default_date_range(rollups, duration=30):
+    """Last duration days of data, as the date strings of the date range selector"""
+    if pd.isna(rollups.max_day):
+        return None, None
+    start_date = rollups.max_day - pd.Timedelta(days=duration - 1)
+    return start_date.strftime("%Y-%m-%d"), rollups.max_day.strftime("%Y-%m-%d")
+
+
+@server.route("/health")
+def health():
+    return flask.jsonify(data_provider.health())
+
+
+@server.route("/cache-stats")
+def cache_stats():
+    return flask.jsonify(figure_cache.stats())
+
+
+# Pricing engine fitted on the preprocessed data, loaded on the first call and
+# refitted (or reloaded from a worker that refitted it) when the data changes
+ADS_DATA_PATH = "data/preprocessed/ads_data.parquet.gz"
+PRICING_ENGINE_PATH = "data/models/pricing_engine.pkl"
+pricing_engine = None
+pricing_engine_lock = threading.Lock()
+
+
+def get_source_version():
+    """Version of the preprocessed pages and ads the models are built from"""
+    return "{}:{}".format(get_data_version(DATA_PATH), get_data_version(ADS_DATA_PATH))
+
+
+def get_pricing_engine():
+    global pricing_engine
+    version = get_source_version()
+    if pricing_engine is None or pricing_engine.source_version != version:
+        with pricing_engine_lock:
+            if pricing_engine is None or pricing_engine.source_version != version:
+                pricing_engine = PricingEngine.load_or_fit(
+                    PRICING_ENGINE_PATH, DATA_PATH, ADS_DATA_PATH, version
+                )
+    return pricing_engine
+
+
+@server.route("/predict", methods=["POST"])
+def predict():
+    """Predicted prices of a JSON list of listings (or {"listings": [...]})"""
+    listings = flask.request.get_json(force=True, silent=True)
+    if isinstance(listings, dict):
+        listings = listings.get("listings")
+    if not isinstance(listings, list) or not all(
+        isinstance(listing, dict) for listing in listings
+    ):
+        return flask.jsonify({"error": "expected a list of listings"}), 400
+    if not listings:
+        return flask.jsonify({"prices": []})
+
+    prices = get_pricing_engine().predict(listings)
+    return flask.jsonify({"prices": [round(float(price), 2) for price in prices]})
+
+
+# Comparable listings index, brought up to date (changed partitions only) when
+# the preprocessed data changes
+COMPARABLES_INDEX_PATH = "data/models/comparables_index.pkl"
+comparables_index = None
+comparables_index_lock = threading.Lock()
+
+
+def get_comparables_index():
+    global comparables_index
+    version = get_source_version()
+    if comparables_index is None or comparables_index.source_version != version:
+        with comparables_index_lock:
+            if comparables_index is None or comparables_index.source_version != version:
+                comparables_index = ComparablesIndex.load_or_build(
+                    COMPARABLES_INDEX_PATH, DATA_PATH, ADS_DATA_PATH, version
+                )
+    return comparables_index
+
+
+@server.route("/comparables", methods=["POST"])
+def comparables():
+    """k nearest comparable listings of a JSON listing, with their price quantiles"""
+    listing = flask.request.get_json(force=True, silent=True)
+    if not isinstance(listing, dict):
+        return flask.jsonify({"error": "expected a listing"}), 400
+    k = flask.request.args.get("k", 10, type=int)
+    if k < 1:
+        return flask.jsonify({"error": "k must be at least 1"}), 400
+    return flask.jsonify(get_comparables_index().query(listing, k))
+
+
+# Ads keyword search: inverted index saved by the ads preprocessing, loaded with
+# the ads it points to on the first search and reloaded when the ads or the index
+# change
+TEXT_INDEX_PATH = "data/preprocessed/ads_text_index.npz"
+SEARCH_RESULT_COLS = ["ad_title", "brand", "size", "condition", "view_count"]
+search_data = None
+search_data_lock = threading.Lock()
+
+
+def get_search_version():
+    version = get_data_version(ADS_DATA_PATH)
+    if os.path.exists(TEXT_INDEX_PATH):
+        version = "{}:{}".format(version, get_data_version(TEXT_INDEX_PATH))
+    return version
+
+
+def get_text_index(ads_df):
+    """Saved text index of the ads, rebuilt when it does not index these ads
+    (saved from another version of the ads, or in another order)
+    """
+    if os.path.exists(TEXT_INDEX_PATH):
+        text_index = TextIndex.load(TEXT_INDEX_PATH)
+        ad_ids = ads_df["ad_id"].astype(str).to_numpy(dtype=str)
+        if np.array_equal(text_index.ad_ids, ad_ids):
+            return text_index
+    return TextIndex.build(ads_df)
+
+
+def get_search_data():
+    global search_data
+    version = get_search_version()
+    if search_data is None or search_data["version"] != version:
+        with search_data_lock:
+            if search_data is None or search_data["version"] != version:
+                ads_df = pd.read_parquet(
+                    ADS_DATA_PATH, columns=["ad_id", "ad_description"] + SEARCH_RESULT_COLS
+                )
+                text_index = get_text_index(ads_df)
+                brand_codes, brands = pd.factorize(ads_df["brand"])
+                search_data = {
+                    "version": version,
+                    "text_index": text_index,
+                    "results_df": ads_df[SEARCH_RESULT_COLS],
+                    "brand_codes": brand_codes,
+                    "brands": list(map(str, brands)),
+                    "brand_masks": {},
+                }
+    return search_data
+
+
+def get_brand_mask(data, brand):
+    if brand not in data["brand_masks"]:
+        code = data["brands"].index(brand) if brand in data["brands"] else -2
+        data["brand_masks"][brand] = data["brand_codes"] == code
+    return data["brand_masks"][brand]
 
 # Overlay for a plot pannel
 def build_modal_info_overlay(id, side, content):
@@ -74,258 +252,321 @@ def build_modal_info_overlay(id, side, content):
 
 # Build Dash layout
 app = dash.Dash(__name__, server=server)
-app.layout = html.Div(
-    children=[
-        html.Div(
-            [
-                html.H1(
-                    children=[
-                        "Vinted Dashboard",
-                        html.A(
-                            html.Img(
-                                src="assets/Vinted_logo.png",
-                                style={"float": "right", "height": "50px"},
+
+
+def serve_layout():
+    """Layout built on every page load so that the brand list follows data reloads
+    Outside of a request (layout validation at startup) the data is not loaded
+    """
+    if flask.has_request_context():
+        snapshot = data_provider.get()
+        brand_list = snapshot.brand_index.brands
+        min_day, max_day = snapshot.rollups.min_day, snapshot.rollups.max_day
+        start_date, end_date = get_default_date_range(snapshot.rollups)
+    else:
+        brand_list = []
+        min_day = max_day = start_date = end_date = None
+
+    return html.Div(
+        children=[
+            html.Div(
+                [
+                    html.H1(
+                        children=[
+                            "Vinted Dashboard",
+                            html.A(
+                                html.Img(
+                                    src="assets/Vinted_logo.png",
+                                    style={"float": "right", "height": "50px"},
+                                ),
+                                href="https://dash.plot.ly/",
                             ),
-                            href="https://dash.plot.ly/",
+                        ],
+                        style={"text-align": "left"},
+                    ),
+                ]
+            ),
+            html.Div(
+                children=[
+                    build_modal_info_overlay(
+                        "user-selectors",
+                        "bottom",
+                        dedent(
+                            """
+                The _**Filters** panel displays user filters such as the brand or catalog.
+                """
                         ),
-                    ],
-                    style={"text-align": "left"},
-                ),
-            ]
-        ),
-        html.Div(
-            children=[
-                build_modal_info_overlay(
-                    "user-selectors",
-                    "bottom",
-                    dedent(
-                        """
-            The _**Filters** panel displays user filters such as the brand or catalog.
-            """
                     ),
-                ),
-                build_modal_info_overlay(
-                    "scraping-indicator",
-                    "bottom",
-                    dedent(
-                        """
-            The _**Scraped Ads**_ panel displays the number of ads that were scraped
-            in that category.
+                    build_modal_info_overlay(
+                        "scraping-indicator",
+                        "bottom",
+                        dedent(
+                            """
+                The _**Scraped Ads**_ panel displays the number of ads that were scraped
+                in that category.
+                """
+                        ),
+                    ),
+                    build_modal_info_overlay(
+                        "trend-indicator",
+                        "bottom",
+                        dedent(
+                            """
+                The _**Ads Trends**_ panel displays the number of ads posted in that
+                category in the past 60 days (vs previous period).
             """
+                        ),
                     ),
-                ),
-                build_modal_info_overlay(
-                    "trend-indicator",
-                    "bottom",
-                    dedent(
-                        """
-            The _**Ads Trends**_ panel displays the number of ads posted in that
-            category in the past 60 days (vs previous period).
-        """
+                    build_modal_info_overlay(
+                        "price-hist",
+                        "bottom",
+                        dedent(
+                            """
+                The _**Selling Price Distribution**_ panel displays the distribution of prices in
+                posted ads. 
+            """
+                        ),
                     ),
-                ),
-                build_modal_info_overlay(
-                    "price-hist",
-                    "bottom",
-                    dedent(
-                        """
-            The _**Selling Price Distribution**_ panel displays the distribution of prices in
-            posted ads. 
-        """
+                    build_modal_info_overlay(
+                        "post-fav-scatter",
+                        "top",
+                        dedent(
+                            """
+                The _**Favourite conversion over time**_ panel displays a scatterplot of the time since 
+                the ad was posted plotted against the number of favourite. 
+            """
+                        ),
                     ),
-                ),
-                build_modal_info_overlay(
-                    "post-fav-scatter",
-                    "top",
-                    dedent(
-                        """
-            The _**Favourite conversion over time**_ panel displays a scatterplot of the time since 
-            the ad was posted plotted against the number of favourite. 
-        """
+                    build_modal_info_overlay(
+                        "post-view-scatter",
+                        "top",
+                        dedent(
+                            """
+                The _**View conversion over time**_ panel displays a scatterplot of the time since 
+                the ad was posted plotted against the number of favourite. 
+            """
+                        ),
                     ),
-                ),
-                build_modal_info_overlay(
-                    "post-view-scatter",
-                    "top",
-                    dedent(
-                        """
-            The _**View conversion over time**_ panel displays a scatterplot of the time since 
-            the ad was posted plotted against the number of favourite. 
-        """
+                    html.Div(
+                        children=[
+                            html.H4(
+                                [
+                                    "Parameters",
+                                ],
+                                className="container_title",
+                            ),
+                            html.Br(),
+                            dcc.Markdown("Select a brand: "),
+                            dcc.Dropdown(
+                                brand_list,
+                                brand_list[0] if brand_list else None,
+                                id="brand-selector",
+                            ),
+                            html.Br(),
+                            dcc.Markdown("Select a date range: "),
+                            dcc.DatePickerRange(
+                                id="date-range",
+                                min_date_allowed=min_day,
+                                max_date_allowed=max_day,
+                                start_date=start_date,
+                                end_date=end_date,
+                                display_format="YYYY-MM-DD",
+                            ),
+                            html.Div(id="dd-output-container"),
+                        ],
+                        className="twelve columns pretty_container",
+                        style={
+                            "width": "98%",
+                            "margin-right": "0",
+                        },
+                        id="selector-div",
                     ),
-                ),
-                html.Div(
-                    children=[
-                        html.H4(
-                            [
-                                "Parameters",
-                            ],
-                            className="container_title",
-                        ),
-                        html.Br(),
-                        dcc.Markdown("Select a brand: "),
-                        dcc.Dropdown(brand_list, brand_list[0], id="brand-selector"),
-                        html.Div(id="dd-output-container"),
-                    ],
-                    className="twelve columns pretty_container",
-                    style={
-                        "width": "98%",
-                        "margin-right": "0",
-                    },
-                    id="selector-div",
-                ),
-                html.Div(
-                    children=[
-                        html.Div(
-                            children=[
-                                html.H4(
-                                    [
-                                        "Available Scraped Ads",
-                                    ],
-                                    className="container_title",
-                                ),
-                                dcc.Loading(
+                    html.Div(
+                        children=[
+                            html.Div(
+                                children=[
+                                    html.H4(
+                                        [
+                                            "Available Scraped Ads",
+                                        ],
+                                        className="container_title",
+                                    ),
+                                    dcc.Loading(
+                                        dcc.Graph(
+                                            id="scraped-ads-indicator",
+                                            figure=blank_fig(row_heights[0]),
+                                            config={"displayModeBar": False},
+                                        ),
+                                        className="svg-container",
+                                        style={"height": 50},
+                                    ),
+                                ],
+                                className="six columns pretty_container",
+                                id="scraped-div",
+                            ),
+                            html.Div(
+                                children=[
+                                    html.H4(
+                                        [
+                                            "Trends",
+                                        ],
+                                        className="container_title",
+                                    ),
                                     dcc.Graph(
-                                        id="scraped-ads-indicator",
+                                        id="ads-trend-indicator",
                                         figure=blank_fig(row_heights[0]),
                                         config={"displayModeBar": False},
                                     ),
-                                    className="svg-container",
-                                    style={"height": 50},
-                                ),
-                            ],
-                            className="six columns pretty_container",
-                            id="scraped-div",
-                        ),
-                        html.Div(
-                            children=[
-                                html.H4(
-                                    [
-                                        "Trends Last 30 Days",
-                                    ],
-                                    className="container_title",
-                                ),
-                                dcc.Graph(
-                                    id="ads-trend-indicator",
-                                    figure=blank_fig(row_heights[0]),
-                                    config={"displayModeBar": False},
-                                ),
-                            ],
-                            className="six columns pretty_container",
-                            id="trend-div",
-                        ),
-                    ]
-                ),
-                html.Div(
-                    children=[
-                        html.H4(
-                            [
-                                "Price Distribution",
-                            ],
-                            className="container_title",
-                        ),
-                        dcc.Graph(
-                            id="price-distrib-graph",
-                            figure=blank_fig(row_heights[1]),
-                            config={"displayModeBar": False},
-                        ),
-                    ],
-                    className="twelve columns pretty_container",
-                    style={
-                        "width": "98%",
-                        "margin-right": "0",
-                    },
-                    id="map-div",
-                ),
-                # html.Div(
-                #     children=[
-                # html.Div(
-                #     children=[
-                #         html.H4(
-                #             [
-                #                 "Signal Range",
-                #                 html.Img(
-                #                     id="show-range-modal",
-                #                     src="assets/question-circle-solid.svg",
-                #                     className="info-icon",
-                #                 ),
-                #             ],
-                #             className="container_title",
-                #         ),
-                #         dcc.Graph(
-                #             id="range-histogram",
-                #             figure=blank_fig(row_heights[2]),
-                #             config={"displayModeBar": False},
-                #         ),
-                #         html.Button(
-                #             "Clear Selection",
-                #             id="clear-range",
-                #             className="reset-button",
-                #         ),
-                #     ],
-                #     className="six columns pretty_container",
-                #     id="range-div",
-                # ),
-                # html.Div(
-                #     children=[
-                #         html.H4(
-                #             [
-                #                 "Construction Date",
-                #                 html.Img(
-                #                     id="show-created-modal",
-                #                     src="assets/question-circle-solid.svg",
-                #                     className="info-icon",
-                #                 ),
-                #             ],
-                #             className="container_title",
-                #         ),
-                #         dcc.Graph(
-                #             id="created-histogram",
-                #             config={"displayModeBar": False},
-                #             figure=blank_fig(row_heights[2]),
-                #         ),
-                #         html.Button(
-                #             "Clear Selection",
-                #             id="clear-created",
-                #             className="reset-button",
-                #         ),
-                #     ],
-                #     className="six columns pretty_container",
-                #     id="created-div",
-                # ),
-                #     ]
-                # ),
-            ]
-        ),
-        html.Div(
-            [
-                html.H4("Acknowledgements", style={"margin-top": "0"}),
-                dcc.Markdown(
-                    """\
-The Vinted Pricing Dashboard was created in the context of a personal project for the 
-MSc Data Science for Business X-HEC.
-"""
-                ),
-            ],
-            style={
-                "width": "98%",
-                "margin-right": "0",
-                "padding": "10px",
-            },
-            className="twelve columns pretty_container",
-        ),
-    ]
-)
+                                ],
+                                className="six columns pretty_container",
+                                id="trend-div",
+                            ),
+                        ]
+                    ),
+                    html.Div(
+                        children=[
+                            html.H4(
+                                [
+                                    "Price Distribution",
+                                ],
+                                className="container_title",
+                            ),
+                            dcc.Graph(
+                                id="price-distrib-graph",
+                                figure=blank_fig(row_heights[1]),
+                                config={"displayModeBar": False},
+                            ),
+                        ],
+                        className="twelve columns pretty_container",
+                        style={
+                            "width": "98%",
+                            "margin-right": "0",
+                        },
+                        id="map-div",
+                    ),
+                    html.Div(
+                        children=[
+                            html.H4(
+                                [
+                                    "Search Ads",
+                                ],
+                                className="container_title",
+                            ),
+                            dcc.Input(
+                                id="search-input",
+                                type="search",
+                                placeholder="Keywords (title and description)",
+                                debounce=True,
+                                style={"width": "100%"},
+                            ),
+                            dash_table.DataTable(
+                                id="search-results",
+                                columns=[
+                                    {"name": col, "id": col}
+                                    for col in SEARCH_RESULT_COLS
+                                ],
+                                page_size=10,
+                            ),
+                        ],
+                        className="twelve columns pretty_container",
+                        style={
+                            "width": "98%",
+                            "margin-right": "0",
+                        },
+                        id="search-div",
+                    ),
+                    # html.Div(
+                    #     children=[
+                    # html.Div(
+                    #     children=[
+                    #         html.H4(
+                    #             [
+                    #                 "Signal Range",
+                    #                 html.Img(
+                    #                     id="show-range-modal",
+                    #                     src="assets/question-circle-solid.svg",
+                    #                     className="info-icon",
+                    #                 ),
+                    #             ],
+                    #             className="container_title",
+                    #         ),
+                    #         dcc.Graph(
+                    #             id="range-histogram",
+                    #             figure=blank_fig(row_heights[2]),
+                    #             config={"displayModeBar": False},
+                    #         ),
+                    #         html.Button(
+                    #             "Clear Selection",
+                    #             id="clear-range",
+                    #             className="reset-button",
+                    #         ),
+                    #     ],
+                    #     className="six columns pretty_container",
+                    #     id="range-div",
+                    # ),
+                    # html.Div(
+                    #     children=[
+                    #         html.H4(
+                    #             [
+                    #                 "Construction Date",
+                    #                 html.Img(
+                    #                     id="show-created-modal",
+                    #                     src="assets/question-circle-solid.svg",
+                    #                     className="info-icon",
+                    #                 ),
+                    #             ],
+                    #             className="container_title",
+                    #         ),
+                    #         dcc.Graph(
+                    #             id="created-histogram",
+                    #             config={"displayModeBar": False},
+                    #             figure=blank_fig(row_heights[2]),
+                    #         ),
+                    #         html.Button(
+                    #             "Clear Selection",
+                    #             id="clear-created",
+                    #             className="reset-button",
+                    #         ),
+                    #     ],
+                    #     className="six columns pretty_container",
+                    #     id="created-div",
+                    # ),
+                    #     ]
+                    # ),
+                ]
+            ),
+            html.Div(
+                [
+                    html.H4("Acknowledgements", style={"margin-top": "0"}),
+                    dcc.Markdown(
+                        """\
+    The Vinted Pricing Dashboard was created in the context of a personal project for the 
+    MSc Data Science for Business X-HEC.
+    """
+                    ),
+                ],
+                style={
+                    "width": "98%",
+                    "margin-right": "0",
+                    "padding": "10px",
+                },
+                className="twelve columns pretty_container",
+            ),
+        ]
+    )
+
+
+app.layout = serve_layout
 
 # PANEL 1/2: INDICATORS
 @app.callback(
     Output("scraped-ads-indicator", "figure"), Input("brand-selector", "value")
 )
+@figure_cache.memoize
 def build_scraped_indicator_figure(brand):
     """Build a volume indicator (total scraped ads)
     """
-    filtered_df = df[df["brand"] == brand]
-    n_scraped = filtered_df.shape[0]
+    n_scraped = data_provider.get().brand_index.count(brand)
 
     # indicator
     scraped_indicator = {
@@ -350,21 +591,32 @@ def build_scraped_indicator_figure(brand):
     return scraped_indicator
 
 
-@app.callback(Output("ads-trend-indicator", "figure"), Input("brand-selector", "value"))
-def build_ads_trend_indicator(brand):
-    """Build a trend indicator (ads posted in the last 120 to 60 days vs last 60 days)
+@app.callback(
+    Output("ads-trend-indicator", "figure"),
+    Input("brand-selector", "value"),
+    Input("date-range", "start_date"),
+    Input("date-range", "end_date"),
+)
+@figure_cache.memoize
+def build_ads_trend_indicator(brand, start_date, end_date):
+    """Build a trend indicator (ads posted in the selected period vs the previous
+    period of the same length), from the daily rollups
     """
-    max_date = df["photo_timestamp"].max()
-    duration = 30
-    filtered_df = df[df["brand"] == brand]
+    rollups = data_provider.get().rollups
+    if start_date is None or end_date is None:
+        start_date, end_date = get_default_date_range(rollups)
+    if start_date is None:
+        return blank_fig(row_heights[0])
+    start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    duration = (end_date - start_date).days + 1
 
-    # Period 1: last 30 days
-    min_date_p1 = max_date - pd.DateOffset(days=duration)
-    n_p1 = (filtered_df["photo_timestamp"].between(min_date_p1, max_date)).sum()
+    # Period 1: selected period
+    n_p1 = rollups.count(brand, start_date, end_date)
 
-    # Period 1: last 120 to 60 days
-    min_date_p2 = max_date - pd.DateOffset(days=duration * 2)
-    n_p2 = (filtered_df["photo_timestamp"].between(min_date_p2, min_date_p1)).sum()
+    # Period 2: the period of the same length before
+    end_date_p2 = start_date - pd.Timedelta(days=1)
+    start_date_p2 = end_date_p2 - pd.Timedelta(days=duration - 1)
+    n_p2 = rollups.count(brand, start_date_p2, end_date_p2)
 
     # Indicator
     trend_indicator = {
@@ -374,7 +626,7 @@ def build_ads_trend_indicator(brand):
                 "value": n_p1,
                 "number": {"font": {"color": "#263238", "size": 50}},
                 "mode": "number+delta",
-                "title": f"Ads posted in the last {duration} days",
+                "title": f"Ads posted in the {duration} days to {end_date:%Y-%m-%d}",
             }
         ],
         "layout": {
@@ -388,10 +640,26 @@ def build_ads_trend_indicator(brand):
 
 # PANEL 3: PRICE DISTRIBUTION
 @app.callback(Output("price-distrib-graph", "figure"), Input("brand-selector", "value"))
+@figure_cache.memoize
 def build_price_distribution_histogram(brand):
-    filtered_df = df[df["brand"] == brand]
-    fig = px.histogram(filtered_df["price"], color_discrete_sequence=["#008080"])
+    return get_price_histogram_figure(data_provider.get().brand_index, brand)
+
+
+def get_price_histogram_figure(brand_index, brand):
+    """Price distribution of a brand as a bar trace
+    Bins are computed server side, only the bins and counts are sent
+    """
+    edges, counts = brand_index.get_price_histogram(brand)
+    fig = go.Figure(
+        go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=edges[1:] - edges[:-1],
+            marker_color="#008080",
+        )
+    )
     fig.update_layout(
+        bargap=0,
         xaxis_title="Selling price (€)",
         yaxis_title="Ads",
         template=template,
@@ -400,5 +668,35 @@ def build_price_distribution_histogram(brand):
     return fig
 
 
+# PANEL 4: ADS SEARCH
+@app.callback(
+    Output("search-results", "data"),
+    Input("search-input", "value"),
+    Input("brand-selector", "value"),
+)
+def search_ads(query, brand):
+    """Ads of the selected brand holding every keyword, best matches first"""
+    if not query:
+        return []
+    data = get_search_data()
+    mask = get_brand_mask(data, brand) if brand else None
+    positions, _ = data["text_index"].search(query, limit=100, mask=mask)
+    results_df = data["results_df"].iloc[positions]
+    return results_df.astype(object).where(results_df.notna(), None).to_dict("records")
+
+
+def warm_up_figures(snapshot):
+    """Compute the figures of the FIGURE_CACHE_WARMUP biggest brands after a load"""
+    brands = snapshot.brand_index.top_brands(n_warmup_brands)
+    figure_cache.warm_up(
+        [build_scraped_indicator_figure, build_price_distribution_histogram],
+        [(brand,) for brand in brands],
+    )
+    start_date, end_date = get_default_date_range(snapshot.rollups)
+    figure_cache.warm_up(
+        [build_ads_trend_indicator], [(brand, start_date, end_date) for brand in brands]
+    )
+
+
 if __name__ == "__main__":
     app.run_server(debug=True)
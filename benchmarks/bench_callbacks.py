@@ -0,0 +1,105 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.data import make_pages_df
+from src.benchmark import append_report, build_report
+from src.brand_index import BrandIndex
+from src.config.custom_logging import logger
+
+DURATION = 30
+
+
+def scan_callbacks(df, brand):
+    """Data access of the three callbacks as they were: full-frame boolean scans"""
+    n_scraped = df[df["brand"] == brand].shape[0]
+
+    max_date = df["photo_timestamp"].max()
+    filtered_df = df[df["brand"] == brand]
+    min_date_p1 = max_date - pd.Timedelta(days=DURATION)
+    n_p1 = filtered_df["photo_timestamp"].between(min_date_p1, max_date).sum()
+
+    filtered_df = df[df["brand"] == brand]
+    prices = filtered_df["price"].to_numpy()
+    return n_scraped, int(n_p1), int(np.isfinite(prices).sum())
+
+
+def index_callbacks(brand_index, brand):
+    """Same answers from the brand index; histograms are recomputed, not memoized"""
+    n_scraped = brand_index.count(brand)
+
+    max_date = brand_index.max_date
+    min_date_p1 = max_date - pd.Timedelta(days=DURATION)
+    n_p1 = brand_index.count_between(brand, min_date_p1, max_date)
+
+    brand_index.price_histograms.pop(brand, None)
+    _, counts = brand_index.get_price_histogram(brand)
+    return n_scraped, n_p1, int(counts.sum())
+
+
+def measure_latencies(callbacks, target, brands):
+    latencies = []
+    outputs = []
+    for brand in brands:
+        start = time.perf_counter()
+        outputs.append(callbacks(target, brand))
+        latencies.append(time.perf_counter() - start)
+    return outputs, np.array(latencies) * 1000
+
+
+def run_benchmark(scales=(1, 10, 50), n_brands=50):
+    """Latency of a brand selection (data access of the three callbacks) with full
+    scans and with the brand index, as the frame grows
+    """
+    results = []
+    for scale in scales:
+        pages_df = make_pages_df(scale)
+        brands = list(pages_df["brand"].value_counts().index[:n_brands].astype(str))
+
+        start = time.perf_counter()
+        brand_index = BrandIndex(pages_df)
+        build_seconds = time.perf_counter() - start
+
+        scan_outputs, scan_ms = measure_latencies(scan_callbacks, pages_df, brands)
+        index_outputs, index_ms = measure_latencies(
+            index_callbacks, brand_index, brands
+        )
+        assert scan_outputs == index_outputs
+
+        for name, latencies_ms in [("scan", scan_ms), ("brand_index", index_ms)]:
+            result = {
+                "scenario": name,
+                "rows": len(pages_df),
+                "brands": len(brands),
+                "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+            }
+            if name == "brand_index":
+                result["build_seconds"] = round(build_seconds, 3)
+            logger.info("Benchmark %s", result)
+            results.append(result)
+    params = {"scales": list(scales), "n_brands": n_brands}
+    return build_report(params, results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark brand selection callbacks with and without the brand index"
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10, 50],
+        help="Copies of the sample pages data",
+    )
+    parser.add_argument("--n-brands", type=int, default=50)
+    parser.add_argument("--output", default="bench_results.jsonl")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    append_report(args.output, run_benchmark(args.scales, args.n_brands))
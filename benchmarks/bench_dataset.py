@@ -0,0 +1,96 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.data import make_pages_df
+from src.benchmark import append_report, build_report
+from src.config.custom_logging import logger
+from src.dataset import read_partitioned_dataset, write_partitioned_dataset
+
+COLUMNS = ["ad_id", "brand", "price", "photo_timestamp"]
+
+
+def full_read(path, brand, start):
+    """Previous readers: load the whole single file, then filter in pandas"""
+    pages_df = pd.read_parquet(path)
+    pages_df = pages_df[pages_df["brand"] == brand]
+    if start is not None:
+        pages_df = pages_df[pages_df["photo_timestamp"] >= start]
+    return pages_df[COLUMNS]
+
+
+def pushdown_read(path, brand, start):
+    filters = [("brand", "=", brand)]
+    if start is not None:
+        filters.append(("photo_timestamp", ">=", start))
+    return read_partitioned_dataset(path, filters, COLUMNS)
+
+
+def median_seconds(read, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = read(*args)
+        timings.append(time.perf_counter() - start)
+    return output, statistics.median(timings)
+
+
+def run_benchmark(scale=20, repeat=5, days=60):
+    """Read one brand (and its last days of postings) from the single file and
+    from the brand/month partitioned dataset
+    """
+    pages_df = make_pages_df(scale)
+    brand = pages_df["brand"].value_counts().index[0]
+    last_start = pages_df["photo_timestamp"].max() - pd.Timedelta(days=days)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "pages_data.parquet.gz")
+        dataset_path = os.path.join(tmp_dir, "pages")
+        pages_df.to_parquet(file_path)
+        write_partitioned_dataset(pages_df, dataset_path, "photo_timestamp")
+
+        for query, start in [("brand", None), ("brand_last_days", last_start)]:
+            full_df, full_seconds = median_seconds(
+                full_read, repeat, file_path, brand, start
+            )
+            pushdown_df, pushdown_seconds = median_seconds(
+                pushdown_read, repeat, dataset_path, brand, start
+            )
+            assert len(full_df) == len(pushdown_df)
+
+            for name, seconds in [
+                ("full_read", full_seconds),
+                ("pushdown", pushdown_seconds),
+            ]:
+                result = {
+                    "scenario": "{}_{}".format(query, name),
+                    "rows_total": len(pages_df),
+                    "rows": len(full_df),
+                    "seconds": round(seconds, 4),
+                }
+                logger.info("Benchmark %s", result)
+                results.append(result)
+    params = {"scale": scale, "repeat": repeat, "days": days, "brand": brand}
+    return build_report(params, results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark partitioned reads with pushdown against full reads"
+    )
+    parser.add_argument(
+        "--scale", type=int, default=20, help="Copies of the sample pages data"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--output", default="bench_results.jsonl")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    append_report(args.output, run_benchmark(args.scale, args.repeat, args.days))
@@ -0,0 +1,71 @@
+import argparse
+import glob
+import os
+import time
+
+from src.benchmark import append_report, build_report
+from src.config.custom_logging import logger
+from src.extractors import ScanExtractor, SoupExtractor
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+
+def load_pages(fixtures_dir):
+    """Html of the catalog_*.html and ad_*.html pages of a fixtures directory"""
+    pages = {}
+    for kind in ["catalog", "ad"]:
+        pages[kind] = []
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, kind + "_*.html"))):
+            with open(path, "rb") as f:
+                pages[kind].append(f.read())
+    return pages
+
+
+def time_extractor(parse, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            parse(html)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+
+def run_benchmark(fixtures_dir=FIXTURES_DIR, repeat=200):
+    """Mean parse time per page of every extractor on the fixtures pages"""
+    pages = load_pages(fixtures_dir)
+    results = []
+    for kind, method in [("catalog", "get_page_data"), ("ad", "get_ad_data")]:
+        if not pages[kind]:
+            continue
+        for extractor in [SoupExtractor(), ScanExtractor()]:
+            seconds = time_extractor(getattr(extractor, method), pages[kind], repeat)
+            result = {
+                "scenario": "{}_{}".format(kind, type(extractor).__name__),
+                "pages": len(pages[kind]),
+                "mean_kb": round(
+                    sum(map(len, pages[kind])) / len(pages[kind]) / 1024, 1
+                ),
+                "ms_per_page": round(seconds * 1000, 3),
+                "pages_per_sec": round(1 / seconds, 1),
+            }
+            logger.info("Benchmark %s", result)
+            results.append(result)
+    return build_report({"fixtures_dir": fixtures_dir, "repeat": repeat}, results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parse time per page of the extractors"
+    )
+    parser.add_argument(
+        "--fixtures-dir",
+        default=FIXTURES_DIR,
+        help="Directory of catalog_*.html and ad_*.html pages",
+    )
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", default="bench_results.jsonl")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    append_report(args.output, run_benchmark(args.fixtures_dir, args.repeat))
@@ -0,0 +1,93 @@
+import argparse
+import time
+
+import numpy as np
+import plotly.express as px
+
+from app import get_price_histogram_figure
+from benchmarks.data import make_pages_df
+from src.benchmark import append_report, build_report
+from src.brand_index import BrandIndex
+from src.config.app_template import template
+from src.config.custom_logging import logger
+
+
+def raw_prices_figure(pages_df, brand):
+    """Previous callback: every price of the brand, binned by the browser"""
+    filtered_df = pages_df[pages_df["brand"] == brand]
+    fig = px.histogram(filtered_df["price"], color_discrete_sequence=["#008080"])
+    fig.update_layout(
+        xaxis_title="Selling price (€)",
+        yaxis_title="Ads",
+        template=template,
+        showlegend=False,
+    )
+    return fig
+
+
+def binned_figure(brand_index, brand):
+    """Current callback: bins computed server side, bin centers and counts sent
+    The brand histogram is recomputed, not memoized
+    """
+    brand_index.price_histograms.pop(brand, None)
+    return get_price_histogram_figure(brand_index, brand)
+
+
+def measure_figures(build_figure, target, brands):
+    """Payload size of the serialised figure and time to build and serialise it"""
+    sizes, latencies = [], []
+    for brand in brands:
+        start = time.perf_counter()
+        payload = build_figure(target, brand).to_json()
+        latencies.append(time.perf_counter() - start)
+        sizes.append(len(payload.encode("utf-8")))
+    return np.array(sizes) / 1024, np.array(latencies) * 1000
+
+
+def run_benchmark(scales=(1, 10, 50), n_brands=50):
+    """Price histogram of every brand, from raw prices and pre-binned"""
+    results = []
+    for scale in scales:
+        pages_df = make_pages_df(scale)
+        brands = list(pages_df["brand"].value_counts().index[:n_brands].astype(str))
+        brand_index = BrandIndex(pages_df)
+
+        for name, build_figure, target in [
+            ("raw_prices", raw_prices_figure, pages_df),
+            ("binned", binned_figure, brand_index),
+        ]:
+            sizes_kb, latencies_ms = measure_figures(build_figure, target, brands)
+            result = {
+                "scenario": name,
+                "rows": len(pages_df),
+                "brands": len(brands),
+                "max_payload_kb": round(float(sizes_kb.max()), 1),
+                "mean_payload_kb": round(float(sizes_kb.mean()), 1),
+                "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+                "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+            }
+            logger.info("Benchmark %s", result)
+            results.append(result)
+    params = {"scales": list(scales), "n_brands": n_brands}
+    return build_report(params, results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark price histogram payloads, raw prices vs pre-binned"
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10, 50],
+        help="Copies of the sample pages data",
+    )
+    parser.add_argument("--n-brands", type=int, default=50)
+    parser.add_argument("--output", default="bench_results.jsonl")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    append_report(args.output, run_benchmark(args.scales, args.n_brands))
@@ -0,0 +1,131 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import src.config.constants as cst
+from src.benchmark import append_report, build_report
+from src.config.custom_logging import logger
+from src.parsing import extract_literal_fields
+
+
+def make_raw_columns(n_rows, seed=0):
+    """user / photo / user_bundle_discount cells as stored in the raw csv"""
+    rng = np.random.default_rng(seed)
+    user_ids = rng.integers(0, max(1, n_rows // 5), n_rows)
+    users = [
+        "{{'id': {0}, 'login': 'vendeuse_{0}', 'business': False, 'photo': None, "
+        "'profile_url': 'https://www.vinted.fr/member/{0}'}}".format(user_id)
+        for user_id in user_ids
+    ]
+    photo_repr = (
+        "{{'id': {0}, 'width': 600, 'height': 800, 'is_main': True, "
+        "'url': 'https://images1.vinted.net/t/{0}/f800/img.jpeg', "
+        "'high_resolution': {{'id': '{0}', 'timestamp': {1}, 'orientation': None}}}}"
+    )
+    photos = [
+        photo_repr.format(i, 1650000000 + i) if i % 100 else np.nan
+        for i in range(n_rows)
+    ]
+    bundles = [
+        "{{'enabled': {}, 'discounts': [{{'minimal_item_count': 2, "
+        "'fraction': '0.1'}}]}}".format(user_id % 3 == 0)
+        if user_id % 10
+        else np.nan
+        for user_id in user_ids
+    ]
+    return pd.DataFrame({"user": users, "photo": photos, "bundle": bundles})
+
+
+def eval_user(series):
+    """Previous implementation: eval every cell then json_normalize"""
+    users_df = pd.json_normalize(series.apply(lambda u_dict: eval(u_dict)))
+    users_df.index = series.index
+    return users_df[cst.user_fields_pages]
+
+
+def eval_photo(series):
+    photos_df = pd.json_normalize(
+        series.apply(lambda p: {} if p is np.nan else eval(p))
+    )
+    photos_df.index = series.index
+    return photos_df[list(cst.photo_fields_pages)]
+
+
+def eval_bundle(series):
+    return series.apply(lambda b: False if b is np.nan else eval(b)["enabled"])
+
+
+def parse_user(series):
+    return extract_literal_fields(series, cst.user_fields_pages)
+
+
+def parse_photo(series):
+    return extract_literal_fields(series, cst.photo_fields_pages)
+
+
+def parse_bundle(series):
+    return extract_literal_fields(series, ["enabled"], missing=False)["enabled"]
+
+
+def timed(function, series):
+    start = time.perf_counter()
+    output = function(series)
+    return output, time.perf_counter() - start
+
+
+def run_benchmark(n_rows=1000000, baseline_rows=None):
+    """Time the extraction of the raw dict columns with eval and with parsing.py
+    The eval baseline runs on the first baseline_rows rows (default: all), where
+    both outputs are checked to be equal
+    """
+    raw_df = make_raw_columns(n_rows)
+    baseline_rows = n_rows if baseline_rows is None else min(baseline_rows, n_rows)
+    results = []
+    for column, baseline, parser in [
+        ("user", eval_user, parse_user),
+        ("photo", eval_photo, parse_photo),
+        ("bundle", eval_bundle, parse_bundle),
+    ]:
+        parsed, parse_seconds = timed(parser, raw_df[column])
+        expected, eval_seconds = timed(baseline, raw_df[column].iloc[:baseline_rows])
+        check = parsed.iloc[:baseline_rows]
+        if isinstance(check, pd.DataFrame):
+            pd.testing.assert_frame_equal(check, expected)
+        else:
+            pd.testing.assert_series_equal(check, expected, check_names=False)
+
+        for name, rows, seconds in [
+            ("eval", baseline_rows, eval_seconds),
+            ("parsing", n_rows, parse_seconds),
+        ]:
+            result = {
+                "scenario": "{}_{}".format(column, name),
+                "rows": rows,
+                "seconds": round(seconds, 3),
+                "rows_per_sec": round(rows / seconds),
+            }
+            logger.info("Benchmark %s", result)
+            results.append(result)
+    return build_report({"rows": n_rows, "baseline_rows": baseline_rows}, results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parsing of the stringified raw dict columns"
+    )
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument(
+        "--baseline-rows",
+        type=int,
+        default=None,
+        help="Rows parsed with the previous eval implementation (default: all)",
+    )
+    parser.add_argument("--output", default="bench_results.jsonl")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    append_report(args.output, run_benchmark(args.rows, args.baseline_rows))
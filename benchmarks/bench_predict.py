@@ -0,0 +1,129 @@
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+import app
+from src.benchmark import append_report, build_report
+from src.config.custom_logging import logger
+from src.pricing import PricingEngine, build_listings_frame
+
+
+def get_listings(pages_df, ads_df, n_listings, seed=0):
+    """n_listings listing dicts sampled (with replacement) from the sample data,
+    as a client of /predict would send them
+    """
+    listings_df = build_listings_frame(pages_df, ads_df).drop(columns=["price"])
+    listings_df = listings_df.sample(
+        n_listings, replace=True, random_state=seed
+    ).reset_index(drop=True)
+    listings_df["photo_timestamp"] = listings_df["photo_timestamp"].astype(str)
+    listings_df = listings_df.astype(object).where(listings_df.notna(), None)
+    return listings_df.to_dict("records")
+
+
+def measure_batches(engine, listings, batch_size, repeat):
+    """Listings scored per second when scoring batch_size listings per call"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for offset in range(0, len(listings), batch_size):
+            engine.predict(listings[offset : offset + batch_size])
+        timings.append(time.perf_counter() - start)
+    seconds = statistics.median(timings)
+    return {
+        "scenario": "batch_{}".format(batch_size),
+        "listings": len(listings),
+        "seconds": round(seconds, 4),
+        "listings_per_sec": round(len(listings) / seconds, 1),
+    }
+
+
+def measure_requests(engine, listings, n_requests):
+    """Latency of /predict requests of a single listing, through the Flask route
+    The engine is the one of the app data, so the app serves it without refitting
+    """
+    engine.source_version = app.get_source_version()
+    app.pricing_engine = engine
+    client = app.server.test_client()
+    latencies = []
+    for listing in listings[:n_requests]:
+        start = time.perf_counter()
+        response = client.post("/predict", json=[listing])
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "scenario": "predict_route",
+        "requests": len(latencies_ms),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+def run_benchmark(
+    n_listings=100000, batch_sizes=(1, 100, 10000), repeat=3, n_requests=1000
+):
+    """Fit the engine on the sample data and score sampled listings in batches of
+    several sizes and one listing per /predict request
+    """
+    pages_df = pd.read_parquet(app.DATA_PATH)
+    ads_df = pd.read_parquet(app.ADS_DATA_PATH)
+    start = time.perf_counter()
+    engine = PricingEngine().fit(pages_df, ads_df)
+    fit_seconds = time.perf_counter() - start
+    listings = get_listings(pages_df, ads_df, n_listings)
+
+    # scoring is vectorised: batches give the same prices as one call per listing
+    batch = listings[:100]
+    assert np.allclose(
+        engine.predict(batch),
+        np.concatenate([engine.predict([listing]) for listing in batch]),
+    )
+
+    results = []
+    for batch_size in batch_sizes:
+        # one listing per call is slow, a sample of the listings is enough
+        n_batch_listings = min(len(listings), batch_size * 1000)
+        result = measure_batches(
+            engine, listings[:n_batch_listings], batch_size, repeat
+        )
+        logger.info("Benchmark %s", result)
+        results.append(result)
+
+    result = measure_requests(engine, listings, n_requests)
+    logger.info("Benchmark %s", result)
+    results.append(result)
+
+    params = {
+        "n_listings": n_listings,
+        "batch_sizes": list(batch_sizes),
+        "repeat": repeat,
+        "n_requests": n_requests,
+        "fit_seconds": round(fit_seconds, 3),
+    }
+    return build_report(params, results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark pricing engine throughput and /predict latency"
+    )
+    parser.add_argument("--n-listings", type=int, default=100000)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 100, 10000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--n-requests", type=int, default=1000)
+    parser.add_argument("--output", default="bench_results.jsonl")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    append_report(
+        args.output,
+        run_benchmark(args.n_listings, args.batch_sizes, args.repeat, args.n_requests),
+    )
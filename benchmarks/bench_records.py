@@ -0,0 +1,95 @@
+import argparse
+import time
+
+import pandas as pd
+
+from src.benchmark import append_report, build_report
+from src.config.custom_logging import logger
+from src.records import RecordBuffer
+
+ITEMS_PER_PAGE = 25
+
+
+def make_item(ad_id):
+    return {
+        "id": ad_id,
+        "title": "Robe portefeuille {}".format(ad_id),
+        "price": "{}.0".format(5 + ad_id % 40),
+        "brand_title": "Zara",
+        "size_title": "M",
+        "url": "https://www.vinted.fr/items/{}".format(ad_id),
+        "favourite_count": ad_id % 50,
+        "view_count": ad_id % 300,
+        "user": {"id": 1000 + ad_id % 7},
+        "photo": {"high_resolution": {"timestamp": 1650000000 + ad_id}},
+    }
+
+
+def concat_per_page(n_items):
+    """Previous scraper: concatenate one frame per catalog page"""
+    items_df = pd.DataFrame()
+    for start in range(0, n_items, ITEMS_PER_PAGE):
+        stop = min(n_items, start + ITEMS_PER_PAGE)
+        page = {i: make_item(i) for i in range(start, stop)}
+        items_df = pd.concat([items_df, pd.DataFrame.from_dict(page, orient="index")])
+    return items_df
+
+
+def concat_per_ad(n_items):
+    """Previous ad scraper: concatenate a one-row frame per ad"""
+    ads_df = pd.DataFrame()
+    for i in range(n_items):
+        ad_df = pd.DataFrame.from_dict(make_item(i), orient="index").T
+        ads_df = pd.concat([ads_df, ad_df])
+    return ads_df
+
+
+def record_buffer(n_items):
+    items = RecordBuffer()
+    for i in range(n_items):
+        items.append(i, make_item(i))
+    return items.to_frame()
+
+
+def run_benchmark(sizes, max_concat_ads=10000):
+    """Time the accumulation of n synthetic items for every size and strategy
+    concat_per_ad is quadratic and only runs up to max_concat_ads items
+    """
+    results = []
+    for n_items in sizes:
+        for name, accumulate in [
+            ("concat_per_page", concat_per_page),
+            ("concat_per_ad", concat_per_ad),
+            ("record_buffer", record_buffer),
+        ]:
+            if accumulate is concat_per_ad and n_items > max_concat_ads:
+                continue
+            start = time.perf_counter()
+            frame = accumulate(n_items)
+            seconds = time.perf_counter() - start
+            assert len(frame) == n_items
+
+            result = {
+                "scenario": name,
+                "items": n_items,
+                "seconds": round(seconds, 3),
+                "items_per_sec": round(n_items / seconds),
+            }
+            logger.info("Benchmark %s", result)
+            results.append(result)
+    return build_report({"sizes": sizes, "max_concat_ads": max_concat_ads}, results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the accumulation of scraped records into a frame"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--max-concat-ads", type=int, default=10000)
+    parser.add_argument("--output", default="bench_results.jsonl")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    append_report(args.output, run_benchmark(args.sizes, args.max_concat_ads))
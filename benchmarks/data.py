@@ -0,0 +1,27 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_PAGES_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "data", "preprocessed", "pages_data.parquet.gz"
+)
+
+
+def make_pages_df(scale=1, path=SAMPLE_PAGES_PATH, seed=0):
+    """Preprocessed pages frame made of scale copies of the sample pages
+    Every copy gets its own ad ids and posting times jittered by up to 30 days
+    """
+    sample_df = pd.read_parquet(path)
+    rng = np.random.default_rng(seed)
+    copies = []
+    for copy in range(scale):
+        copy_df = sample_df.copy()
+        copy_df["ad_id"] = copy_df["ad_id"].astype(str) + "-{}".format(copy)
+        jitter = pd.to_timedelta(rng.integers(0, 30 * 86400, len(copy_df)), unit="s")
+        copy_df["photo_timestamp"] = copy_df["photo_timestamp"] + jitter
+        copies.append(copy_df)
+    pages_df = pd.concat(copies, ignore_index=True)
+    pages_df["brand"] = pages_df["brand"].astype("category")
+    pages_df["size"] = pages_df["size"].astype("category")
+    return pages_df
@@ -0,0 +1,238 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.config.custom_logging import logger
+from src.replay import ReplayServer
+from src.scraper import (
+    AsyncVintedScraper,
+    ParallelVintedAdScraper,
+    VintedAdScraper,
+    VintedScraper,
+)
+from src.session import VintedSession
+
+
+class TimedSession(VintedSession):
+    """VintedSession keeping the latency of every request and the urls downloaded"""
+
+    def __init__(self, **session_kwargs):
+        super().__init__(**session_kwargs)
+        self.latencies = []
+        self.fetched_urls = set()
+        self.latencies_lock = threading.Lock()
+
+    def get(self, url):
+        start = time.perf_counter()
+        response = super().get(url)
+        with self.latencies_lock:
+            self.latencies.append(time.perf_counter() - start)
+            self.fetched_urls.add(url)
+        return response
+
+
+def get_peak_rss_mb():
+    """Peak RSS over the lifetime of this process and of its (finished) workers"""
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(self_rss / scale, 1), round(children_rss / scale, 1)
+
+
+def get_version_label():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "describe", "--always", "--dirty"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_report(params, results):
+    """Benchmark run as appended to the results jsonl file"""
+    return {
+        "label": get_version_label(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+
+
+def append_report(path, report):
+    with open(path, "a", encoding="utf-8") as output_file:
+        output_file.write(json.dumps(report) + "\n")
+
+
+def measure(name, unit, scrape, session):
+    start = time.perf_counter()
+    n_records = scrape()
+    seconds = time.perf_counter() - start
+    latencies_ms = np.array(session.latencies) * 1000
+    peak_rss_mb, peak_children_rss_mb = get_peak_rss_mb()
+
+    result = {
+        "scenario": name,
+        unit: n_records,
+        "seconds": round(seconds, 3),
+        "{}_per_sec".format(unit): round(n_records / seconds, 2) if seconds else None,
+        "requests": len(latencies_ms),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2)
+        if len(latencies_ms)
+        else None,
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2)
+        if len(latencies_ms)
+        else None,
+        "peak_rss_mb": peak_rss_mb,
+        "peak_children_rss_mb": peak_children_rss_mb,
+    }
+    logger.info("Benchmark %s", result)
+    return result
+
+
+def scrape_pages_scenario(name, scraper_class, kwargs, scope, max_pages, max_workers):
+    """Scrape the catalog pages of scope, return the result and the (url, id) of
+    the items scraped. Only the pages actually downloaded count as pages
+    """
+    session = TimedSession(pool_maxsize=max_workers)
+    scraper = scraper_class(scope, max_pages, session=session, **kwargs)
+
+    def scrape_pages():
+        scraper.get_pages_in_scope()
+        return len(session.fetched_urls)
+
+    result = measure(name, "pages", scrape_pages, session)
+    result["items"] = len(scraper.items_df)
+    items = []
+    if len(scraper.items_df):
+        items = list(zip(scraper.items_df["url"], scraper.items_df["id"]))
+    return result, items
+
+
+def scrape_ads_scenario(name, scraper_class, kwargs, ads_urls, ads_ids, max_workers):
+    session = TimedSession(pool_maxsize=max_workers)
+    scraper = scraper_class(ads_urls, ads_ids, session=session, **kwargs)
+
+    def scrape_ads():
+        return sum(1 for _ in scraper.iter_ads())
+
+    return measure(name, "ads", scrape_ads, session)
+
+
+def run_in_subprocess(scenario, *args):
+    """Run a scenario in a fresh interpreter, so that the peak RSS it reports
+    (a lifetime peak of the process) is the peak of this scenario only
+    """
+    spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+        return executor.submit(scenario, *args).result()
+
+
+def run_benchmark(
+    fixtures_dir,
+    scope_url,
+    max_pages=25,
+    max_workers=8,
+    latency=0.05,
+    jitter=0.02,
+    error_rate=0,
+):
+    """Drive the scrapers against a replay server of fixtures_dir
+    Every scenario runs in its own process
+    """
+    results = []
+    with ReplayServer(fixtures_dir, latency, jitter, error_rate) as server:
+        scope = server.replay_url(scope_url)
+        items = []
+        for name, scraper_class, kwargs in [
+            ("pages_sequential", VintedScraper, {}),
+            ("pages_concurrent", AsyncVintedScraper, {"max_concurrency": max_workers}),
+        ]:
+            result, items = run_in_subprocess(
+                scrape_pages_scenario,
+                name,
+                scraper_class,
+                kwargs,
+                scope,
+                max_pages,
+                max_workers,
+            )
+            results.append(result)
+
+        ads_urls = [server.replay_url(url) for url, _ in items]
+        ads_ids = [id_ for _, id_ in items]
+        for name, scraper_class, kwargs in [
+            ("ads_sequential", VintedAdScraper, {}),
+            (
+                "ads_parallel",
+                ParallelVintedAdScraper,
+                {"max_workers": max_workers, "rate": 1000},
+            ),
+        ]:
+            results.append(
+                run_in_subprocess(
+                    scrape_ads_scenario,
+                    name,
+                    scraper_class,
+                    kwargs,
+                    ads_urls,
+                    ads_ids,
+                    max_workers,
+                )
+            )
+
+    params = {
+        "scope_url": scope_url,
+        "max_pages": max_pages,
+        "max_workers": max_workers,
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+    }
+    return build_report(params, results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scrapers against recorded responses"
+    )
+    parser.add_argument("fixtures_dir")
+    parser.add_argument("scope_url", help="Scope url used when recording")
+    parser.add_argument("--max-pages", type=int, default=25)
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument(
+        "--output",
+        default="bench_results.jsonl",
+        help="jsonl file the benchmark run is appended to",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run_benchmark(
+        args.fixtures_dir,
+        args.scope_url,
+        args.max_pages,
+        args.max_workers,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+    )
+    append_report(args.output, report)
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+
+class BrandIndex:
+    """Brand -> row slice index over a brand-sorted copy of the pages frame
+    Built once at load time so that dashboard callbacks slice the rows of a brand
+    and count ads in a date range without scanning the whole frame. A frame already
+    sorted by brand and time (missing brands last) is used as is with presorted
+    """
+
+    def __init__(
+        self,
+        df,
+        brand_col="brand",
+        time_col="photo_timestamp",
+        price_col="price",
+        max_price_bins=200,
+        presorted=False,
+    ):
+        self.brand_col = brand_col
+        self.time_col = time_col
+        self.price_col = price_col
+        self.max_date = df[time_col].max()
+        self.n_rows = len(df)
+
+        if presorted:
+            self.df = df.iloc[: df[brand_col].notna().sum()]
+        else:
+            df = df[df[brand_col].notna()]
+            self.df = df.sort_values([brand_col, time_col]).reset_index(drop=True)
+        self.timestamps = self.df[time_col].to_numpy()
+
+        codes, brands = pd.factorize(self.df[brand_col])
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], len(codes)]
+        self.offsets = {
+            str(brands[codes[start]]): (start, end) for start, end in zip(starts, ends)
+        }
+        self.brands = list(self.offsets)
+
+        self.prices = self.df[price_col].to_numpy()
+        self.price_edges = get_bin_edges(self.prices, max_price_bins)
+        self.price_histograms = {}
+
+    def __contains__(self, brand):
+        return brand in self.offsets
+
+    def get_slice(self, brand):
+        """(start, end) positions of the brand rows, (0, 0) for unknown brands"""
+        return self.offsets.get(brand, (0, 0))
+
+    def get_brand_df(self, brand):
+        start, end = self.get_slice(brand)
+        return self.df.iloc[start:end]
+
+    def top_brands(self, n):
+        """The n brands with the most ads"""
+        return sorted(self.brands, key=self.count, reverse=True)[:n]
+
+    def count(self, brand):
+        start, end = self.get_slice(brand)
+        return end - start
+
+    def get_price_histogram(self, brand):
+        """(bin edges, counts) of the brand prices on the bins shared by all brands
+        Bins are trimmed to the range holding the brand prices
+        """
+        if brand not in self.price_histograms:
+            start, end = self.get_slice(brand)
+            self.price_histograms[brand] = get_histogram(
+                self.prices[start:end], self.price_edges
+            )
+        return self.price_histograms[brand]
+
+    def count_between(self, brand, min_date, max_date):
+        """Ads of the brand posted between min_date and max_date (both included)
+        Rows are sorted by time within a brand, so this is two binary searches
+        """
+        start, end = self.get_slice(brand)
+        timestamps = self.timestamps[start:end]
+        left = np.searchsorted(timestamps, np.datetime64(min_date), side="left")
+        right = np.searchsorted(timestamps, np.datetime64(max_date), side="right")
+        return int(right - left)
+
+
+def get_bin_edges(values, max_bins=200):
+    """Equal width bins over the finite values (Freedman-Diaconis width, at most
+    max_bins bins)
+    """
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.array([0.0, 1.0])
+    edges = np.histogram_bin_edges(values, bins="fd")
+    if len(edges) - 1 > max_bins:
+        edges = np.histogram_bin_edges(values, bins=max_bins)
+    return edges
+
+
+def get_histogram(values, edges):
+    """Counts of the values on edges, without the empty bins at both ends"""
+    counts, _ = np.histogram(values[np.isfinite(values)], bins=edges)
+    non_empty = np.flatnonzero(counts)
+    if len(non_empty) == 0:
+        return edges[:1], counts[:0]
+    first, last = non_empty[0], non_empty[-1] + 1
+    return edges[first : last + 1], counts[first:last]
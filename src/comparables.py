@@ -0,0 +1,232 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+import src.config.constants as cst
+from src.pricing import add_listing_age, build_listings_frame, to_naive_utc
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = "unknown"
+
+
+def get_partition_keys(df):
+    return pd.MultiIndex.from_frame(
+        df[cst.comparables_partition_cols].astype(object).fillna(UNKNOWN).astype(str)
+    )
+
+
+class ComparablesPartition:
+    """KD-tree over the scaled features of the listings of one partition"""
+
+    def __init__(self, ad_ids, prices, points, content_hash):
+        self.ad_ids = ad_ids
+        self.prices = prices
+        self.tree = cKDTree(points)
+        self.content_hash = content_hash
+
+    def __len__(self):
+        return len(self.prices)
+
+
+class ComparablesIndex:
+    """Nearest comparable listings, partitioned by brand, size and condition
+    Features are log-scaled with the statistics of the first build and listing
+    ages are measured at its reference date (latest posting), so that update()
+    only rebuilds the partitions whose listings changed. Queries falling in a
+    partition with fewer than k listings also search the partitions of the same
+    brand and size
+    """
+
+    # indexes pickled before the reference date was stored
+    reference_date = None
+
+    def __init__(self):
+        self.partitions = {}
+        self.means = None
+        self.stds = None
+        self.reference_date = None
+        self.source_version = None
+
+    def __len__(self):
+        return sum(len(partition) for partition in self.partitions.values())
+
+    def build(self, listings_df, source_version=None):
+        self.partitions = {}
+        self.reference_date = to_naive_utc(listings_df["photo_timestamp"]).max()
+        listings_df = add_listing_age(listings_df, self.reference_date)
+        values = self._feature_values(listings_df)
+        self.means = np.nanmean(values, axis=0)
+        self.stds = np.nanstd(values, axis=0)
+        self.stds[~(self.stds > 0)] = 1.0
+        self.update(listings_df, source_version)
+        return self
+
+    def update(self, listings_df, source_version=None):
+        """Rebuild the partitions whose listings changed, drop the empty ones
+        Returns the number of rebuilt partitions
+        """
+        listings_df = listings_df[listings_df["price"].notna()].reset_index(drop=True)
+        listings_df = add_listing_age(listings_df, self.reference_date)
+        points = self._scale(self._feature_values(listings_df))
+        keys = get_partition_keys(listings_df)
+        # hash the scraped values only: derived features such as the listing age
+        # would change with every new reference date
+        hash_cols = [
+            col
+            for col in ["ad_id", "price", "photo_timestamp"] + cst.comparables_features
+            if col in listings_df and col != "listing_age_days"
+        ]
+        row_hashes = pd.util.hash_pandas_object(
+            listings_df[hash_cols], index=False
+        ).to_numpy()
+
+        n_rebuilt = 0
+        new_partitions = {}
+        for key, rows in pd.Series(np.arange(len(keys))).groupby(keys).indices.items():
+            rows = rows[np.argsort(row_hashes[rows], kind="stable")]
+            content_hash = hashlib.sha256(row_hashes[rows].tobytes()).hexdigest()
+            partition = self.partitions.get(key)
+            if partition is None or partition.content_hash != content_hash:
+                partition = ComparablesPartition(
+                    listings_df["ad_id"].to_numpy()[rows],
+                    listings_df["price"].to_numpy(dtype="float64")[rows],
+                    points[rows],
+                    content_hash,
+                )
+                n_rebuilt += 1
+            new_partitions[key] = partition
+
+        self.partitions = new_partitions
+        self.source_version = source_version
+        self._index_prefixes()
+        logger.info(
+            "Comparables index: %s partitions, %s rebuilt", len(new_partitions), n_rebuilt
+        )
+        return n_rebuilt
+
+    def query(self, listing, k=10, reference_date=None):
+        """The k nearest listings of the same brand, size and condition
+        Returns their ad ids, prices and distances and the price quantiles.
+        Listing age is computed at reference_date, by default the reference date
+        of the index
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1, got {}".format(k))
+        key = tuple(
+            UNKNOWN if pd.isna(listing.get(col)) else str(listing.get(col))
+            for col in cst.comparables_partition_cols
+        )
+        point = self._scale(self._listing_values(listing, reference_date))
+        candidates = []
+        if key in self.partitions and len(self.partitions[key]) >= k:
+            candidates = [key]
+        candidates = candidates or self.prefixes.get(key[:2], [])
+
+        ad_ids, prices, distances = [], [], []
+        for candidate in candidates:
+            partition = self.partitions[candidate]
+            k_partition = min(k, len(partition))
+            distance, rows = partition.tree.query(point, k=[*range(1, k_partition + 1)])
+            ad_ids.append(partition.ad_ids[rows])
+            prices.append(partition.prices[rows])
+            distances.append(distance)
+
+        if not candidates:
+            return {"n": 0, "ad_ids": [], "prices": [], "distances": [], "quantiles": {}}
+        distances = np.concatenate(distances)
+        nearest = np.argsort(distances, kind="stable")[:k]
+        prices = np.concatenate(prices)[nearest]
+        return {
+            "n": len(nearest),
+            "ad_ids": [str(ad_id) for ad_id in np.concatenate(ad_ids)[nearest]],
+            "prices": prices.tolist(),
+            "distances": distances[nearest].tolist(),
+            "quantiles": dict(
+                zip(
+                    map(str, cst.comparables_quantiles),
+                    np.quantile(prices, cst.comparables_quantiles).tolist(),
+                )
+            ),
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+        with os.fdopen(fd, "wb") as tmp_file:
+            pickle.dump(self, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as index_file:
+            return pickle.load(index_file)
+
+    @classmethod
+    def load_or_build(cls, path, pages_path, ads_path, source_version=None):
+        """Load the index saved at path, bring it up to date with source_version
+        (rebuilding only the changed partitions) and save it back if needed
+        """
+        index = cls.load(path) if os.path.exists(path) else cls()
+        if index.means is not None and index.source_version == source_version:
+            return index
+
+        listings_df = build_listings_frame(
+            pd.read_parquet(pages_path), pd.read_parquet(ads_path)
+        )
+        if index.means is None:
+            index.build(listings_df, source_version)
+        else:
+            index.update(listings_df, source_version)
+        index.save(path)
+        return index
+
+    def _feature_values(self, df):
+        columns = [
+            pd.to_numeric(df[col], errors="coerce").to_numpy(
+                dtype="float64", na_value=np.nan
+            )
+            if col in df
+            else np.full(len(df), np.nan)
+            for col in cst.comparables_features
+        ]
+        return np.log1p(np.clip(np.column_stack(columns), 0, None))
+
+    def _listing_values(self, listing, reference_date):
+        """Feature values of a single listing dict, without building a frame"""
+        listing = dict(listing)
+        if "listing_age_days" not in listing and "photo_timestamp" in listing:
+            if reference_date is None:
+                reference_date = self.reference_date
+            if reference_date is None:
+                reference_date = pd.Timestamp.now(tz="UTC").tz_convert(None)
+            posted_at = to_naive_utc(pd.Series([listing["photo_timestamp"]]))[0]
+            listing["listing_age_days"] = max(
+                (pd.Timestamp(reference_date) - posted_at).total_seconds() / 86400, 0
+            )
+        values = np.array(
+            [
+                pd.to_numeric(listing.get(col), errors="coerce")
+                if listing.get(col) is not None
+                else np.nan
+                for col in cst.comparables_features
+            ],
+            dtype="float64",
+        )
+        return np.log1p(np.clip(values, 0, None))
+
+    def _scale(self, values):
+        # missing features sit at the mean of the first build
+        values = np.where(np.isfinite(values), values, self.means)
+        return (values - self.means) / self.stds
+
+    def _index_prefixes(self):
+        self.prefixes = {}
+        for key in self.partitions:
+            self.prefixes.setdefault(key[:2], []).append(key)
@@ -6,5 +6,15 @@ PREPROCESSED_DATA_PATH = '../data/preprocessed'
 RAW_PAGES_PATH = os.path.join(RAW_DATA_PATH, 'pages_data.csv')
 RAW_ADS_PATH = os.path.join(RAW_DATA_PATH, 'ads_data.csv')
 
+RAW_PAGES_DATASET_PATH = os.path.join(RAW_DATA_PATH, 'pages')
+RAW_ADS_DATASET_PATH = os.path.join(RAW_DATA_PATH, 'ads')
+
 PREP_PAGES_PATH = os.path.join(PREPROCESSED_DATA_PATH, 'pages_data.parquet.gz')
-PREP_ADS_PATH = os.path.join(PREPROCESSED_DATA_PATH, 'ads_data.parquet.gz')
\ No newline at end of file
+PREP_ADS_PATH = os.path.join(PREPROCESSED_DATA_PATH, 'ads_data.parquet.gz')
+
+PREP_PAGES_DATASET_PATH = os.path.join(PREPROCESSED_DATA_PATH, 'pages')
+PREP_ADS_DATASET_PATH = os.path.join(PREPROCESSED_DATA_PATH, 'ads')
+
+PREP_ADS_TEXT_INDEX_PATH = os.path.join(PREPROCESSED_DATA_PATH, 'ads_text_index.npz')
+
+PREP_PAGES_ROLLUPS_PATH = os.path.join(PREPROCESSED_DATA_PATH, 'pages_daily_rollups.parquet')
\ No newline at end of file
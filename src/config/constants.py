@@ -19,6 +19,16 @@ relevant_cols_pages = [
     "photo_timestamp",
 ]
 
+# Fields extracted from the stringified user / photo dicts of the raw pages
+user_fields_pages = [
+    col[len("user_") :] for col in relevant_cols_pages if col.startswith("user_")
+]
+
+photo_fields_pages = {
+    "url": "photo_url",
+    "high_resolution.timestamp": "photo_timestamp",
+}
+
 colnames_pages = {
     "id": "ad_id",
     "title": "ad_title",
@@ -27,7 +37,18 @@ colnames_pages = {
     "size_title": "size",
 }
 
-coltypes_pages = {"ad_id": "str", "user_id": "str"}
+coltypes_pages = {
+    "ad_id": "string[pyarrow]",
+    "user_id": "string[pyarrow]",
+    "ad_title": "string[pyarrow]",
+    "price": "float32",
+    "discount": "float32",
+    "brand": "category",
+    "size": "category",
+    "favourite_count": "Int32",
+    "view_count": "Int32",
+    "user_login": "string[pyarrow]",
+}
 
 # Ads
 time_cols_ads = ["user_created_at", "user_last_loged_on_ts", "details_Ajouté"]
@@ -85,24 +106,93 @@ colnames_ads = {
 }
 
 coltypes_ads = {
-    "ad_id": "str",
-    "user_id": "str",
-    "user_item_count": "float",
-    "user_given_item_count": "float",
-    "user_taken_item_count": "float",
-    "user_forum_msg_count": "float",
-    "user_forum_topic_count": "float",
-    "user_followers_count": "float",
-    "user_following_count": "float",
-    "user_following_brands_count": "float",
-    "user_positive_feedback_count": "float",
-    "user_neutral_feedback_count": "float",
-    "user_negative_feedback_count": "float",
-    "user_meeting_transaction_count": "float",
-    "user_feedback_reputation": "float",
-    "user_country_id": "str",
-    "user_total_items_count": "float",
-    "view_count": "float",
-    "favourite_count": "float",
+    "ad_id": "string[pyarrow]",
+    "ad_title": "string[pyarrow]",
+    "ad_description": "string[pyarrow]",
+    "user_id": "string[pyarrow]",
+    "user_login": "string[pyarrow]",
+    "user_item_count": "Int32",
+    "user_given_item_count": "Int32",
+    "user_taken_item_count": "Int32",
+    "user_forum_msg_count": "Int32",
+    "user_forum_topic_count": "Int32",
+    "user_followers_count": "Int32",
+    "user_following_count": "Int32",
+    "user_following_brands_count": "Int32",
+    "user_positive_feedback_count": "Int32",
+    "user_neutral_feedback_count": "Int32",
+    "user_negative_feedback_count": "Int32",
+    "user_meeting_transaction_count": "Int32",
+    "user_feedback_reputation": "float32",
+    "user_city": "category",
+    "user_country_id": "category",
+    "user_country_code": "category",
+    "user_country_title": "category",
+    "user_business": "boolean",
+    "user_total_items_count": "Int32",
+    "user_about": "string[pyarrow]",
+    "user_profile_url": "string[pyarrow]",
+    "user_has_promoted_closet": "boolean",
+    "brand": "category",
+    "size": "category",
+    "condition": "category",
+    "color": "category",
+    "payment_methods": "category",
+    "view_count": "Int32",
+    "favourite_count": "Int32",
     #"user_created_at": "datetime64[ns]"
 }
+
+
+#### Pricing parameters
+
+# Listing fields read from the ads when a page item was also scraped as an ad
+pricing_cols_ads = [
+    "ad_id",
+    "condition",
+    "color",
+    "user_positive_feedback_count",
+    "user_negative_feedback_count",
+    "user_feedback_reputation",
+    "user_item_count",
+    "user_followers_count",
+]
+
+categorical_features = ["brand", "size", "condition", "color"]
+
+# Categorical features holding several values, with their separator
+multi_valued_features = {"color": ", "}
+
+numeric_features = [
+    "user_positive_feedback_count",
+    "user_negative_feedback_count",
+    "user_feedback_reputation",
+    "user_item_count",
+    "user_followers_count",
+    "view_count",
+    "favourite_count",
+    "listing_age_days",
+]
+
+# Heavy-tailed counts, log1p-transformed before scaling
+log_features = [
+    "user_positive_feedback_count",
+    "user_negative_feedback_count",
+    "user_item_count",
+    "user_followers_count",
+    "view_count",
+    "favourite_count",
+    "listing_age_days",
+]
+
+# Comparable listings: partitions and the features of the nearest neighbour search
+comparables_partition_cols = ["brand", "size", "condition"]
+
+comparables_features = [
+    "view_count",
+    "favourite_count",
+    "listing_age_days",
+    "user_positive_feedback_count",
+]
+
+comparables_quantiles = [0.1, 0.25, 0.5, 0.75, 0.9]
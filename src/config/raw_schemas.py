@@ -0,0 +1,75 @@
+#### Typed schemas of the raw scraped data (Parquet raw layer)
+import pyarrow as pa
+
+utc_timestamp = pa.timestamp("us", tz="UTC")
+
+# Pages
+raw_schema_pages = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("title", pa.string()),
+        ("price", pa.float64()),
+        ("discount", pa.float64()),
+        ("brand_title", pa.string()),
+        ("is_for_swap", pa.bool_()),
+        ("url", pa.string()),
+        ("promoted", pa.bool_()),
+        ("favourite_count", pa.int64()),
+        ("view_count", pa.int64()),
+        ("size_title", pa.string()),
+        ("user", pa.struct([("id", pa.int64()), ("login", pa.string())])),
+        (
+            "photo",
+            pa.struct(
+                [
+                    ("url", pa.string()),
+                    ("high_resolution", pa.struct([("timestamp", pa.int64())])),
+                ]
+            ),
+        ),
+    ]
+)
+
+# Ads
+raw_schema_ads = pa.schema(
+    [
+        ("ad_id", pa.int64()),
+        ("ad_title", pa.string()),
+        ("ad_description", pa.string()),
+        ("user_id", pa.int64()),
+        ("user_login", pa.string()),
+        ("user_item_count", pa.int64()),
+        ("user_given_item_count", pa.int64()),
+        ("user_taken_item_count", pa.int64()),
+        ("user_forum_msg_count", pa.int64()),
+        ("user_forum_topic_count", pa.int64()),
+        ("user_followers_count", pa.int64()),
+        ("user_following_count", pa.int64()),
+        ("user_following_brands_count", pa.int64()),
+        ("user_positive_feedback_count", pa.int64()),
+        ("user_neutral_feedback_count", pa.int64()),
+        ("user_negative_feedback_count", pa.int64()),
+        ("user_meeting_transaction_count", pa.int64()),
+        ("user_feedback_reputation", pa.float64()),
+        ("user_created_at", utc_timestamp),
+        ("user_last_loged_on_ts", utc_timestamp),
+        ("user_city", pa.string()),
+        ("user_country_id", pa.int64()),
+        ("user_country_code", pa.string()),
+        ("user_country_title", pa.string()),
+        ("user_bundle_discount", pa.struct([("enabled", pa.bool_())])),
+        ("user_business", pa.bool_()),
+        ("user_total_items_count", pa.int64()),
+        ("user_about", pa.string()),
+        ("user_profile_url", pa.string()),
+        ("user_has_promoted_closet", pa.bool_()),
+        ("details_Marque", pa.string()),
+        ("details_Taille", pa.string()),
+        ("details_État", pa.string()),
+        ("details_Couleur", pa.string()),
+        ("details_Modes de paiement", pa.string()),
+        ("details_Nombre de vues", pa.string()),
+        ("details_Intéressés·ées", pa.string()),
+        ("details_Ajouté", utc_timestamp),
+    ]
+)
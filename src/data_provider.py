@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from src.brand_index import BrandIndex
+from src.figure_cache import get_data_version
+from src.rollups import DailyRollups, compute_daily_rollups
+from src.shared_frame import load_shared_frame
+
+logger = logging.getLogger(__name__)
+
+
+class DataSnapshot:
+    """Immutable view of the dashboard data: the pages frame and its derived indexes
+    The frame is memory mapped from a brand/time sorted Arrow IPC copy of the
+    parquet file, shared by all the workers of the host. Daily rollups are read from
+    rollups_path, or computed from the frame when there is no rollups file
+    """
+
+    def __init__(self, path, ipc_dir=None, rollups_path=None):
+        start = time.perf_counter()
+        self.version = get_snapshot_version(path, rollups_path)
+        self.df = load_shared_frame(
+            path,
+            get_data_version(path),
+            sort_by=[("brand", "ascending"), ("photo_timestamp", "ascending")],
+            ipc_dir=ipc_dir,
+        )
+        self.brand_index = BrandIndex(self.df, presorted=True)
+        if rollups_path is not None and os.path.exists(rollups_path):
+            self.rollups = DailyRollups(pd.read_parquet(rollups_path))
+        else:
+            self.rollups = DailyRollups(compute_daily_rollups(self.df))
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - start
+
+
+def get_snapshot_version(path, rollups_path=None):
+    version = get_data_version(path)
+    if rollups_path is not None and os.path.exists(rollups_path):
+        version = "{}:{}".format(version, get_data_version(rollups_path))
+    return version
+
+
+class DataProvider:
+    """Lazily loaded, hot-reloaded dashboard data
+    The data is read on the first get() and the path is then polled every
+    poll_interval seconds by a background thread. A new snapshot is fully built
+    before it replaces the current one, so callbacks always see a consistent state.
+    on_load is called with every new snapshot
+    """
+
+    def __init__(
+        self, path, poll_interval=30, on_load=None, ipc_dir=None, rollups_path=None
+    ):
+        self.path = path
+        self.ipc_dir = ipc_dir
+        self.rollups_path = rollups_path
+        self.poll_interval = poll_interval
+        self.on_load = on_load
+        self.reload_errors = 0
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._swap(
+                        DataSnapshot(self.path, self.ipc_dir, self.rollups_path)
+                    )
+                    self._start_watcher()
+                snapshot = self._snapshot
+        return snapshot
+
+    @property
+    def is_loaded(self):
+        return self._snapshot is not None
+
+    def reload_if_changed(self):
+        """Load a new snapshot if the file changed, True if it was swapped in"""
+        version = get_snapshot_version(self.path, self.rollups_path)
+        if version == self._snapshot.version:
+            return False
+        snapshot = DataSnapshot(self.path, self.ipc_dir, self.rollups_path)
+        with self._lock:
+            self._swap(snapshot)
+        logger.info("Reloaded %s (version %s)", self.path, snapshot.version)
+        return True
+
+    def health(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"status": "not loaded", "path": self.path}
+        return {
+            "status": "ok",
+            "path": self.path,
+            "version": snapshot.version,
+            "n_rows": len(snapshot.df),
+            "loaded_at": snapshot.loaded_at,
+            "load_seconds": round(snapshot.load_seconds, 3),
+            "reload_errors": self.reload_errors,
+        }
+
+    def _swap(self, snapshot):
+        self._snapshot = snapshot
+        if self.on_load is not None:
+            self.on_load(snapshot)
+
+    def _start_watcher(self):
+        if self.poll_interval:
+            self._watcher = threading.Thread(target=self._watch, daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.reload_if_changed()
+            except Exception as error:
+                # a file being rewritten can fail to load, keep the current snapshot
+                self.reload_errors += 1
+                logger.warning("Failed to reload %s: %r", self.path, error)
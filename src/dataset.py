@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PARTITION_COLS = ["brand", "month"]
+
+
+def add_month_column(df, time_col):
+    """Posting month (YYYY-MM) used to partition the preprocessed datasets"""
+    df = df.copy()
+    df["month"] = df[time_col].dt.strftime("%Y-%m").fillna("unknown")
+    return df
+
+
+def write_partitioned_dataset(
+    df, path, time_col, overwrite=True, basename_template=None, row_group_size=50000
+):
+    """Write a preprocessed frame as a dataset partitioned by brand and month
+    Rows are sorted by brand and time_col so that row group statistics let the
+    reader skip row groups on time filters
+    """
+    if overwrite and os.path.exists(path):
+        shutil.rmtree(path)
+
+    df = add_month_column(df, time_col).sort_values(["brand", time_col])
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(
+        table,
+        path,
+        format="parquet",
+        partitioning=PARTITION_COLS,
+        partitioning_flavor="hive",
+        basename_template=basename_template or "part-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=row_group_size,
+        min_rows_per_group=min(row_group_size, len(df)),
+    )
+
+
+def read_partitioned_dataset(path, filters=None, columns=None):
+    """Read a partitioned dataset, pushing filters and columns down to the reader
+    filters use the pyarrow format, e.g. [("brand", "=", "Sandro"),
+    ("photo_timestamp", ">=", pd.Timestamp("2022-01-01"))]
+    """
+    table = pq.read_table(
+        path, columns=columns, filters=filters, partitioning="hive"
+    )
+    # files written separately have different dictionaries that pyarrow cannot
+    # always unify: decode them and restore the categories in pandas
+    categorical_cols = [
+        field.name for field in table.schema if pa.types.is_dictionary(field.type)
+    ]
+    table = table.cast(
+        pa.schema(
+            [
+                field.with_type(field.type.value_type)
+                if field.name in categorical_cols
+                else field
+                for field in table.schema
+            ],
+            metadata=table.schema.metadata,
+        )
+    )
+    df = table.to_pandas()
+    df[categorical_cols] = df[categorical_cols].astype("category")
+    return df
@@ -0,0 +1,140 @@
+import json
+import logging
+import re
+
+from bs4 import BeautifulSoup
+
+from src.utils import clean_text_scraped_dict
+
+logger = logging.getLogger(__name__)
+
+
+class SoupExtractor:
+    """Extract the scraped data from the full BeautifulSoup DOM of a page"""
+
+    def get_page_data(self, html):
+        return self.get_page_data_from_soup(self.make_soup(html))
+
+    def get_ad_data(self, html):
+        return self.get_ad_data_from_soup(self.make_soup(html))
+
+    def make_soup(self, html):
+        return BeautifulSoup(html, "html.parser")
+
+    def get_page_data_from_soup(self, soup):
+        page_main_script = soup.find(
+            "script", {"data-js-react-on-rails-store": "MainStore"}
+        )
+        page_main = json.loads(page_main_script.string)
+        return self.get_items_from_main_store(page_main)
+
+    def get_items_from_main_store(self, page_main):
+        items_dict = page_main["items"]["catalogItems"]["byId"]
+        return items_dict
+
+    def get_ad_data_from_soup(self, soup):
+        description = self.get_item_description_from_soup(soup)
+        user_info = self.get_item_user_info_from_soup(soup)
+        details = self.get_item_details_from_soup(soup)
+        return self.merge_ad_data(description, user_info, details)
+
+    def merge_ad_data(self, description, user_info, details):
+        description = {"ad_" + k: v for k, v in description.items()}
+        user_info = {"user_" + k: v for k, v in user_info.items()}
+        details = {"details_" + k: v for k, v in details.items()}
+
+        ad_dict = dict(description, **user_info, **details)
+        return ad_dict
+
+    def get_item_description_from_soup(self, soup):
+        source = soup.find("script", {"data-component-name": "ItemDescription"})
+        description = json.loads(source.string)["content"]
+        return description
+
+    def get_item_user_info_from_soup(self, soup):
+        source = soup.find("script", {"data-component-name": "ItemUserInfo"})
+        user_info = json.loads(source.string)["user"]
+        return user_info
+
+    def get_item_details_from_soup(self, soup):
+        item_details = soup.find("div", {"class": "details-list details-list--details"})
+        item_details_keys = item_details.findAll(
+            "div", {"class": "details-list__item-title"}
+        )
+        item_details_values = item_details.findAll(
+            "div", {"class": "details-list__item-value"}
+        )
+
+        details = {}
+        for it_key, it_val in zip(item_details_keys, item_details_values):
+            it_key = clean_text_scraped_dict(it_key.text)
+            if it_key == "Ajouté":
+                it_val = it_val.find("time")["datetime"]
+            else:
+                it_val = clean_text_scraped_dict(it_val.text)
+
+            details[it_key] = it_val
+
+        return details
+
+
+class ScanExtractor(SoupExtractor):
+    """Locate the json payloads with a byte-level scan of the raw html
+    Only the details-list fragment of ad pages goes through BeautifulSoup.
+    Fall back to the full DOM whenever the scan does not find what it expects
+    """
+
+    MAIN_STORE_RE = re.compile(
+        rb'<script\b[^>]*\bdata-js-react-on-rails-store="MainStore"[^>]*>(.*?)</script>',
+        re.DOTALL,
+    )
+    DESCRIPTION_RE = re.compile(
+        rb'<script\b[^>]*\bdata-component-name="ItemDescription"[^>]*>(.*?)</script>',
+        re.DOTALL,
+    )
+    USER_INFO_RE = re.compile(
+        rb'<script\b[^>]*\bdata-component-name="ItemUserInfo"[^>]*>(.*?)</script>',
+        re.DOTALL,
+    )
+    DETAILS_RE = re.compile(
+        rb'<div\b[^>]*\bclass="details-list details-list--details"[^>]*>'
+    )
+    DIV_TAG_RE = re.compile(rb"<(/?)div\b", re.IGNORECASE)
+
+    def get_page_data(self, html):
+        try:
+            page_main = self._scan_json(self.MAIN_STORE_RE, html)
+        except ValueError as error:
+            logger.debug("Fall back to the full DOM for the page: %s", error)
+            return super().get_page_data(html)
+        return self.get_items_from_main_store(page_main)
+
+    def get_ad_data(self, html):
+        try:
+            description = self._scan_json(self.DESCRIPTION_RE, html)["content"]
+            user_info = self._scan_json(self.USER_INFO_RE, html)["user"]
+            details_soup = self.make_soup(self._scan_details_fragment(html))
+            details = self.get_item_details_from_soup(details_soup)
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            logger.debug("Fall back to the full DOM for the ad: %s", error)
+            return super().get_ad_data(html)
+        return self.merge_ad_data(description, user_info, details)
+
+    def _scan_json(self, pattern, html):
+        match = pattern.search(html)
+        if match is None:
+            raise ValueError("Script not found: {}".format(pattern.pattern[:60]))
+        return json.loads(match.group(1).decode("utf-8"))
+
+    def _scan_details_fragment(self, html):
+        start = self.DETAILS_RE.search(html)
+        if start is None:
+            raise ValueError("Details list not found")
+
+        depth = 1
+        for tag in self.DIV_TAG_RE.finditer(html, start.end()):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                end = html.index(b">", tag.end()) + 1
+                return html[start.start() : end].decode("utf-8")
+        raise ValueError("Details list is not closed")
@@ -0,0 +1,139 @@
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def get_data_version(path):
+    """Version of a data file, changes whenever the file is rewritten"""
+    stat = os.stat(path)
+    return "{}-{}".format(stat.st_mtime_ns, stat.st_size)
+
+
+class FigureCache:
+    """LRU cache of dashboard figures keyed by (callback, arguments, data version)
+    At most max_size figures are kept in memory. With a cache_dir, figures are also
+    pickled to cache_dir/<version>/ so that several gunicorn workers share them.
+    Changing the data version drops the figures of the previous version
+    """
+
+    def __init__(self, max_size=256, cache_dir=None, version=None):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.version = version
+        self.figures = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def set_version(self, version):
+        with self._lock:
+            if version == self.version:
+                return
+            self.version = version
+            self.figures.clear()
+        if self.cache_dir is not None:
+            self._remove_stale_versions()
+
+    def memoize(self, func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            # the version is read before computing: if the data is swapped
+            # meanwhile, the figure is stored under the previous version
+            version = self.version
+            key = (func.__name__,) + args
+            figure = self.get(key, version)
+            if figure is None:
+                figure = func(*args)
+                self.put(key, figure, version)
+            return figure
+
+        return wrapper
+
+    def get(self, key, version=None):
+        version = self.version if version is None else version
+        with self._lock:
+            figure = self.figures.get((version, key))
+            if figure is not None:
+                self.figures.move_to_end((version, key))
+                self.hits += 1
+                return figure
+
+        figure = self._load(key, version)
+        with self._lock:
+            if figure is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self._put_memory(key, figure, version)
+        return figure
+
+    def put(self, key, figure, version=None):
+        version = self.version if version is None else version
+        with self._lock:
+            self._put_memory(key, figure, version)
+        self._save(key, figure, version)
+
+    def warm_up(self, callbacks, args_list):
+        """Compute the figures of every callback for every argument ahead of requests"""
+        for args in args_list:
+            for callback in callbacks:
+                callback(*args)
+        logger.info("Warmed up the figure cache with %s figures", len(self.figures))
+
+    def stats(self):
+        requests_count = self.hits + self.disk_hits + self.misses
+        return {
+            "version": self.version,
+            "size": len(self.figures),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / requests_count
+            if requests_count
+            else 0.0,
+        }
+
+    def _put_memory(self, key, figure, version):
+        self.figures[(version, key)] = figure
+        self.figures.move_to_end((version, key))
+        while len(self.figures) > self.max_size:
+            self.figures.popitem(last=False)
+
+    def _path(self, key, version):
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, str(version), digest + ".pkl")
+
+    def _load(self, key, version):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(key, version), "rb") as figure_file:
+                return pickle.load(figure_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _save(self, key, figure, version):
+        if self.cache_dir is None:
+            return
+        path = self._path(key, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as tmp_file:
+            pickle.dump(figure, tmp_file)
+        os.replace(tmp_path, path)
+
+    def _remove_stale_versions(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for version in os.listdir(self.cache_dir):
+            if version != str(self.version):
+                shutil.rmtree(os.path.join(self.cache_dir, version), ignore_errors=True)
@@ -0,0 +1,82 @@
+import argparse
+import json
+
+import src.config.constant_paths as cst_paths
+from src.config.custom_logging import logger
+from src.journal import ScrapeJob
+
+
+def start_job(args):
+    job = ScrapeJob.create(
+        args.job_dir,
+        args.scope_url,
+        max_pages=args.max_pages,
+        scrape_ads=not args.skip_ads,
+        max_workers=args.max_workers,
+        rate=args.rate,
+        row_group_size=args.row_group_size,
+        seen_index_path=args.seen_index,
+        publish=args.publish,
+    )
+    job.run()
+
+
+def resume_job(args):
+    logger.info("Resume job %s", args.job_dir)
+    ScrapeJob(args.job_dir).run()
+
+
+def publish_job(args):
+    ScrapeJob(args.job_dir).publish(args.pages_path, args.ads_path)
+
+
+def inspect_job(args):
+    print(json.dumps(ScrapeJob(args.job_dir).inspect(), indent=2))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Start, resume, publish and inspect scrape jobs"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    start = commands.add_parser("start", help="Start a new scrape job")
+    start.add_argument("job_dir")
+    start.add_argument("scope_url")
+    start.add_argument("--max-pages", type=int, default=25)
+    start.add_argument("--skip-ads", action="store_true")
+    start.add_argument("--max-workers", type=int, default=8)
+    start.add_argument("--rate", type=float, default=5)
+    start.add_argument("--row-group-size", type=int, default=1000)
+    start.add_argument(
+        "--seen-index", default=None, help="SeenAdsIndex sqlite file shared by jobs"
+    )
+    start.add_argument(
+        "--publish",
+        action="store_true",
+        help="Add the job output to the raw layer once the job is done",
+    )
+    start.set_defaults(func=start_job)
+
+    resume = commands.add_parser("resume", help="Resume an interrupted scrape job")
+    resume.add_argument("job_dir")
+    resume.set_defaults(func=resume_job)
+
+    publish = commands.add_parser(
+        "publish", help="Add the output of a job to the raw layer"
+    )
+    publish.add_argument("job_dir")
+    publish.add_argument("--pages-path", default=cst_paths.RAW_PAGES_DATASET_PATH)
+    publish.add_argument("--ads-path", default=cst_paths.RAW_ADS_DATASET_PATH)
+    publish.set_defaults(func=publish_job)
+
+    inspect = commands.add_parser("inspect", help="Show the progress of a scrape job")
+    inspect.add_argument("job_dir")
+    inspect.set_defaults(func=inspect_job)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import shutil
+import time
+
+import src.config.constant_paths as cst_paths
+from src.config.raw_schemas import raw_schema_ads, raw_schema_pages
+from src.scraper import AsyncVintedScraper, ParallelVintedAdScraper
+from src.seen_index import SeenAdsIndex
+from src.sink import ParquetSink, list_parts, read_parquet_sink
+
+logger = logging.getLogger(__name__)
+
+
+class JobJournal:
+    """Append-only jsonl journal of the page and ad urls completed by a job
+    An url is journaled as done only once all its rows are on disk, with the
+    [start, end) offsets of these rows in the output dataset
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, entry):
+        entry = dict(entry, logged_at=time.time())
+        with open(self.path, "a", encoding="utf-8") as journal_file:
+            journal_file.write(json.dumps(entry) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Last line cut by an interruption
+                    break
+        return entries
+
+    def done(self, kind):
+        return {
+            entry["url"]: entry
+            for entry in self.entries()
+            if entry["kind"] == kind and entry["status"] == "done"
+        }
+
+    def failed(self, kind):
+        done = self.done(kind)
+        return {
+            entry["url"]: entry
+            for entry in self.entries()
+            if entry["kind"] == kind
+            and entry["status"] == "failed"
+            and entry["url"] not in done
+        }
+
+    def rows_done(self, kind):
+        return max((entry["rows"][1] for entry in self.done(kind).values()), default=0)
+
+
+class PendingOutputs:
+    """Urls whose rows are written to a sink but not flushed to disk yet
+    on_commit(entry) is called for every url once it is journaled as done
+    """
+
+    def __init__(self, journal, kind, on_commit=None):
+        self.journal = journal
+        self.kind = kind
+        self.on_commit = on_commit
+        self.pending = []
+
+    def add(self, url, start, end, **extra):
+        self.pending.append((url, start, end, extra))
+
+    def commit(self, rows_written):
+        while self.pending and self.pending[0][2] <= rows_written:
+            url, start, end, extra = self.pending.pop(0)
+            entry = dict(
+                kind=self.kind, url=url, status="done", rows=[start, end], **extra
+            )
+            self.journal.append(entry)
+            if self.on_commit is not None:
+                self.on_commit(entry)
+
+
+class ScrapeJob:
+    """Scrape job (catalog pages of a scope, then their ad pages) that can be resumed
+    job_dir holds the job parameters, its journal and the pages/ads datasets.
+    A resumed job drops the rows written after the last journaled url and only
+    fetches the urls that are not done yet. With a seen_index_path, ads are
+    recorded in the SeenAdsIndex only once their rows are journaled as done.
+    With publish, the parts of a finished job are added to the raw layer
+    """
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.journal = JobJournal(os.path.join(job_dir, "journal.jsonl"))
+        self.pages_path = os.path.join(job_dir, "pages")
+        self.ads_path = os.path.join(job_dir, "ads")
+
+    @classmethod
+    def create(
+        cls,
+        job_dir,
+        scope_url,
+        max_pages=25,
+        scrape_ads=True,
+        max_workers=8,
+        rate=5,
+        row_group_size=1000,
+        seen_index_path=None,
+        publish=False,
+    ):
+        params_path = os.path.join(job_dir, "job.json")
+        if os.path.exists(params_path):
+            raise FileExistsError("A job already exists in {}".format(job_dir))
+
+        os.makedirs(job_dir, exist_ok=True)
+        params = {
+            "scope_url": scope_url,
+            "max_pages": max_pages,
+            "scrape_ads": scrape_ads,
+            "max_workers": max_workers,
+            "rate": rate,
+            "row_group_size": row_group_size,
+            "seen_index_path": seen_index_path,
+            "publish": publish,
+            "created_at": time.time(),
+        }
+        with open(params_path, "w", encoding="utf-8") as params_file:
+            json.dump(params, params_file, indent=2)
+        return cls(job_dir)
+
+    @property
+    def params(self):
+        with open(os.path.join(self.job_dir, "job.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def run(self):
+        params = self.params
+        seen_index = None
+        if params.get("seen_index_path"):
+            seen_index = SeenAdsIndex(params["seen_index_path"])
+
+        self.journal.append({"kind": "job", "url": self.job_dir, "status": "started"})
+        try:
+            self._run_pages(params, seen_index)
+            if params["scrape_ads"]:
+                self._run_ads(params, seen_index)
+        finally:
+            if seen_index is not None:
+                seen_index.close()
+        self.journal.append({"kind": "job", "url": self.job_dir, "status": "done"})
+        logger.info("Job %s done: %s", self.job_dir, self.inspect())
+        if params.get("publish"):
+            self.publish()
+
+    def publish(
+        self,
+        pages_path=cst_paths.RAW_PAGES_DATASET_PATH,
+        ads_path=cst_paths.RAW_ADS_DATASET_PATH,
+    ):
+        """Add the parts of the job to the raw pages / ads datasets
+        Parts are named after the job so that the jobs publishing to the same raw
+        layer never collide, and publishing a job twice is a no-op. Each part is
+        copied to a .tmp file first, so readers never see a partial part
+        """
+        job_name = "{}-{}".format(
+            int(self.params["created_at"]),
+            os.path.basename(os.path.normpath(self.job_dir)),
+        )
+        n_published = 0
+        for job_path, raw_path in [
+            (self.pages_path, pages_path),
+            (self.ads_path, ads_path),
+        ]:
+            os.makedirs(raw_path, exist_ok=True)
+            for part in list_parts(job_path):
+                part_name = os.path.basename(part)[len("part-") :]
+                raw_part = os.path.join(
+                    raw_path, "part-{}-{}".format(job_name, part_name)
+                )
+                if os.path.exists(raw_part):
+                    continue
+                shutil.copyfile(part, raw_part + ".tmp")
+                os.replace(raw_part + ".tmp", raw_part)
+                n_published += 1
+        logger.info("Published %s parts of job %s", n_published, self.job_dir)
+        return n_published
+
+    def _run_pages(self, params, seen_index=None):
+        scraper = AsyncVintedScraper(
+            params["scope_url"],
+            params["max_pages"],
+            max_concurrency=params["max_workers"],
+            seen_index=seen_index,
+        )
+        done = self.journal.done("page")
+        urls = [url for url in scraper.get_url_pages_in_scope() if url not in done]
+        logger.info("%s pages done, %s pages to scrape", len(done), len(urls))
+
+        pending = PendingOutputs(
+            self.journal, "page", lambda entry: scraper.commit_seen([entry["url"]])
+        )
+        sink = ParquetSink(
+            self.pages_path,
+            params["row_group_size"],
+            on_flush=lambda _, rows_written: pending.commit(rows_written),
+            schema=raw_schema_pages,
+        )
+        sink.truncate(self.journal.rows_done("page"))
+        for url, items_dict in scraper.iter_pages_by_url(urls):
+            start = sink.rows_written + len(sink.buffer)
+            pending.add(url, start, start + len(items_dict))
+            sink.write_records(items_dict.items())
+        sink.close()
+        pending.commit(sink.rows_written)
+
+        for url, error in scraper.failed_pages.items():
+            self.journal.append(
+                {"kind": "page", "url": url, "status": "failed", "error": repr(error)}
+            )
+
+    def _run_ads(self, params, seen_index=None):
+        pages_df = read_parquet_sink(self.pages_path, columns=["id", "url"])
+        pages_df = pages_df.drop_duplicates("id")
+        done = self.journal.done("ad")
+        todo_df = pages_df[~pages_df["url"].isin(done)]
+        logger.info("%s ads done, %s ads to scrape", len(done), len(todo_df))
+
+        scraper = ParallelVintedAdScraper(
+            list(todo_df["url"]),
+            list(todo_df["id"]),
+            max_workers=params["max_workers"],
+            rate=params["rate"],
+            seen_index=seen_index,
+        )
+        ads_urls = dict(zip(todo_df["id"], todo_df["url"]))
+
+        pending = PendingOutputs(
+            self.journal, "ad", lambda entry: scraper.commit_seen([entry["ad_id"]])
+        )
+        sink = ParquetSink(
+            self.ads_path,
+            params["row_group_size"],
+            on_flush=lambda _, rows_written: pending.commit(rows_written),
+            schema=raw_schema_ads,
+        )
+        sink.truncate(self.journal.rows_done("ad"))
+        for id_, ad_dict in scraper.iter_ads():
+            start = sink.rows_written + len(sink.buffer)
+            pending.add(ads_urls[id_], start, start + 1, ad_id=str(id_))
+            sink.write(id_, ad_dict)
+        sink.close()
+        pending.commit(sink.rows_written)
+
+        for id_, error in scraper.failed_ads.items():
+            self.journal.append(
+                {
+                    "kind": "ad",
+                    "url": ads_urls[id_],
+                    "ad_id": str(id_),
+                    "status": "failed",
+                    "error": repr(error),
+                }
+            )
+
+    def inspect(self):
+        entries = self.journal.entries()
+        job_status = [entry["status"] for entry in entries if entry["kind"] == "job"]
+        return {
+            "job_dir": self.job_dir,
+            "scope_url": self.params["scope_url"],
+            "status": job_status[-1] if job_status else "created",
+            "pages_done": len(self.journal.done("page")),
+            "pages_failed": len(self.journal.failed("page")),
+            "pages_rows": self.journal.rows_done("page"),
+            "ads_done": len(self.journal.done("ad")),
+            "ads_failed": len(self.journal.failed("ad")),
+            "ads_rows": self.journal.rows_done("ad"),
+        }
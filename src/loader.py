@@ -1,7 +1,22 @@
+import json
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from src.preprocess import VintedPagesProcessor, VintedAdsProcessor
 import src.config.constant_paths as cst_paths
 import src.config.constants as cst
+from src.config.custom_logging import logger
+from src.config.raw_schemas import raw_schema_pages, raw_schema_ads
+from src.dataset import read_partitioned_dataset, write_partitioned_dataset
+from src.rollups import update_daily_rollups
+from src.sink import list_parts
+from src.text_index import TextIndex
+from src.upsert import PartitionedStore
 
 
 def load_preprocessed_vinted_data():
@@ -10,17 +25,307 @@ def load_preprocessed_vinted_data():
     return pages_df, ads_df
 
 
-def preprocess_save_raw_vinted_data():
-    pages_df = pd.read_csv(cst_paths.RAW_PAGES_PATH)
+def load_preprocessed_vinted_dataset(kind, filters=None, columns=None):
+    """Read the brand/month partitioned preprocessed pages or ads
+    Only the partitions and row groups matching filters and the requested columns
+    are read, e.g. load_preprocessed_vinted_dataset("pages", [("brand", "=", "Maje")])
+    """
+    path = {
+        "pages": cst_paths.PREP_PAGES_DATASET_PATH,
+        "ads": cst_paths.PREP_ADS_DATASET_PATH,
+    }[kind]
+    return read_partitioned_dataset(path, filters, columns)
+
+
+def load_raw_vinted_dataset(path, schema):
+    """Read the typed raw layer written by the scrapers, only the schema columns
+    Only the complete part files are read, not the .tmp of a part being written
+    """
+    parts = list_parts(path)
+    if not parts:
+        return schema.empty_table().to_pandas()
+    table = pq.read_table(parts, columns=schema.names)
+    return table.to_pandas()
+
+
+def preprocess_save_raw_vinted_data(raw_format="csv"):
+    if raw_format == "parquet":
+        pages_df = load_raw_vinted_dataset(
+            cst_paths.RAW_PAGES_DATASET_PATH, raw_schema_pages
+        )
+    else:
+        pages_df = pd.read_csv(cst_paths.RAW_PAGES_PATH)
     pages_processor = VintedPagesProcessor(pages_df, save_output=True)
     pages_processor.preprocess_pages()
 
-    ads_df = pd.read_csv(
-        cst_paths.RAW_ADS_PATH, parse_dates=cst.time_cols_ads, low_memory=False
-    )
+    if raw_format == "parquet":
+        ads_df = load_raw_vinted_dataset(cst_paths.RAW_ADS_DATASET_PATH, raw_schema_ads)
+    else:
+        ads_df = pd.read_csv(
+            cst_paths.RAW_ADS_PATH, parse_dates=cst.time_cols_ads, low_memory=False
+        )
     ads_processor = VintedAdsProcessor(ads_df, save_output=True)
     ads_processor.preprocess_ads()
 
 
+
+#### Chunked preprocessing
+def preprocess_pages_chunk(pages_df):
+    pages_processor = VintedPagesProcessor(pages_df, copy=False)
+    pages_processor.preprocess_pages()
+    return pages_processor.pages_df
+
+
+def preprocess_ads_chunk(ads_df):
+    ads_processor = VintedAdsProcessor(ads_df, copy=False, build_text_index=False)
+    ads_processor.preprocess_ads()
+    return ads_processor.ads_df
+
+
+def iter_raw_vinted_chunks(raw_format, csv_path, dataset_path, schema, chunk_size):
+    """Yield the raw data in chunks of chunk_size rows
+    Chunks are indexed by their row number in the whole raw data, as csv chunks are
+    """
+    if raw_format == "parquet":
+        n_rows = 0
+        for part in list_parts(dataset_path):
+            batches = pq.ParquetFile(part).iter_batches(
+                batch_size=chunk_size, columns=schema.names
+            )
+            for batch in batches:
+                chunk = batch.to_pandas()
+                chunk.index = pd.RangeIndex(n_rows, n_rows + len(chunk))
+                n_rows += len(chunk)
+                yield chunk
+    else:
+        parse_dates = cst.time_cols_ads if schema is raw_schema_ads else None
+        yield from pd.read_csv(
+            csv_path, chunksize=chunk_size, parse_dates=parse_dates, low_memory=False
+        )
+
+
+def align_to_schema(df, schema):
+    """Arrow table of a preprocessed chunk with the columns types of the first chunk"""
+    for field in schema:
+        if pa.types.is_string(field.type) and df[field.name].dtype != object:
+            col = df[field.name]
+            df[field.name] = col.astype(object).where(col.isna(), col.astype(str))
+    return pa.Table.from_pandas(df, schema=schema, safe=False)
+
+
+def widen_field(field):
+    """Writer field type able to hold the values of every chunk
+    All-null columns become strings and categoricals get int32 codes, since later
+    chunks may have more categories than the first one
+    """
+    if pa.types.is_null(field.type):
+        return field.with_type(pa.string())
+    if pa.types.is_dictionary(field.type):
+        return field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+    return field
+
+
+def write_chunks_in_order(
+    chunks,
+    preprocess_chunk,
+    output_path,
+    max_workers=None,
+    dataset_path=None,
+    time_col=None,
+):
+    """Preprocess chunks in a process pool and append them in order to output_path
+    At most 2 * max_workers chunks are in flight so memory stays bounded. With a
+    dataset_path, every chunk is also added to the brand/month partitioned dataset
+    """
+    max_workers = max_workers or os.cpu_count()
+    writer = None
+    n_rows = 0
+    n_chunks = 0
+
+    def write(processed_df):
+        nonlocal writer, n_rows, n_chunks
+        if dataset_path is not None:
+            write_partitioned_dataset(
+                processed_df,
+                dataset_path,
+                time_col,
+                overwrite=n_chunks == 0,
+                basename_template="chunk-{}-{{i}}.parquet".format(n_chunks),
+            )
+        n_chunks += 1
+        if writer is None:
+            schema = pa.Schema.from_pandas(processed_df)
+            schema = pa.schema(
+                [widen_field(field) for field in schema], metadata=schema.metadata
+            )
+            writer = pq.ParquetWriter(output_path + ".tmp", schema)
+        writer.write_table(align_to_schema(processed_df, writer.schema))
+        n_rows += len(processed_df)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(preprocess_chunk, chunk))
+            if len(in_flight) >= 2 * max_workers:
+                write(in_flight.popleft().result())
+        while in_flight:
+            write(in_flight.popleft().result())
+
+    if writer is not None:
+        writer.close()
+        os.replace(output_path + ".tmp", output_path)
+    logger.info("Saved %s preprocessed rows to %s", n_rows, output_path)
+
+
+def preprocess_save_raw_vinted_data_chunked(
+    raw_format="csv", chunk_size=100000, max_workers=None
+):
+    """Chunked preprocess_save_raw_vinted_data, run on all cores with bounded memory"""
+    pages_chunks = iter_raw_vinted_chunks(
+        raw_format,
+        cst_paths.RAW_PAGES_PATH,
+        cst_paths.RAW_PAGES_DATASET_PATH,
+        raw_schema_pages,
+        chunk_size,
+    )
+    write_chunks_in_order(
+        pages_chunks,
+        preprocess_pages_chunk,
+        cst_paths.PREP_PAGES_PATH,
+        max_workers,
+        cst_paths.PREP_PAGES_DATASET_PATH,
+        "photo_timestamp",
+    )
+
+    ads_chunks = iter_raw_vinted_chunks(
+        raw_format,
+        cst_paths.RAW_ADS_PATH,
+        cst_paths.RAW_ADS_DATASET_PATH,
+        raw_schema_ads,
+        chunk_size,
+    )
+    write_chunks_in_order(
+        ads_chunks,
+        preprocess_ads_chunk,
+        cst_paths.PREP_ADS_PATH,
+        max_workers,
+        cst_paths.PREP_ADS_DATASET_PATH,
+        "ad_posting_date",
+    )
+
+    # the text index spans all the chunks, it is built once from the output
+    text_df = pd.read_parquet(
+        cst_paths.PREP_ADS_PATH, columns=["ad_id", "ad_title", "ad_description"]
+    )
+    TextIndex.build(text_df).save(cst_paths.PREP_ADS_TEXT_INDEX_PATH)
+
+    rollup_df = pd.read_parquet(
+        cst_paths.PREP_PAGES_PATH,
+        columns=["brand", "photo_timestamp", "price", "view_count", "favourite_count"],
+    )
+    update_daily_rollups(cst_paths.PREP_PAGES_ROLLUPS_PATH, rollup_df, overwrite=True)
+
+
+#### Incremental preprocessing
+RAW_PARTS_STATE_NAME = "_raw_parts.json"
+
+
+def get_part_signature(part):
+    stat = os.stat(part)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_raw_parts_state(dataset_path):
+    try:
+        with open(os.path.join(dataset_path, RAW_PARTS_STATE_NAME)) as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_raw_parts_state(dataset_path, state):
+    fd, tmp_path = tempfile.mkstemp(dir=dataset_path)
+    with os.fdopen(fd, "w") as tmp_file:
+        json.dump(state, tmp_file)
+    os.replace(tmp_path, os.path.join(dataset_path, RAW_PARTS_STATE_NAME))
+
+
+def upsert_new_raw_parts(raw_path, schema, preprocess_chunk, dataset_path, time_col):
+    """Preprocess the raw parts added or rewritten since the last run and upsert
+    them by ad_id into the partitioned dataset, returns the (brand, month)
+    partitions rewritten
+    """
+    store = PartitionedStore(dataset_path, time_col)
+    state = load_raw_parts_state(dataset_path)
+    new_parts = [
+        part
+        for part in list_parts(raw_path)
+        if state.get(os.path.basename(part)) != get_part_signature(part)
+    ]
+    partitions = set()
+    for part in new_parts:
+        signature = get_part_signature(part)
+        raw_df = pq.read_table(part, columns=schema.names).to_pandas()
+        partitions |= store.upsert(preprocess_chunk(raw_df))
+        state[os.path.basename(part)] = signature
+        save_raw_parts_state(dataset_path, state)
+    store.close()
+    logger.info("Upserted %s new raw parts into %s", len(new_parts), dataset_path)
+    return partitions
+
+
+def update_pages_rollups(partitions):
+    """Recompute the daily rollups of the given (brand, month) pages partitions"""
+    partitions = [(brand, month) for brand, month in partitions if brand is not None]
+    if not partitions:
+        return
+    filters = [
+        [("brand", "=", brand), ("month", "=", month)] for brand, month in partitions
+    ]
+    pages_df = read_partitioned_dataset(
+        cst_paths.PREP_PAGES_DATASET_PATH,
+        filters,
+        ["brand", "photo_timestamp", "price", "view_count", "favourite_count"],
+    )
+    update_daily_rollups(cst_paths.PREP_PAGES_ROLLUPS_PATH, pages_df, partitions)
+
+
+def preprocess_save_raw_vinted_data_incremental(refresh_outputs=True):
+    """Incremental preprocess_save_raw_vinted_data over the typed raw layer
+    Only the raw parquet parts not processed yet are preprocessed, and they are
+    merged by ad_id (last write wins) into the partitioned datasets, rewriting only
+    the partitions they touch. With refresh_outputs, the single-file outputs and the
+    ads text index are then rewritten from the datasets when anything changed.
+    The daily rollups of the rewritten pages partitions are always recomputed.
+    A full run rewrites the datasets, so the next incremental run upserts every part
+    """
+    pages_partitions = upsert_new_raw_parts(
+        cst_paths.RAW_PAGES_DATASET_PATH,
+        raw_schema_pages,
+        preprocess_pages_chunk,
+        cst_paths.PREP_PAGES_DATASET_PATH,
+        "photo_timestamp",
+    )
+    ads_partitions = upsert_new_raw_parts(
+        cst_paths.RAW_ADS_DATASET_PATH,
+        raw_schema_ads,
+        preprocess_ads_chunk,
+        cst_paths.PREP_ADS_DATASET_PATH,
+        "ad_posting_date",
+    )
+    update_pages_rollups(pages_partitions)
+    if not refresh_outputs:
+        return
+
+    if pages_partitions:
+        pages_df = read_partitioned_dataset(cst_paths.PREP_PAGES_DATASET_PATH)
+        pages_df.drop(columns="month").to_parquet(cst_paths.PREP_PAGES_PATH)
+    if ads_partitions:
+        ads_df = read_partitioned_dataset(cst_paths.PREP_ADS_DATASET_PATH)
+        ads_df = ads_df.drop(columns="month")
+        ads_df.to_parquet(cst_paths.PREP_ADS_PATH)
+        TextIndex.build(ads_df).save(cst_paths.PREP_ADS_TEXT_INDEX_PATH)
+
+
 if __name__ == "__main__":
     preprocess_save_raw_vinted_data()
@@ -0,0 +1,83 @@
+import ast
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+LITERAL_TOKEN_RE = re.compile(r"'([^'\\]*)'|\"([^\"\\]*)\"|\b(True|False|None)\b")
+JSON_CONSTANTS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _convert_literal_token(match):
+    single_quoted, double_quoted, constant = match.groups()
+    if constant is not None:
+        return JSON_CONSTANTS[constant]
+    return json.dumps(single_quoted if single_quoted is not None else double_quoted)
+
+
+def literal_to_json(value):
+    """Translate the repr of a dict into json, None if it cannot be done safely"""
+    if "\\" in value:
+        return None
+    return LITERAL_TOKEN_RE.sub(_convert_literal_token, value)
+
+
+def parse_literal(value):
+    """Parse a dict stored as its Python repr (raw csv), without eval"""
+    if not isinstance(value, str):
+        return value
+    json_value = literal_to_json(value)
+    if json_value is not None:
+        try:
+            return json.loads(json_value)
+        except ValueError:
+            pass
+    return ast.literal_eval(value)
+
+
+def parse_literals(values):
+    """Parse a batch of reprs with a single json.loads, item by item on failure"""
+    json_values = [
+        literal_to_json(value) if isinstance(value, str) else None for value in values
+    ]
+    if all(json_value is not None for json_value in json_values):
+        try:
+            parsed = json.loads("[" + ",".join(json_values) + "]")
+        except ValueError:
+            pass
+        else:
+            if len(parsed) == len(values):
+                return parsed
+    return [parse_literal(value) for value in values]
+
+
+def get_path(record, path):
+    """Value at a dotted path of a nested dict (as flattened by pd.json_normalize)"""
+    for key in path.split("."):
+        if not isinstance(record, dict) or key not in record:
+            return np.nan
+        record = record[key]
+    return record
+
+
+def extract_literal_fields(series, fields, missing=np.nan):
+    """Extract the dotted fields of a column of stringified dicts
+    Each distinct string is parsed once, and only the requested fields are kept.
+    Columns read from the typed raw layer already hold dicts and are not parsed.
+    Cells with no value get `missing` for every field
+    """
+    if pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        codes, uniques = pd.factorize(series)
+        parsed = parse_literals(list(uniques))
+    else:
+        codes = np.where(series.isna(), -1, np.arange(len(series)))
+        parsed = list(series)
+
+    columns = {}
+    for field in fields:
+        values = np.empty(len(parsed) + 1, dtype=object)
+        values[:-1] = [get_path(record, field) for record in parsed]
+        values[-1] = missing
+        columns[field] = pd.Series(list(values[codes]), index=series.index)
+    return pd.DataFrame(columns, index=series.index)
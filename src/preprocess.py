@@ -6,12 +6,18 @@ from datetime import datetime
 import src.config.constants as cst
 import src.config.constant_paths as cst_paths
 from src.config.custom_logging import logger
+from src.dataset import write_partitioned_dataset
+from src.parsing import extract_literal_fields
+from src.rollups import update_daily_rollups
+from src.text_index import TextIndex
+from src.utils import get_memory_usage, memory_usage_report
 
 ### Pages
 class VintedPagesProcessor:
-    def __init__(self, pages_df, save_output=False):
-        self.pages_df = pages_df.copy()
+    def __init__(self, pages_df, save_output=False, copy=True):
+        self.pages_df = pages_df.copy() if copy else pages_df
         self.save_output = save_output
+        self.memory_report = None
 
     def preprocess_pages(self):
         logger.info("Preprocess raw pages")
@@ -33,31 +39,18 @@ class VintedPagesProcessor:
         )
 
     def _extract_user_data(self):
-        users_df = pd.json_normalize(
-            self.pages_df["user"].apply(lambda u_dict: eval(u_dict))
+        users_df = extract_literal_fields(
+            self.pages_df["user"], cst.user_fields_pages
         ).add_prefix("user_")
-        users_df.index = self.pages_df.index
         self.pages_df = self.pages_df.drop("user", axis=1)
         self.pages_df = pd.concat([self.pages_df, users_df], axis=1)
 
     def _extract_photo_data(self):
-        photos_df = pd.json_normalize(
-            self.pages_df["photo"].apply(lambda p: {} if p is np.nan else eval(p))
-        )
+        photos_df = extract_literal_fields(
+            self.pages_df["photo"], cst.photo_fields_pages
+        ).rename(columns=cst.photo_fields_pages)
         self.pages_df = self.pages_df.drop("photo", axis=1)
-        photos_df.index = self.pages_df.index
-        self.pages_df = pd.concat(
-            [
-                self.pages_df,
-                photos_df[["url", "high_resolution.timestamp"]].rename(
-                    columns={
-                        "url": "photo_url",
-                        "high_resolution.timestamp": "photo_timestamp",
-                    }
-                ),
-            ],
-            axis=1,
-        )
+        self.pages_df = pd.concat([self.pages_df, photos_df], axis=1)
         self.pages_df["photo_timestamp"] = (
             self.pages_df["photo_timestamp"]
             .fillna(0)
@@ -75,23 +68,40 @@ class VintedPagesProcessor:
 
     def _fix_column_types(self):
         logger.info("Fix column types in pages")
+        memory_before = get_memory_usage(self.pages_df)
         for col, type_ in cst.coltypes_pages.items():
             if "id" in col:
                 self.pages_df[col] = self.pages_df[col].astype(int).astype(type_)
             else:
                 self.pages_df[col] = self.pages_df[col].astype(type_)
+        self.memory_report = memory_usage_report(
+            memory_before, get_memory_usage(self.pages_df)
+        )
+        logger.info(
+            "Pages memory usage: %.1f MB -> %.1f MB",
+            *self.memory_report.loc["total", ["memory_mb_before", "memory_mb_after"]],
+        )
 
     def _save_preprocessed_pages(self):
         if self.save_output:
             self.pages_df.to_parquet(cst_paths.PREP_PAGES_PATH)
+            write_partitioned_dataset(
+                self.pages_df, cst_paths.PREP_PAGES_DATASET_PATH, "photo_timestamp"
+            )
+            update_daily_rollups(
+                cst_paths.PREP_PAGES_ROLLUPS_PATH, self.pages_df, overwrite=True
+            )
             logger.info("Saved preprocessed pages")
 
 
 #### Ads
 class VintedAdsProcessor:
-    def __init__(self, ads_df, save_output=False):
-        self.ads_df = ads_df.copy()
+    def __init__(self, ads_df, save_output=False, copy=True, build_text_index=True):
+        self.ads_df = ads_df.copy() if copy else ads_df
         self.save_output = save_output
+        self.build_text_index = build_text_index
+        self.memory_report = None
+        self.text_index = None
 
     def preprocess_ads(self):
         logger.info("Preprocess raw ads")
@@ -104,6 +114,7 @@ class VintedAdsProcessor:
         self._filter_relevant_cols()
         self._rename_columns()
         self._fix_column_types()
+        self._build_text_index()
         self._save_preprocessed_ads()
 
     def _convert_time_columns(self):
@@ -125,15 +136,9 @@ class VintedAdsProcessor:
         )
 
     def _clean_bundle_status(self):
-        def extract_bundle_status(bundle):
-            if bundle is np.nan:
-                return False
-            else:
-                return eval(bundle)["enabled"]
-
-        self.ads_df["user_bundle_discount"] = self.ads_df["user_bundle_discount"].apply(
-            lambda bundle: extract_bundle_status(bundle)
-        )
+        self.ads_df["user_bundle_discount"] = extract_literal_fields(
+            self.ads_df["user_bundle_discount"], ["enabled"], missing=False
+        )["enabled"]
 
     def _clean_counts(self):
         check_cols = list(
@@ -156,13 +161,35 @@ class VintedAdsProcessor:
 
     def _fix_column_types(self):
         logger.info("Fix column types in ads")
+        memory_before = get_memory_usage(self.ads_df)
         for col, type_ in cst.coltypes_ads.items():
             if "_id" in col:
-                self.ads_df[col] = self.ads_df[col].astype(type_).replace(".0", "")
+                self.ads_df[col] = (
+                    self.ads_df[col].astype("string").astype(type_).replace(".0", "")
+                )
+            elif type_.startswith(("Int", "float")):
+                self.ads_df[col] = pd.to_numeric(self.ads_df[col]).astype(type_)
             else:
                 self.ads_df[col] = self.ads_df[col].astype(type_)
+        self.memory_report = memory_usage_report(
+            memory_before, get_memory_usage(self.ads_df)
+        )
+        logger.info(
+            "Ads memory usage: %.1f MB -> %.1f MB",
+            *self.memory_report.loc["total", ["memory_mb_before", "memory_mb_after"]],
+        )
+
+    def _build_text_index(self):
+        if self.build_text_index:
+            logger.info("Build text index of ads")
+            self.text_index = TextIndex.build(self.ads_df)
 
     def _save_preprocessed_ads(self):
         if self.save_output:
             self.ads_df.to_parquet(cst_paths.PREP_ADS_PATH)
+            write_partitioned_dataset(
+                self.ads_df, cst_paths.PREP_ADS_DATASET_PATH, "ad_posting_date"
+            )
+            if self.text_index is not None:
+                self.text_index.save(cst_paths.PREP_ADS_TEXT_INDEX_PATH)
             logger.info("Saved preprocessed ads")
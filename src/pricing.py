@@ -0,0 +1,199 @@
+import logging
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import src.config.constants as cst
+
+logger = logging.getLogger(__name__)
+
+
+def to_naive_utc(series):
+    series = pd.to_datetime(series, errors="coerce", utc=True)
+    return series.dt.tz_convert(None)
+
+
+def add_listing_age(df, reference_date):
+    """Days between the posting of each listing (photo_timestamp) and reference_date"""
+    if "listing_age_days" not in df and "photo_timestamp" in df:
+        posted_at = to_naive_utc(df["photo_timestamp"])
+        age = (pd.Timestamp(reference_date) - posted_at).dt.total_seconds() / 86400
+        df = df.assign(listing_age_days=age.clip(lower=0))
+    return df
+
+
+def build_listings_frame(pages_df, ads_df):
+    """Priced listings of the pages, with the details of the ads scraped for them"""
+    ads_df = ads_df[cst.pricing_cols_ads].drop_duplicates("ad_id")
+    ads_df = ads_df.astype({"ad_id": str})
+    pages_df = pages_df[pages_df["price"].notna()].astype({"ad_id": str})
+    return pages_df.merge(ads_df, on="ad_id", how="left")
+
+
+class FeatureEncoder:
+    """Turn listings into a dense float32 feature matrix
+    Categorical features are one-hot encoded on the values seen at least min_count
+    times at fit time (unknown values are all zeros), numeric features are
+    log1p-transformed when heavy-tailed, filled with the fitted mean and scaled
+    """
+
+    def __init__(self, min_count=5):
+        self.min_count = min_count
+        self.vocabularies = {}
+        self.offsets = {}
+        self.means = {}
+        self.stds = {}
+        self.n_features = 0
+
+    def fit(self, df):
+        offset = 0
+        for col in cst.categorical_features:
+            counts = self._split_values(df, col).value_counts()
+            self.vocabularies[col] = pd.Index(
+                counts[counts >= self.min_count].index.astype(str)
+            )
+            self.offsets[col] = offset
+            offset += len(self.vocabularies[col])
+
+        for col in cst.numeric_features:
+            values = self._numeric_values(df, col)
+            self.means[col] = np.nanmean(values) if np.isfinite(values).any() else 0.0
+            std = np.nanstd(values) if np.isfinite(values).any() else 0.0
+            self.stds[col] = std if std > 0 else 1.0
+            self.offsets[col] = offset
+            offset += 1
+        self.n_features = offset
+        return self
+
+    def transform(self, df):
+        X = np.zeros((len(df), self.n_features), dtype="float32")
+        for col in cst.categorical_features:
+            values = self._split_values(df, col)
+            codes = self.vocabularies[col].get_indexer(values.astype(str))
+            known = (codes >= 0) & values.notna().to_numpy()
+            X[values.index[known], self.offsets[col] + codes[known]] = 1
+
+        for col in cst.numeric_features:
+            values = self._numeric_values(df, col)
+            values = np.where(np.isfinite(values), values, self.means[col])
+            X[:, self.offsets[col]] = (values - self.means[col]) / self.stds[col]
+        return X
+
+    def get_feature_names(self):
+        names = [
+            "{}={}".format(col, value)
+            for col in cst.categorical_features
+            for value in self.vocabularies[col]
+        ]
+        return names + list(cst.numeric_features)
+
+    def _split_values(self, df, col):
+        """Values of a categorical column indexed by row position, one per value"""
+        if col not in df:
+            return pd.Series([], dtype=object)
+        values = pd.Series(df[col].astype(object).to_numpy())
+        if col in cst.multi_valued_features:
+            values = values.str.split(cst.multi_valued_features[col]).explode()
+        return values.dropna()
+
+    def _numeric_values(self, df, col):
+        if col not in df:
+            return np.full(len(df), np.nan)
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(
+            dtype="float64", na_value=np.nan
+        )
+        if col in cst.log_features:
+            values = np.log1p(np.clip(values, 0, None))
+        return values
+
+
+class RidgePriceModel:
+    """Ridge regression of log(1 + price) solved in closed form with NumPy
+    The intercept is not penalized
+    """
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+        self.weights = None
+        self.intercept = 0.0
+
+    def fit(self, X, prices):
+        y = np.log1p(prices)
+        X_mean = X.mean(axis=0, dtype="float64")
+        y_mean = y.mean()
+        Xc = X - X_mean
+        gram = Xc.T @ Xc + self.alpha * np.eye(X.shape[1])
+        self.weights = np.linalg.solve(gram, Xc.T @ (y - y_mean)).astype("float32")
+        self.intercept = y_mean - X_mean @ self.weights
+        return self
+
+    def predict(self, X):
+        return np.expm1(X @ self.weights + self.intercept)
+
+
+class PricingEngine:
+    """Fitted encoder and price model, scoring batches of listings
+    Listings are dicts / frame rows with any of the pricing features, missing
+    features fall back to the training average. The fitted engine is pickled so
+    that dashboard workers load it instead of refitting, along with the version of
+    the data it was fitted on
+    """
+
+    def __init__(self, alpha=1.0, min_count=5):
+        self.encoder = FeatureEncoder(min_count)
+        self.model = RidgePriceModel(alpha)
+        self.reference_date = None
+        self.source_version = None
+
+    def fit(self, pages_df, ads_df, source_version=None):
+        listings_df = build_listings_frame(pages_df, ads_df)
+        self.reference_date = to_naive_utc(listings_df["photo_timestamp"]).max()
+        listings_df = add_listing_age(listings_df, self.reference_date)
+        X = self.encoder.fit(listings_df).transform(listings_df)
+        self.model.fit(X, listings_df["price"].to_numpy(dtype="float64"))
+        self.source_version = source_version
+        logger.info(
+            "Fitted pricing model on %s listings, %s features", *X.shape
+        )
+        return self
+
+    def predict(self, listings, reference_date=None):
+        """Predicted prices of a list of listing dicts or a frame of listings
+        Listing age is computed at reference_date, by default the reference date
+        of the training data, which is the scale the model learnt ages on
+        """
+        listings_df = pd.DataFrame(listings).reset_index(drop=True)
+        if reference_date is None:
+            reference_date = self.reference_date
+        listings_df = add_listing_age(listings_df, reference_date)
+        return self.model.predict(self.encoder.transform(listings_df))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+        with os.fdopen(fd, "wb") as tmp_file:
+            pickle.dump(self, tmp_file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as engine_file:
+            return pickle.load(engine_file)
+
+    @classmethod
+    def load_or_fit(cls, path, pages_path, ads_path, source_version=None, **params):
+        """Load the engine saved at path, fit and save it when there is none or
+        when it was fitted on another version of the data than source_version
+        """
+        if os.path.exists(path):
+            engine = cls.load(path)
+            if getattr(engine, "source_version", None) == source_version:
+                return engine
+        engine = cls(**params).fit(
+            pd.read_parquet(pages_path), pd.read_parquet(ads_path), source_version
+        )
+        engine.save(path)
+        return engine
@@ -0,0 +1,37 @@
+import pandas as pd
+
+
+class RecordBuffer:
+    """Append-only buffer of scraped records
+    Records are kept as plain dicts and turned into a DataFrame once, in chunks of
+    chunk_size rows, instead of concatenating a growing frame after every page
+    """
+
+    def __init__(self, chunk_size=10000):
+        self.chunk_size = chunk_size
+        self.index = []
+        self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def append(self, index, record):
+        self.index.append(index)
+        self.records.append(record)
+
+    def extend(self, records_dict):
+        for index, record in records_dict.items():
+            self.append(index, record)
+
+    def to_frame(self):
+        if not self.records:
+            return pd.DataFrame()
+
+        chunks = [
+            pd.DataFrame(
+                self.records[start : start + self.chunk_size],
+                index=self.index[start : start + self.chunk_size],
+            )
+            for start in range(0, len(self.records), self.chunk_size)
+        ]
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks)
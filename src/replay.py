@@ -0,0 +1,190 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from src.config.custom_logging import logger
+from src.scraper import VintedAdScraper, VintedScraper
+from src.session import VintedSession
+
+
+def get_replay_key(url):
+    """Path and query of an url, which is what the replay server receives"""
+    parts = urlsplit(url)
+    return parts.path + ("?" + parts.query if parts.query else "")
+
+
+class ResponseRecorder:
+    """Save responses to a fixtures directory (one body file per url + an index)"""
+
+    def __init__(self, fixtures_dir):
+        self.fixtures_dir = fixtures_dir
+        self.lock = threading.Lock()
+        os.makedirs(fixtures_dir, exist_ok=True)
+
+    def record(self, response):
+        key = get_replay_key(response.url)
+        body_file = hashlib.sha256(key.encode("utf-8")).hexdigest() + ".html"
+        with open(os.path.join(self.fixtures_dir, body_file), "wb") as f:
+            f.write(response.content)
+
+        entry = {
+            "key": key,
+            "file": body_file,
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type", "text/html"),
+        }
+        with self.lock, open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    @property
+    def index_path(self):
+        return os.path.join(self.fixtures_dir, "index.jsonl")
+
+
+def load_fixtures(fixtures_dir):
+    fixtures = {}
+    with open(os.path.join(fixtures_dir, "index.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            fixtures[entry["key"]] = entry
+    return fixtures
+
+
+class RecordingSession(VintedSession):
+    """VintedSession saving every successful response to a fixtures directory"""
+
+    def __init__(self, fixtures_dir, **session_kwargs):
+        super().__init__(**session_kwargs)
+        self.recorder = ResponseRecorder(fixtures_dir)
+
+    def get(self, url):
+        response = super().get(url)
+        self.recorder.record(response)
+        return response
+
+
+class ReplayServer:
+    """Local HTTP server replaying recorded responses
+    Every response is delayed by latency + uniform(0, jitter) seconds and replaced
+    by a 503 with probability error_rate. Unknown urls get a 404
+    """
+
+    def __init__(
+        self, fixtures_dir, latency=0, jitter=0, error_rate=0, host="127.0.0.1", port=0
+    ):
+        self.fixtures_dir = fixtures_dir
+        self.fixtures = load_fixtures(fixtures_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def replay_url(self, url):
+        """Url of the replay server serving the recording of url"""
+        return self.url + get_replay_key(url)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _make_handler(self):
+        replay = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                time.sleep(replay.latency + random.uniform(0, replay.jitter))
+                fixture = replay.fixtures.get(self.path)
+                if random.random() < replay.error_rate:
+                    self._send(503, b"", "text/plain")
+                elif fixture is None:
+                    self._send(404, b"", "text/plain")
+                else:
+                    path = os.path.join(replay.fixtures_dir, fixture["file"])
+                    with open(path, "rb") as f:
+                        self._send(fixture["status"], f.read(), fixture["content_type"])
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return ReplayHandler
+
+
+def record_scope(fixtures_dir, scope_url, max_pages=25, max_ads=None):
+    """Record the catalog pages of a scope and (up to max_ads of) their ad pages"""
+    session = RecordingSession(fixtures_dir)
+    scraper = VintedScraper(scope_url, max_pages, session=session)
+    scraper.get_pages_in_scope()
+    items_df = scraper.items_df.head(max_ads) if max_ads else scraper.items_df
+
+    ad_scraper = VintedAdScraper(list(items_df["url"]), list(items_df["id"]), session)
+    for _ in ad_scraper.iter_ads():
+        pass
+    logger.info(
+        "Recorded %s pages and %s ads to %s", max_pages, len(items_df), fixtures_dir
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Record and replay Vinted responses")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="Record a scope to a fixtures dir")
+    record.add_argument("fixtures_dir")
+    record.add_argument("scope_url")
+    record.add_argument("--max-pages", type=int, default=25)
+    record.add_argument("--max-ads", type=int, default=None)
+
+    serve = commands.add_parser("serve", help="Serve recorded responses")
+    serve.add_argument("fixtures_dir")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--latency", type=float, default=0)
+    serve.add_argument("--jitter", type=float, default=0)
+    serve.add_argument("--error-rate", type=float, default=0)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "record":
+        record_scope(args.fixtures_dir, args.scope_url, args.max_pages, args.max_ads)
+    else:
+        server = ReplayServer(
+            args.fixtures_dir, args.latency, args.jitter, args.error_rate, port=args.port
+        )
+        logger.info("Replaying %s on %s", args.fixtures_dir, server.url)
+        server.server.serve_forever()
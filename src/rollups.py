@@ -0,0 +1,164 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROLLUP_KEYS = ["brand", "day"]
+
+# Price quantile sketch: counts on log-spaced price buckets (5% wide), additive
+# across days so that any window is summarised by summing its days. Prices above
+# the last edge are counted in the last bucket
+SKETCH_EDGES = np.r_[0.0, np.geomspace(1, 20000, 204)]
+
+
+def get_sketch_buckets(prices):
+    """Sketch bucket of each price: -1 below 0, the last bucket from 20000 on"""
+    buckets = np.searchsorted(SKETCH_EDGES, prices, side="right") - 1
+    return np.minimum(buckets, len(SKETCH_EDGES) - 2)
+
+
+def compute_daily_rollups(pages_df):
+    """Per (brand, posting day) listing counts, price statistics and sketch and
+    view / favourite totals of preprocessed pages. n_prices counts the listings
+    with a price, which the price statistics are computed on
+    """
+    df = pages_df[pages_df["brand"].notna() & pages_df["photo_timestamp"].notna()]
+    df = pd.DataFrame(
+        {
+            "brand": df["brand"].astype(str).to_numpy(),
+            "day": df["photo_timestamp"].dt.floor("D").to_numpy(),
+            "price": df["price"].to_numpy(dtype="float64", na_value=np.nan),
+            "view_count": df["view_count"].to_numpy(dtype="float64", na_value=np.nan),
+            "favourite_count": df["favourite_count"].to_numpy(
+                dtype="float64", na_value=np.nan
+            ),
+            "bucket": get_sketch_buckets(
+                df["price"].to_numpy(dtype="float64", na_value=np.nan)
+            ),
+        }
+    )
+    groups = df.groupby(ROLLUP_KEYS, sort=True)
+    rollups = groups.agg(
+        n_ads=("price", "size"),
+        n_prices=("price", "count"),
+        price_sum=("price", "sum"),
+        price_min=("price", "min"),
+        price_max=("price", "max"),
+        view_count_sum=("view_count", "sum"),
+        favourite_count_sum=("favourite_count", "sum"),
+    )
+
+    sketches = np.zeros((len(rollups), len(SKETCH_EDGES) - 1), dtype="int32")
+    valid = df["price"].notna().to_numpy() & (df["bucket"] >= 0).to_numpy()
+    np.add.at(sketches, (groups.ngroup().to_numpy()[valid], df["bucket"][valid]), 1)
+    rollups["price_sketch"] = list(sketches)
+    return rollups.reset_index()
+
+
+def update_daily_rollups(path, pages_df, months=(), overwrite=False):
+    """Replace the rollups of the (brand, month) of pages_df and of months with the
+    rollups of pages_df, and write them to path (only pages_df with overwrite)
+    """
+    new_rollups = compute_daily_rollups(pages_df)
+    months = set(months) | set(
+        zip(new_rollups["brand"], new_rollups["day"].dt.strftime("%Y-%m"))
+    )
+
+    if os.path.exists(path) and not overwrite:
+        rollups = add_price_count(pd.read_parquet(path))
+        rollup_months = pd.MultiIndex.from_arrays(
+            [rollups["brand"], rollups["day"].dt.strftime("%Y-%m")]
+        )
+        replaced = rollup_months.isin(list(months))
+        rollups = pd.concat([rollups[~replaced], new_rollups], ignore_index=True)
+        rollups = rollups.sort_values(ROLLUP_KEYS, ignore_index=True)
+    else:
+        rollups = new_rollups
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    rollups.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return rollups
+
+
+def add_price_count(rollups):
+    """Rollups written before n_prices: assume every listing had a price"""
+    if "n_prices" not in rollups:
+        rollups = rollups.assign(n_prices=rollups["n_ads"])
+    return rollups
+
+
+def estimate_quantiles(sketch, quantiles):
+    """Price quantiles of a sketch, interpolated geometrically within buckets"""
+    cumulative = np.cumsum(sketch)
+    if cumulative[-1] == 0:
+        return [np.nan] * len(quantiles)
+    ranks = np.asarray(quantiles) * cumulative[-1]
+    buckets = np.searchsorted(cumulative, ranks, side="left").clip(0, len(sketch) - 1)
+    before = np.where(buckets > 0, cumulative[buckets - 1], 0)
+    within = (ranks - before) / np.maximum(sketch[buckets], 1)
+    low = np.maximum(SKETCH_EDGES[buckets], 1)
+    high = SKETCH_EDGES[buckets + 1]
+    return list(low * (high / low) ** within.clip(0, 1))
+
+
+class DailyRollups:
+    """Window queries over the daily rollups of every brand
+    Rollups are sorted by brand and day, so a window is two binary searches and a
+    sum over its days
+    """
+
+    def __init__(self, rollups):
+        self.rollups = add_price_count(rollups).sort_values(
+            ROLLUP_KEYS, ignore_index=True
+        )
+        self.days = self.rollups["day"].to_numpy()
+        self.sketches = (
+            np.stack(self.rollups["price_sketch"].to_numpy())
+            if len(self.rollups)
+            else np.zeros((0, len(SKETCH_EDGES) - 1), dtype="int32")
+        )
+        codes, brands = pd.factorize(self.rollups["brand"])
+        starts = np.flatnonzero(np.diff(codes, prepend=-1))
+        ends = np.r_[starts[1:], len(codes)]
+        self.offsets = {
+            brands[codes[start]]: (start, end) for start, end in zip(starts, ends)
+        }
+        self.min_day = self.rollups["day"].min()
+        self.max_day = self.rollups["day"].max()
+
+    @classmethod
+    def load(cls, path):
+        return cls(pd.read_parquet(path))
+
+    def get_window_rows(self, brand, start_day, end_day):
+        start, end = self.offsets.get(brand, (0, 0))
+        days = self.days[start:end]
+        first = start + np.searchsorted(days, np.datetime64(start_day), side="left")
+        last = start + np.searchsorted(days, np.datetime64(end_day), side="right")
+        return first, last
+
+    def count(self, brand, start_day, end_day):
+        first, last = self.get_window_rows(brand, start_day, end_day)
+        return int(self.rollups["n_ads"].to_numpy()[first:last].sum())
+
+    def summarise(self, brand, start_day, end_day, quantiles=(0.25, 0.5, 0.75)):
+        """Listing count, price statistics and view / favourite totals of a window"""
+        first, last = self.get_window_rows(brand, start_day, end_day)
+        window = self.rollups.iloc[first:last]
+        n_ads = int(window["n_ads"].sum())
+        n_prices = int(window["n_prices"].sum())
+        sketch = self.sketches[first:last].sum(axis=0)
+        return {
+            "n_ads": n_ads,
+            "price_mean": window["price_sum"].sum() / n_prices if n_prices else np.nan,
+            "price_min": window["price_min"].min(),
+            "price_max": window["price_max"].max(),
+            "price_quantiles": dict(
+                zip(quantiles, estimate_quantiles(sketch, quantiles))
+            ),
+            "view_count": int(window["view_count_sum"].sum()),
+            "favourite_count": int(window["favourite_count_sum"].sum()),
+        }
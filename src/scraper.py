@@ -1,11 +1,13 @@
-import json
+import asyncio
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import pandas as pd
 
-import requests
-from bs4 import BeautifulSoup
-
-from src.utils import clean_text_scraped_dict
+from src.extractors import ScanExtractor
+from src.records import RecordBuffer
+from src.session import VintedSession
+from src.throttling import HostRateLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -15,39 +17,101 @@ class VintedScraper:
     Take a starting url as input
     """
 
-    def __init__(self, scope_url, max_pages=25):
+    def __init__(
+        self, scope_url, max_pages=25, session=None, extractor=None, seen_index=None
+    ):
         self.scope_url = scope_url
         self.max_pages = max_pages
+        self.session = session or VintedSession.default()
+        self.extractor = extractor or ScanExtractor()
+        self.seen_index = seen_index
+        self.pending_seen = {}
+        self.fetches_avoided = 0
+        self.items = RecordBuffer()
         self.items_df = pd.DataFrame()
 
     def get_pages_in_scope(self):
-        urls = self.get_url_pages_in_scope()
-        for url in urls:
+        for id_, item in self.iter_pages():
+            self.items.append(id_, item)
+        self.items_df = self.items.to_frame()
+        self.commit_seen()
+
+    def iter_pages(self):
+        """Yield (ad id, item dict) for every item of the pages in scope"""
+        for _, items_dict in self.iter_pages_by_url():
+            yield from items_dict.items()
+
+    def iter_pages_by_url(self, urls=None):
+        """Yield (page url, items dict) for the given urls (default: pages in scope)
+        With a seen_index, pagination stops after a page containing only known ads.
+        The yielded pages are only recorded in the seen_index by commit_seen
+        """
+        self.fetches_avoided = 0
+        urls = self.get_url_pages_in_scope() if urls is None else urls
+        for page, url in enumerate(urls):
             try:
-                items_page_df = self.get_page_df_from_url(url)
-                self.items_df = pd.concat([self.items_df, items_page_df])
-            except:
-                raise ConnectionRefusedError("Connection to Vinted.com was interrupted")
+                items_dict = self.get_page_data_from_url(url)
+            except Exception as error:
+                raise ConnectionRefusedError(
+                    "Connection to Vinted.com was interrupted"
+                ) from error
+            is_known = self.is_page_known(url, items_dict)
+            yield url, items_dict
+
+            if is_known:
+                self.fetches_avoided = len(urls) - page - 1
+                break
+        self.log_fetches_avoided()
+
+    def is_page_known(self, url, items_dict):
+        """True if all the items of a page are in the seen index
+        The page is kept pending until commit_seen records its items as seen
+        """
+        if self.seen_index is None:
+            return False
+        self.pending_seen[url] = items_dict
+        known_ids = self.seen_index.known_ids(items_dict.keys())
+        return len(known_ids) == len(items_dict) > 0
+
+    def commit_seen(self, urls=None):
+        """Record the items of the pages of urls (default: all pending) as seen
+        Call it once these items are saved, so that a crash never leaves ads in
+        the seen index without their rows
+        """
+        if self.seen_index is None:
+            return
+        urls = list(self.pending_seen) if urls is None else urls
+        for url in urls:
+            items_dict = self.pending_seen.pop(url, None)
+            if items_dict:
+                self.seen_index.update_seen(items_dict)
+
+    def log_fetches_avoided(self):
+        if self.seen_index is not None:
+            logger.info("Avoided %s page fetches", self.fetches_avoided)
 
     def get_page_df_from_url(self, url):
-        soup = self.request_source_data_from_url(url)
-        items_dict = self.get_page_data_from_soup(soup)
+        items_dict = self.get_page_data_from_url(url)
         items_df = pd.DataFrame.from_dict(items_dict, orient="index")
         return items_df
 
-    def get_page_data_from_soup(self, soup):
-        page_main_script = soup.find(
-            "script", {"data-js-react-on-rails-store": "MainStore"}
-        )
-        page_main = json.loads(page_main_script.string)
-        items_dict = page_main["items"]["catalogItems"]["byId"]
+    def get_page_data_from_url(self, url):
+        html = self.request_html_from_url(url)
+        items_dict = self.extractor.get_page_data(html)
         return items_dict
 
+    def get_page_data_from_soup(self, soup):
+        return self.extractor.get_page_data_from_soup(soup)
+
     def request_source_data_from_url(self, url):
-        homepage = requests.get(url)
-        soup = BeautifulSoup(homepage.content, "html.parser")
+        html = self.request_html_from_url(url)
+        soup = self.extractor.make_soup(html)
         return soup
 
+    def request_html_from_url(self, url):
+        homepage = self.session.get(url)
+        return homepage.content
+
     def get_url_pages_in_scope(self):
         urls = [self.scope_url]
         for page in range(1, self.max_pages):
@@ -55,72 +119,264 @@ class VintedScraper:
         return urls
 
 
+class AsyncVintedScraper(VintedScraper):
+    """Drop-in VintedScraper fetching the pages in scope concurrently
+    At most max_concurrency requests are in flight, pages are kept in page order
+    and failed pages are reported in failed_pages instead of aborting the run
+    """
+
+    def __init__(
+        self,
+        scope_url,
+        max_pages=25,
+        max_concurrency=8,
+        session=None,
+        extractor=None,
+        seen_index=None,
+    ):
+        super().__init__(scope_url, max_pages, session, extractor, seen_index)
+        self.max_concurrency = max_concurrency
+        self.failed_pages = {}
+
+    def iter_pages_by_url(self, urls=None):
+        """Yield (page url, items dict) in page order while later pages are downloading
+        At most max_concurrency pages are requested ahead of the page being yielded,
+        so that with a seen_index the pages after a page containing only known ads
+        are never requested
+        """
+        self.failed_pages = {}
+        self.fetches_avoided = 0
+        urls = self.get_url_pages_in_scope() if urls is None else urls
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            in_flight = deque()
+            next_page = 0
+            while next_page < len(urls) and len(in_flight) < self.max_concurrency:
+                in_flight.append(self._submit_page(executor, urls[next_page]))
+                next_page += 1
+
+            while in_flight:
+                url, page = in_flight.popleft()
+                try:
+                    items_dict = page.result()
+                except Exception as error:
+                    logger.warning("Failed to scrape page %s: %r", url, error)
+                    self.failed_pages[url] = error
+                    items_dict = None
+
+                is_known = items_dict is not None and self.is_page_known(
+                    url, items_dict
+                )
+                if is_known:
+                    cancelled = sum(future.cancel() for _, future in in_flight)
+                    self.fetches_avoided = len(urls) - next_page + cancelled
+                elif next_page < len(urls):
+                    in_flight.append(self._submit_page(executor, urls[next_page]))
+                    next_page += 1
+
+                if items_dict is not None:
+                    yield url, items_dict
+                if is_known:
+                    break
+        self.log_fetches_avoided()
+
+    def _submit_page(self, executor, url):
+        return url, executor.submit(self.get_page_data_from_url, url)
+
+    async def get_pages_in_scope_async(self):
+        """Awaitable get_pages_in_scope for callers already running an event loop
+        All the pages are requested upfront, so the seen_index only trims the result
+        """
+        urls = self.get_url_pages_in_scope()
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            results = await asyncio.gather(
+                *[
+                    loop.run_in_executor(executor, self.get_page_data_from_url, url)
+                    for url in urls
+                ],
+                return_exceptions=True,
+            )
+
+        self.failed_pages = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                logger.warning("Failed to scrape page %s: %r", url, result)
+                self.failed_pages[url] = result
+            else:
+                self.items.extend(result)
+                if self.is_page_known(url, result):
+                    break
+        self.items_df = self.items.to_frame()
+        self.commit_seen()
+
+
 class VintedAdScraper:
     """Extract ads data from individual ad pages
     Take as input a list of ads urls and the corresponding list of ads ids
     """
 
-    def __init__(self, ads_urls, ads_ids):
+    def __init__(
+        self, ads_urls, ads_ids, session=None, extractor=None, seen_index=None
+    ):
         self.ads_urls = ads_urls
         self.ads_ids = ads_ids
+        self.session = session or VintedSession.default()
+        self.extractor = extractor or ScanExtractor()
+        self.seen_index = seen_index
+        self.pending_seen = set()
+        self.fetches_avoided = 0
+        self.ads = RecordBuffer()
         self.ads_df = pd.DataFrame()
 
     def get_ads_in_scope(self):
-        for url, id_ in zip(self.ads_urls, self.ads_ids):
-            ad_df = self.get_ad_df_from_url(url)
-            ad_df.index = [id_]
-            self.ads_df = pd.concat([self.ads_df, ad_df])
+        for id_, ad_dict in self.iter_ads():
+            self.ads.append(id_, ad_dict)
+        self.ads_df = self.ads.to_frame()
+        self.commit_seen()
+
+    def iter_ads(self):
+        """Yield (ad id, ad dict) for every ad in scope"""
+        for url, id_ in self.get_ads_to_scrape():
+            ad_dict = self.get_ad_data_from_url(url)
+            self.mark_ad_scraped(id_)
+            yield id_, ad_dict
+        self.log_fetches_avoided()
+
+    def get_ads_to_scrape(self):
+        """(url, ad id) of the ads in scope, without the unchanged ads of the seen_index"""
+        ads = list(zip(self.ads_urls, self.ads_ids))
+        self.fetches_avoided = 0
+        if self.seen_index is None:
+            return ads
+
+        ads_to_scrape = [ad for ad in ads if self.seen_index.needs_scraping(ad[1])]
+        self.fetches_avoided = len(ads) - len(ads_to_scrape)
+        return ads_to_scrape
+
+    def mark_ad_scraped(self, id_):
+        """Keep a scraped ad pending until commit_seen records it in the seen index"""
+        if self.seen_index is not None:
+            self.pending_seen.add(str(id_))
+
+    def commit_seen(self, ads_ids=None):
+        """Record the ads of ads_ids (default: all pending) as scraped
+        Call it once their rows are saved, so that a crash never leaves ads marked as
+        scraped in the seen index without their rows
+        """
+        if self.seen_index is None:
+            return
+        ads_ids = list(self.pending_seen) if ads_ids is None else ads_ids
+        for id_ in map(str, ads_ids):
+            if id_ in self.pending_seen:
+                self.pending_seen.remove(id_)
+                self.seen_index.mark_scraped(id_)
+
+    def log_fetches_avoided(self):
+        if self.seen_index is not None:
+            logger.info("Avoided %s ad fetches", self.fetches_avoided)
 
     def get_ad_df_from_url(self, url):
-        soup = self.request_source_data_from_url(url)
-        ad_dict = self.get_ad_data_from_soup(soup)
+        ad_dict = self.get_ad_data_from_url(url)
         ad_df = pd.DataFrame.from_dict(ad_dict, orient="index").T
         return ad_df
 
-    def get_ad_data_from_soup(self, soup):
-        description = self.get_item_description_from_soup(soup)
-        user_info = self.get_item_user_info_from_soup(soup)
-        details = self.get_item_details_from_soup(soup)
+    def get_ad_data_from_url(self, url):
+        html = self.request_html_from_url(url)
+        ad_dict = self.get_ad_data_from_html(html)
+        return ad_dict
 
-        description = {"ad_" + k: v for k, v in description.items()}
-        user_info = {"user_" + k: v for k, v in user_info.items()}
-        details = {"details_" + k: v for k, v in details.items()}
+    def get_ad_data_from_html(self, html):
+        return self.extractor.get_ad_data(html)
 
-        ad_dict = dict(description, **user_info, **details)
-        return ad_dict
+    def get_ad_data_from_soup(self, soup):
+        return self.extractor.get_ad_data_from_soup(soup)
 
     def get_item_description_from_soup(self, soup):
-        source = soup.find("script", {"data-component-name": "ItemDescription"})
-        description = json.loads(source.string)["content"]
-        return description
+        return self.extractor.get_item_description_from_soup(soup)
 
     def get_item_user_info_from_soup(self, soup):
-        source = soup.find("script", {"data-component-name": "ItemUserInfo"})
-        user_info = json.loads(source.string)["user"]
-        return user_info
+        return self.extractor.get_item_user_info_from_soup(soup)
 
     def get_item_details_from_soup(self, soup):
-        item_details = soup.find("div", {"class": "details-list details-list--details"})
-        item_details_keys = item_details.findAll(
-            "div", {"class": "details-list__item-title"}
-        )
-        item_details_values = item_details.findAll(
-            "div", {"class": "details-list__item-value"}
-        )
-
-        details = {}
-        for it_key, it_val in zip(item_details_keys, item_details_values):
-            it_key = clean_text_scraped_dict(it_key.text)
-            if it_key == "Ajouté":
-                it_val = it_val.find("time")["datetime"]
-            else:
-                it_val = clean_text_scraped_dict(it_val.text)
-
-            details[it_key] = it_val
-
-        return details
+        return self.extractor.get_item_details_from_soup(soup)
 
     def request_source_data_from_url(self, url):
-        homepage = requests.get(url)
-        soup = BeautifulSoup(homepage.content, "html.parser")
+        html = self.request_html_from_url(url)
+        soup = self.extractor.make_soup(html)
         return soup
+
+    def request_html_from_url(self, url):
+        homepage = self.session.get(url)
+        return homepage.content
+
+
+def parse_ad_html(html, extractor):
+    """Parse the html of an ad page into the ad dict (runs in a worker process)"""
+    return extractor.get_ad_data(html)
+
+
+class ParallelVintedAdScraper(VintedAdScraper):
+    """Drop-in VintedAdScraper with a bounded worker pool
+    Ad pages are downloaded by a thread pool (max_workers) under a per-host token
+    bucket (rate requests per second, bursts of burst) and parsed by a process pool
+    (parse_workers). Failed ads are reported in failed_ads instead of aborting the run
+    """
+
+    def __init__(
+        self,
+        ads_urls,
+        ads_ids,
+        max_workers=8,
+        parse_workers=None,
+        rate=5,
+        burst=None,
+        session=None,
+        extractor=None,
+        seen_index=None,
+    ):
+        super().__init__(ads_urls, ads_ids, session, extractor, seen_index)
+        self.max_workers = max_workers
+        self.parse_workers = parse_workers
+        self.rate_limiter = HostRateLimiter(rate, burst)
+        self.failed_ads = {}
+
+    def iter_ads(self):
+        """Yield (ad id, ad dict) in input order
+        At most 2 * max_workers ads are in flight so memory stays bounded
+        """
+        self.failed_ads = {}
+        ads = self.get_ads_to_scrape()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as fetch_pool:
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+                in_flight = deque()
+                for ad in ads:
+                    in_flight.append(
+                        (ad, fetch_pool.submit(self._scrape_ad, ad[0], parse_pool))
+                    )
+                    if len(in_flight) >= 2 * self.max_workers:
+                        yield from self._collect_ad(*in_flight.popleft())
+                while in_flight:
+                    yield from self._collect_ad(*in_flight.popleft())
+        self.log_fetches_avoided()
+
+    def _scrape_ad(self, url, parse_pool):
+        html = self._fetch_html(url)
+        return parse_pool.submit(parse_ad_html, html, self.extractor).result()
+
+    def _collect_ad(self, ad, future):
+        try:
+            ad_dict = future.result()
+        except Exception as error:
+            self._record_failure(ad, error)
+        else:
+            self.mark_ad_scraped(ad[1])
+            yield ad[1], ad_dict
+
+    def _fetch_html(self, url):
+        self.rate_limiter.acquire(url)
+        return self.request_html_from_url(url)
+
+    def _record_failure(self, ad, error):
+        url, id_ = ad
+        logger.warning("Failed to scrape ad %s: %r", url, error)
+        self.failed_ads[id_] = error
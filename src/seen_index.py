@@ -0,0 +1,98 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def content_hash(record):
+    payload = json.dumps(record, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SeenAdsIndex:
+    """Persistent sqlite index of the ads already scraped
+    Keep for every ad id its first/last seen timestamps, the hash of its latest
+    catalog record and the hash it had when its ad page was last scraped
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ads (
+                    ad_id TEXT PRIMARY KEY,
+                    first_seen REAL,
+                    last_seen REAL,
+                    content_hash TEXT,
+                    scraped_at REAL,
+                    scraped_hash TEXT
+                )
+                """
+            )
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM ads").fetchone()[0]
+
+    def known_ids(self, ad_ids):
+        ad_ids = [str(ad_id) for ad_id in ad_ids]
+        known = set()
+        with self.lock:
+            for start in range(0, len(ad_ids), 500):
+                chunk = ad_ids[start : start + 500]
+                rows = self.connection.execute(
+                    "SELECT ad_id FROM ads WHERE ad_id IN ({})".format(
+                        ",".join("?" * len(chunk))
+                    ),
+                    chunk,
+                )
+                known.update(row[0] for row in rows)
+        return known
+
+    def update_seen(self, items_dict):
+        now = time.time()
+        rows = [
+            (str(ad_id), now, now, content_hash(item))
+            for ad_id, item in items_dict.items()
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO ads (ad_id, first_seen, last_seen, content_hash)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(ad_id) DO UPDATE SET
+                    last_seen = excluded.last_seen,
+                    content_hash = excluded.content_hash
+                """,
+                rows,
+            )
+
+    def needs_scraping(self, ad_id):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT scraped_at IS NULL OR scraped_hash IS NOT content_hash "
+                "FROM ads WHERE ad_id = ?",
+                (str(ad_id),),
+            ).fetchone()
+        return row is None or bool(row[0])
+
+    def mark_scraped(self, ad_id):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO ads (ad_id, first_seen, last_seen, scraped_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(ad_id) DO UPDATE SET
+                    scraped_at = excluded.scraped_at,
+                    scraped_hash = content_hash
+                """,
+                (str(ad_id), now, now, now),
+            )
+
+    def close(self):
+        self.connection.close()
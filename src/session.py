@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.throttling import RequestController
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli  # noqa: F401
+
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+class HttpCache:
+    """On-disk HTTP cache keyed by url
+    Keep the body of the last 200 response with its ETag / Last-Modified headers
+    so that the next request for the same url can be made conditional
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, suffix):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def load(self, url):
+        try:
+            with open(self._path(url, ".json"), encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            with open(self._path(url, ".body"), "rb") as body_file:
+                content = body_file.read()
+        except (OSError, ValueError):
+            return None
+        return meta, content
+
+    def save(self, url, response):
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+        }
+        self._write_atomic(self._path(url, ".body"), response.content)
+        self._write_atomic(
+            self._path(url, ".json"), json.dumps(meta).encode("utf-8")
+        )
+
+    def _write_atomic(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+
+class VintedSession:
+    """Pooled HTTP transport shared by the scrapers
+    Keep-alive connections are pooled per host (pool_connections hosts, pool_maxsize
+    connections each), compressed responses are accepted and, when cache_dir is set,
+    responses are revalidated with If-None-Match / If-Modified-Since so that
+    unchanged pages cost a 304. Requests go through a RequestController (retries,
+    backoff and adaptive concurrency)
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(
+        self,
+        pool_connections=10,
+        pool_maxsize=10,
+        cache_dir=None,
+        timeout=30,
+        controller=None,
+    ):
+        self.timeout = timeout
+        self.controller = controller or RequestController()
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.cache = HttpCache(cache_dir) if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def default(cls):
+        """Session shared by the scrapers created without an explicit session"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def get(self, url):
+        return self.controller.request(self._get, url)
+
+    def _get(self, url):
+        if self.cache is None:
+            return self.session.get(url, timeout=self.timeout)
+
+        cached = self.cache.load(url)
+        headers = {}
+        if cached is not None:
+            meta, _ = cached
+            if meta["etag"]:
+                headers["If-None-Match"] = meta["etag"]
+            if meta["last_modified"]:
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached is not None:
+            self._count(hit=True)
+            return self._response_from_cache(url, *cached)
+
+        self._count(hit=False)
+        if response.status_code == 200 and (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        ):
+            self.cache.save(url, response)
+        return response
+
+    def stats(self):
+        requests_count = self.hits + self.misses
+        return dict(
+            self.controller.stats(),
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / requests_count if requests_count else 0.0,
+        )
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _response_from_cache(self, url, meta, content):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = content
+        if meta["content_type"]:
+            response.headers["Content-Type"] = meta["content_type"]
+        if meta["etag"]:
+            response.headers["ETag"] = meta["etag"]
+        if meta["last_modified"]:
+            response.headers["Last-Modified"] = meta["last_modified"]
+        return response
@@ -0,0 +1,87 @@
+import logging
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# strings stay in the mapped Arrow buffers instead of becoming python objects
+STRING_TYPES = {
+    pa.string(): pd.StringDtype("pyarrow"),
+    pa.large_string(): pd.StringDtype("pyarrow"),
+}
+
+
+def get_ipc_path(path, version, ipc_dir=None):
+    """Arrow IPC copy of a parquet file for a given version of that file"""
+    ipc_dir = ipc_dir or os.path.join(os.path.dirname(path), ".arrow")
+    name = os.path.basename(path).split(".")[0]
+    return os.path.join(ipc_dir, "{}-{}.arrow".format(name, version))
+
+
+def sort_table(table, sort_by):
+    """Sort a table, dictionary (category) columns included
+    Arrow cannot sort dictionary columns: they are decoded to their values for the
+    sort and encoded again afterwards, so they still read back as categories
+    """
+    dictionary_cols = [
+        i for i, field in enumerate(table.schema) if pa.types.is_dictionary(field.type)
+    ]
+    for i in dictionary_cols:
+        field = table.schema.field(i)
+        table = table.set_column(
+            i, field.name, table.column(i).cast(field.type.value_type)
+        )
+    table = table.sort_by(sort_by).combine_chunks()
+    for i in dictionary_cols:
+        field = table.schema.field(i)
+        table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+    return table
+
+
+def materialize_ipc(path, ipc_path, sort_by=None):
+    """Write the parquet file at path as an uncompressed Arrow IPC file
+    Written once to a temporary file and renamed, so that concurrent workers
+    either see the complete file or no file. Older versions are removed
+    """
+    ipc_dir = os.path.dirname(ipc_path)
+    os.makedirs(ipc_dir, exist_ok=True)
+    table = pq.read_table(path)
+    if sort_by:
+        table = sort_table(table, sort_by)
+
+    fd, tmp_path = tempfile.mkstemp(dir=ipc_dir)
+    with os.fdopen(fd, "wb") as tmp_file:
+        with ipc.new_file(tmp_file, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, ipc_path)
+
+    prefix = os.path.basename(ipc_path).split("-")[0] + "-"
+    for name in os.listdir(ipc_dir):
+        if name.startswith(prefix) and name.endswith(".arrow"):
+            if name != os.path.basename(ipc_path):
+                # workers still mapping an old file keep their mapping
+                os.remove(os.path.join(ipc_dir, name))
+    logger.info("Materialized %s to %s", path, ipc_path)
+
+
+def read_ipc_frame(ipc_path):
+    """Memory map an Arrow IPC file into a DataFrame
+    Numeric columns without nulls and string columns are backed by the mapped
+    file, so processes mapping the same file share its pages in the OS cache
+    """
+    source = pa.memory_map(ipc_path, "r")
+    table = ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True, types_mapper=STRING_TYPES.get)
+
+
+def load_shared_frame(path, version, sort_by=None, ipc_dir=None):
+    """DataFrame of a parquet file, through its memory-mapped Arrow IPC copy"""
+    ipc_path = get_ipc_path(path, version, ipc_dir)
+    if not os.path.exists(ipc_path):
+        materialize_ipc(path, ipc_path, sort_by)
+    return read_ipc_frame(ipc_path)
@@ -0,0 +1,160 @@
+import glob
+import logging
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.records import RecordBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class ParquetSink:
+    """Write scraped records to a Parquet dataset as they come
+    Records are flushed every row_group_size rows into a new part file of the
+    dataset directory, so memory stays bounded and every flushed part survives
+    an interrupted run. With an Arrow schema, records are written as typed columns
+    (nested dicts as structs), otherwise nested values are stored as their repr as in
+    the raw csv. Writing to an existing dataset appends new parts;
+    on_flush(part_path, rows_written) is called once a part is on disk
+    """
+
+    def __init__(self, path, row_group_size=10000, on_flush=None, schema=None):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.on_flush = on_flush
+        self.schema = schema
+        os.makedirs(path, exist_ok=True)
+        parts = list_parts(path)
+        self.n_parts = len(parts)
+        self.rows_written = sum(count_rows(part) for part in parts)
+        self.buffer = RecordBuffer(chunk_size=row_group_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, index, record):
+        self.buffer.append(index, record)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def write_records(self, records):
+        for index, record in records:
+            self.write(index, record)
+
+    def flush(self):
+        if not len(self.buffer):
+            return
+        n_rows = len(self.buffer)
+        part_path = os.path.join(self.path, "part-{:05d}.parquet".format(self.n_parts))
+        tmp_path = part_path + ".tmp"
+        if self.schema is None:
+            self.format_part(self.buffer.to_frame()).to_parquet(tmp_path)
+        else:
+            records = [coerce_record(r, self.schema) for r in self.buffer.records]
+            pq.write_table(pa.Table.from_pylist(records, schema=self.schema), tmp_path)
+        os.replace(tmp_path, part_path)
+
+        logger.info("Saved %s rows to %s", n_rows, part_path)
+        self.n_parts += 1
+        self.rows_written += n_rows
+        self.buffer = RecordBuffer(chunk_size=self.row_group_size)
+        if self.on_flush is not None:
+            self.on_flush(part_path, self.rows_written)
+
+    def truncate(self, n_rows):
+        """Drop the rows written after the first n_rows of the dataset"""
+        self.buffer = RecordBuffer(chunk_size=self.row_group_size)
+        rows_kept = 0
+        parts_kept = 0
+        for part in list_parts(self.path):
+            part_rows = count_rows(part)
+            if rows_kept + part_rows <= n_rows:
+                rows_kept += part_rows
+                parts_kept += 1
+            elif rows_kept < n_rows:
+                part_table = pq.read_table(part).slice(0, n_rows - rows_kept)
+                pq.write_table(part_table, part + ".tmp")
+                os.replace(part + ".tmp", part)
+                rows_kept = n_rows
+                parts_kept += 1
+            else:
+                os.remove(part)
+        self.n_parts = parts_kept
+        self.rows_written = rows_kept
+
+    def close(self):
+        self.flush()
+
+    def format_part(self, part_df):
+        for col in part_df.columns[part_df.dtypes == object]:
+            values = part_df[col].map(
+                lambda v: repr(v) if isinstance(v, (dict, list)) else v
+            )
+            if pd.api.types.infer_dtype(values, skipna=True).startswith("mixed"):
+                values = values.where(values.isna(), values.astype(str))
+            part_df[col] = values
+        return part_df
+
+
+def coerce_value(value, type_):
+    """Convert a scraped value to the Arrow type of its column, None if invalid"""
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    try:
+        if pa.types.is_struct(type_):
+            if not isinstance(value, dict):
+                return None
+            return {
+                field.name: coerce_value(value.get(field.name), field.type)
+                for field in type_
+            }
+        if pa.types.is_timestamp(type_):
+            if isinstance(value, (int, float)):
+                timestamp = pd.Timestamp(value, unit="s", tz="UTC")
+            else:
+                timestamp = pd.Timestamp(value)
+                timestamp = (
+                    timestamp.tz_convert("UTC")
+                    if timestamp.tzinfo
+                    else timestamp.tz_localize("UTC")
+                )
+            return timestamp.to_pydatetime()
+        if pa.types.is_boolean(type_):
+            if isinstance(value, str):
+                return {"true": True, "false": False}.get(value.strip().lower())
+            return bool(value)
+        if pa.types.is_integer(type_):
+            return int(float(value)) if isinstance(value, str) else int(value)
+        if pa.types.is_floating(type_):
+            return float(value)
+        if pa.types.is_string(type_):
+            return value if isinstance(value, str) else str(value)
+    except (TypeError, ValueError):
+        return None
+    return value
+
+
+def coerce_record(record, schema):
+    return {field.name: coerce_value(record.get(field.name), field.type) for field in schema}
+
+
+def list_parts(path):
+    return sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+
+
+def count_rows(part):
+    return pq.ParquetFile(part).metadata.num_rows
+
+
+def read_parquet_sink(path, columns=None):
+    """Read back all the parts written by a ParquetSink"""
+    parts = [pd.read_parquet(part, columns=columns) for part in list_parts(path)]
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts)
@@ -0,0 +1,164 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+TOKEN_RE = r"[a-z0-9]{2,}"
+
+STOP_WORDS = {
+    "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "elle", "en",
+    "et", "il", "je", "la", "le", "les", "leur", "lui", "ma", "mais", "me",
+    "mes", "mon", "ne", "nos", "notre", "nous", "on", "ou", "par", "pas",
+    "pour", "qu", "que", "qui", "sa", "se", "ses", "son", "sur", "ta", "te",
+    "tes", "ton", "tu", "un", "une", "vos", "votre", "vous",
+}
+
+
+def fold_text(texts):
+    """Lowercase, accent-free ascii version of a Series of texts"""
+    return (
+        texts.astype("string")
+        .fillna("")
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+        .str.lower()
+    )
+
+
+def tokenize(texts):
+    """Accent-folded tokens of a Series of texts, one row per (text, token)"""
+    tokens = fold_text(texts).str.findall(TOKEN_RE).explode().dropna()
+    return tokens[~tokens.isin(STOP_WORDS)]
+
+
+class TextIndex:
+    """Inverted index over ad titles and descriptions
+    Posting lists are stored back to back as sorted int32 document positions with
+    their term weights (title occurrences count title_weight times), vocabulary
+    entries point to them through offsets. Searches return the positions of the
+    documents holding every query token, ranked with BM25
+    """
+
+    def __init__(
+        self, vocabulary, offsets, postings, weights, doc_lengths, ad_ids
+    ):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+        self.doc_lengths = doc_lengths
+        self.ad_ids = ad_ids
+        self.avg_doc_length = doc_lengths.mean() if len(doc_lengths) else 0.0
+
+    def __len__(self):
+        return len(self.ad_ids)
+
+    @classmethod
+    def build(cls, ads_df, title_weight=2):
+        """Index the ad_title and ad_description of a preprocessed ads frame
+        Documents are the row positions of the frame, whatever its index labels
+        """
+        texts_df = ads_df[["ad_title", "ad_description"]].reset_index(drop=True)
+        title_tokens = tokenize(texts_df["ad_title"])
+        description_tokens = tokenize(texts_df["ad_description"])
+        pairs = pd.DataFrame(
+            {
+                "doc": np.concatenate(
+                    [title_tokens.index.to_numpy(), description_tokens.index.to_numpy()]
+                ).astype("int32"),
+                "token": np.concatenate(
+                    [title_tokens.to_numpy(), description_tokens.to_numpy()]
+                ),
+                "weight": np.r_[
+                    np.full(len(title_tokens), title_weight),
+                    np.ones(len(description_tokens)),
+                ].astype("float32"),
+            }
+        )
+        token_codes, vocabulary = pd.factorize(pairs["token"], sort=True)
+        pairs = (
+            pairs.assign(token=token_codes)
+            .groupby(["token", "doc"], sort=True)["weight"]
+            .sum()
+            .reset_index()
+        )
+        offsets = np.searchsorted(
+            pairs["token"].to_numpy(), np.arange(len(vocabulary) + 1)
+        ).astype("int64")
+        doc_lengths = np.bincount(
+            pairs["doc"], weights=pairs["weight"], minlength=len(ads_df)
+        ).astype("float32")
+        return cls(
+            np.asarray(vocabulary, dtype=str),
+            offsets,
+            pairs["doc"].to_numpy(dtype="int32"),
+            pairs["weight"].to_numpy(dtype="float32"),
+            doc_lengths,
+            ads_df["ad_id"].astype(str).to_numpy(dtype=str),
+        )
+
+    def get_postings(self, token):
+        """(document positions, weights) of a token, empty if unknown"""
+        position = np.searchsorted(self.vocabulary, token)
+        if position == len(self.vocabulary) or self.vocabulary[position] != token:
+            return self.postings[:0], self.weights[:0]
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.postings[start:end], self.weights[start:end]
+
+    def search(self, query, limit=20, mask=None, k1=1.2, b=0.75):
+        """Positions and scores of the best documents holding every query token
+        mask is an optional boolean array of the documents that can be returned
+        """
+        tokens = list(dict.fromkeys(tokenize(pd.Series([query]))))
+        if not tokens:
+            return np.array([], dtype="int32"), np.array([], dtype="float32")
+
+        postings = sorted(
+            (self.get_postings(token) for token in tokens), key=lambda p: len(p[0])
+        )
+        docs = postings[0][0]
+        for token_docs, _ in postings[1:]:
+            docs = np.intersect1d(docs, token_docs, assume_unique=True)
+        if mask is not None:
+            docs = docs[mask[docs]]
+
+        scores = np.zeros(len(docs), dtype="float32")
+        norms = k1 * (1 - b + b * self.doc_lengths[docs] / self.avg_doc_length)
+        for token_docs, token_weights in postings:
+            idf = np.log1p((len(self) - len(token_docs) + 0.5) / (len(token_docs) + 0.5))
+            tf = token_weights[np.searchsorted(token_docs, docs)]
+            scores += idf * tf * (k1 + 1) / (tf + norms)
+
+        if len(docs) > limit:
+            best = np.argpartition(-scores, limit)[:limit]
+            docs, scores = docs[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return docs[order], scores[order]
+
+    def save(self, path):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".npz")
+        with os.fdopen(fd, "wb") as tmp_file:
+            np.savez(
+                tmp_file,
+                vocabulary=self.vocabulary,
+                offsets=self.offsets,
+                postings=self.postings,
+                weights=self.weights,
+                doc_lengths=self.doc_lengths,
+                ad_ids=self.ad_ids,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(
+                arrays["vocabulary"],
+                arrays["offsets"],
+                arrays["postings"],
+                arrays["weights"],
+                arrays["doc_lengths"],
+                arrays["ad_ids"],
+            )
@@ -0,0 +1,220 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket
+    Allow `rate` requests per second on average with bursts of up to `capacity`
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """One token bucket per host, shared by all the workers of a scraper"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.capacity)
+            bucket = self.buckets[host]
+        bucket.acquire()
+
+
+SUCCESS = "success"
+RETRYABLE = "retryable"
+FATAL = "fatal"
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+THROTTLING_STATUS_CODES = {429, 503}
+
+
+class RequestFailed(Exception):
+    """Raised when a request fails for good (fatal response or retries exhausted)"""
+
+    def __init__(self, url, response=None, error=None):
+        self.url = url
+        self.response = response
+        self.error = error
+        reason = (
+            "status {}".format(response.status_code)
+            if response is not None
+            else repr(error)
+        )
+        super().__init__("Request to {} failed: {}".format(url, reason))
+
+
+def classify_response(response=None, error=None):
+    """Classify the outcome of a request into SUCCESS, RETRYABLE or FATAL"""
+    if error is not None:
+        if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+            return RETRYABLE
+        return FATAL
+    if response.status_code < 400:
+        return SUCCESS
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        return RETRYABLE
+    return FATAL
+
+
+def parse_retry_after(response):
+    """Delay in seconds requested by the Retry-After header, None if absent"""
+    if response is None or "Retry-After" not in response.headers:
+        return None
+    retry_after = response.headers["Retry-After"].strip()
+    if retry_after.isdigit():
+        return float(retry_after)
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AimdLimiter:
+    """Concurrency limit tuned AIMD-style
+    The limit grows by `increase` every `limit` successful requests and is
+    multiplied by `decrease` when the server throttles us, at most once per
+    congestion window: throttled requests started before the last decrease were
+    sent under the old limit and do not decrease it again
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=32, increase=1, decrease=0.5):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.started = 0
+        self.recovery_point = 0
+        self.decreases = 0
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        """Wait for a free slot, return the ticket (start order) of the request"""
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+            self.started += 1
+            return self.started
+
+    def __exit__(self, *exc_info):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        with self.condition:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self.condition.notify_all()
+
+    def on_throttle(self, ticket=None):
+        """Decrease the limit, unless the request of ticket started before the last
+        decrease. Return True if the limit was decreased
+        """
+        with self.condition:
+            if ticket is not None and ticket <= self.recovery_point:
+                return False
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+            self.recovery_point = self.started
+            self.decreases += 1
+            return True
+
+
+class RequestController:
+    """Send requests with retries, jittered exponential backoff and an AIMD limit
+    Retryable outcomes (429, 5xx, timeouts) are retried up to max_retries times,
+    waiting for Retry-After when the server sends it
+    """
+
+    def __init__(self, max_retries=5, backoff_base=0.5, backoff_max=60, limiter=None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = limiter or AimdLimiter()
+        self.retries = 0
+        self.throttled = 0
+        self._stats_lock = threading.Lock()
+
+    def request(self, send, url):
+        for attempt in range(self.max_retries + 1):
+            response, error = None, None
+            with self.limiter as ticket:
+                try:
+                    response = send(url)
+                except requests.RequestException as request_error:
+                    error = request_error
+
+            outcome = classify_response(response, error)
+            if outcome == SUCCESS:
+                self.limiter.on_success()
+                return response
+            if outcome == FATAL or attempt == self.max_retries:
+                raise RequestFailed(url, response, error)
+
+            throttled = (
+                response is not None
+                and response.status_code in THROTTLING_STATUS_CODES
+            )
+            if throttled:
+                self.limiter.on_throttle(ticket)
+            self._count_retry(throttled)
+            delay = self.get_delay(attempt, response)
+            logger.debug("Retry %s in %.2fs (%s)", url, delay, response or error)
+            time.sleep(delay)
+
+    def get_delay(self, attempt, response=None):
+        retry_after = parse_retry_after(response)
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def stats(self):
+        return {
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "concurrency_limit": self.limiter.limit,
+        }
+
+    def _count_retry(self, throttled):
+        with self._stats_lock:
+            self.retries += 1
+            if throttled:
+                self.throttled += 1
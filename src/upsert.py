@@ -0,0 +1,186 @@
+import logging
+import os
+import sqlite3
+import uuid
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src.dataset import PARTITION_COLS, add_month_column, write_partitioned_dataset
+
+logger = logging.getLogger(__name__)
+
+
+def get_partitions(df):
+    """(brand, month) partitions of the rows of a frame, None for missing brands"""
+    brands = df["brand"].astype(object).where(df["brand"].notna(), None)
+    return set(zip(brands, df["month"]))
+
+
+class PrimaryKeyIndex:
+    """Persistent sqlite index of the partition (brand, month) holding every ad id"""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS keys (
+                    ad_id TEXT PRIMARY KEY,
+                    brand TEXT,
+                    month TEXT
+                )
+                """
+            )
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+    def get_partitions(self, ad_ids):
+        """{ad id: (brand, month)} of the known ad ids"""
+        ad_ids = [str(ad_id) for ad_id in ad_ids]
+        partitions = {}
+        for start in range(0, len(ad_ids), 500):
+            chunk = ad_ids[start : start + 500]
+            rows = self.connection.execute(
+                "SELECT ad_id, brand, month FROM keys WHERE ad_id IN ({})".format(
+                    ",".join("?" * len(chunk))
+                ),
+                chunk,
+            )
+            partitions.update((row[0], (row[1], row[2])) for row in rows)
+        return partitions
+
+    def set_partitions(self, keys_df):
+        """Record the partition of the ad_id / brand / month rows of keys_df"""
+        rows = zip(
+            keys_df["ad_id"].astype(str),
+            keys_df["brand"].astype(object).where(keys_df["brand"].notna(), None),
+            keys_df["month"].astype(str),
+        )
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO keys (ad_id, brand, month) VALUES (?, ?, ?)
+                ON CONFLICT(ad_id) DO UPDATE SET
+                    brand = excluded.brand,
+                    month = excluded.month
+                """,
+                rows,
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+class PartitionedStore:
+    """Brand/month partitioned dataset updated in place by ad_id
+    upsert() replaces the rows of the ad ids of a batch (last write wins) and only
+    rewrites the partitions receiving or losing rows. The partition of every ad id
+    is kept in a primary key index stored in the dataset directory
+    """
+
+    PK_INDEX_NAME = "_pk_index.sqlite"
+
+    def __init__(self, path, time_col):
+        self.path = path
+        self.time_col = time_col
+        os.makedirs(path, exist_ok=True)
+        pk_index_path = os.path.join(path, self.PK_INDEX_NAME)
+        is_new_index = not os.path.exists(pk_index_path)
+        self.pk_index = PrimaryKeyIndex(pk_index_path)
+        if is_new_index:
+            self._build_pk_index()
+
+    def upsert(self, batch_df):
+        """Merge a preprocessed batch into the store, return the partitions rewritten"""
+        batch_df = add_month_column(batch_df, self.time_col)
+        # ad ids keep the declared dtype, which the first write stores in the dataset
+        batch_df = batch_df.astype({"ad_id": "string[pyarrow]"}).drop_duplicates(
+            "ad_id", keep="last"
+        )
+        dataset = self._get_dataset()
+        if dataset is None:
+            write_partitioned_dataset(
+                batch_df.drop(columns="month"),
+                self.path,
+                self.time_col,
+                overwrite=False,
+            )
+            self.pk_index.set_partitions(batch_df)
+            return get_partitions(batch_df)
+
+        batch_table = pa.Table.from_pandas(
+            batch_df.sort_values(["brand", self.time_col]), preserve_index=False
+        )
+        batch_table = batch_table.select(dataset.schema.names).cast(dataset.schema)
+        batch_ids = batch_table["ad_id"]
+
+        previous = self.pk_index.get_partitions(batch_df["ad_id"])
+        partitions = set(previous.values()) | get_partitions(batch_df)
+
+        merged_tables, old_files = [], []
+        for brand, month in partitions:
+            partition_filter = self._get_partition_filter(brand, month)
+            fragments = list(dataset.get_fragments(filter=partition_filter))
+            old_files.extend(fragment.path for fragment in fragments)
+            if fragments:
+                existing = dataset.to_table(filter=partition_filter)
+                merged_tables.append(
+                    existing.filter(pc.invert(pc.is_in(existing["ad_id"], batch_ids)))
+                )
+        merged_tables.append(batch_table)
+        merged = pa.concat_tables(merged_tables)
+
+        # new files are written before the replaced ones are removed
+        ds.write_dataset(
+            merged,
+            self.path,
+            format="parquet",
+            partitioning=ds.partitioning(
+                pa.schema([dataset.schema.field(col) for col in PARTITION_COLS]),
+                flavor="hive",
+            ),
+            basename_template="upsert-{}-{{i}}.parquet".format(uuid.uuid4().hex),
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        for old_file in old_files:
+            os.remove(old_file)
+        self._remove_empty_dirs()
+
+        self.pk_index.set_partitions(batch_df)
+        logger.info(
+            "Upserted %s rows (%s updates) into %s partitions of %s",
+            len(batch_df),
+            len(previous),
+            len(partitions),
+            self.path,
+        )
+        return partitions
+
+    def close(self):
+        self.pk_index.close()
+
+    def _get_dataset(self):
+        dataset = ds.dataset(self.path, format="parquet", partitioning="hive")
+        return dataset if dataset.files else None
+
+    def _get_partition_filter(self, brand, month):
+        brand_filter = (
+            ds.field("brand").is_null() if brand is None else ds.field("brand") == brand
+        )
+        return brand_filter & (ds.field("month") == month)
+
+    def _build_pk_index(self):
+        dataset = self._get_dataset()
+        if dataset is not None:
+            keys_df = dataset.to_table(columns=["ad_id"] + PARTITION_COLS).to_pandas()
+            self.pk_index.set_partitions(keys_df)
+
+    def _remove_empty_dirs(self):
+        for root, _, _ in os.walk(self.path, topdown=False):
+            if root != self.path and not os.listdir(root):
+                os.rmdir(root)
+
@@ -1,3 +1,28 @@
+import pandas as pd
+
+
 def clean_text_scraped_dict(t):
     t = " ".join(t.split()).replace(" Suivre", "")
     return t
+
+
+def get_memory_usage(df):
+    """Dtype and deep memory usage (MB) of every column of a frame"""
+    return pd.DataFrame(
+        {
+            "dtype": df.dtypes.astype(str),
+            "memory_mb": df.memory_usage(deep=True, index=False) / 1024**2,
+        }
+    )
+
+
+def memory_usage_report(before, after):
+    """Per column memory usage before/after a change, from two get_memory_usage"""
+    report = before.join(after, lsuffix="_before", rsuffix="_after", how="outer")
+    report["saving_pct"] = 100 * (1 - report["memory_mb_after"] / report["memory_mb_before"])
+    total = report[["memory_mb_before", "memory_mb_after"]].sum()
+    report.loc["total", ["memory_mb_before", "memory_mb_after"]] = total
+    report.loc["total", "saving_pct"] = 100 * (
+        1 - total["memory_mb_after"] / total["memory_mb_before"]
+    )
+    return report.round(3)
@@ -0,0 +1,290 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import src.config.constant_paths as cst_paths
+from src.config.raw_schemas import raw_schema_ads, raw_schema_pages
+from src.replay import ReplayServer, get_replay_key
+from src.session import VintedSession
+from src.sink import ParquetSink
+from src.throttling import AimdLimiter, RequestController
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+SCOPE_PATH = "/vetements?brand_id=53&order=newest_first"
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def make_catalog_item(ad_id):
+    return {
+        "id": ad_id,
+        "title": "Robe portefeuille {}".format(ad_id),
+        "price": "{}.0".format(5 + ad_id % 40),
+        "currency": "EUR",
+        "brand_title": "Zara",
+        "size_title": "M",
+        "url": "https://www.vinted.fr/items/{}-robe-portefeuille".format(ad_id),
+        "user": {"id": 1000 + ad_id % 7, "login": "vendeuse{}".format(ad_id % 7)},
+        "photo": {"high_resolution": {"timestamp": 1650000000 + ad_id}},
+    }
+
+
+def make_catalog_page(ad_ids):
+    """Html of a catalog page whose MainStore lists the given ad ids"""
+    store = {
+        "items": {
+            "catalogItems": {
+                "byId": {str(ad_id): make_catalog_item(ad_id) for ad_id in ad_ids}
+            }
+        }
+    }
+    return (
+        "<!DOCTYPE html><html><head><title>Vinted</title></head><body>"
+        '<div id="content"></div>'
+        '<script type="application/json" data-js-react-on-rails-store="MainStore">'
+        "{}</script></body></html>".format(json.dumps(store))
+    ).encode("utf-8")
+
+
+def write_replay_fixtures(fixtures_dir, bodies):
+    """Write {url: html} as a fixtures directory served by a ReplayServer"""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    with open(os.path.join(fixtures_dir, "index.jsonl"), "w", encoding="utf-8") as f:
+        for position, (url, body) in enumerate(bodies.items()):
+            body_file = "{:05d}.html".format(position)
+            with open(os.path.join(fixtures_dir, body_file), "wb") as body_f:
+                body_f.write(body)
+            entry = {
+                "key": get_replay_key(url),
+                "file": body_file,
+                "status": 200,
+                "content_type": "text/html; charset=utf-8",
+            }
+            f.write(json.dumps(entry) + "\n")
+
+
+def get_page_url(scope_url, page):
+    return scope_url if page == 0 else "{}&page={}".format(scope_url, page + 1)
+
+
+def make_session(max_concurrency=8):
+    """Session whose controller lets max_concurrency requests through from the start"""
+    controller = RequestController(limiter=AimdLimiter(initial=max_concurrency))
+    return VintedSession(pool_maxsize=max_concurrency, controller=controller)
+
+
+@pytest.fixture
+def catalog_server(tmp_path):
+    """Start a replay server of catalog pages, return the scope url
+    pages is a list of ad id lists, one per catalog page
+    """
+    servers = []
+
+    def start(pages, latency=0):
+        fixtures_dir = str(tmp_path / "catalog_{}".format(len(servers)))
+        bodies = {
+            get_page_url(SCOPE_PATH, page): make_catalog_page(ad_ids)
+            for page, ad_ids in enumerate(pages)
+        }
+        write_replay_fixtures(fixtures_dir, bodies)
+        server = ReplayServer(fixtures_dir, latency=latency).start()
+        servers.append(server)
+        return server.url + SCOPE_PATH
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def get_catalog_pages(n_pages, items_per_page=24, first_id=1):
+    """Ad ids of n_pages catalog pages of distinct ads"""
+    last_id = first_id + n_pages * items_per_page
+    return [
+        list(range(start, start + items_per_page))
+        for start in range(first_id, last_id, items_per_page)
+    ]
+
+
+class StubServer:
+    """Local HTTP server answering every GET with respond(path, n_request)
+    respond returns (status, headers dict, body bytes); each response is delayed
+    by latency seconds
+    """
+
+    def __init__(self, respond, latency=0):
+        self.respond = respond
+        self.latency = latency
+        self.n_requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _make_handler(self):
+        stub = self
+
+        class StubHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.n_requests += 1
+                    n_request = stub.n_requests
+                time.sleep(stub.latency)
+                status, headers, body = stub.respond(self.path, n_request)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return StubHandler
+
+
+@pytest.fixture
+def stub_server():
+    """Start a StubServer(respond, latency), stopped at the end of the test"""
+    servers = []
+
+    def start(respond, latency=0):
+        servers.append(StubServer(respond, latency))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+BRANDS = ["Zara", "Maje", "Sézane", "Levi's"]
+SIZES = ["XS", "S", "M", "L"]
+
+
+def make_raw_page_record(ad_id):
+    """Catalog item as written to the typed raw layer"""
+    return {
+        "id": ad_id,
+        "title": "Robe portefeuille {}".format(ad_id),
+        "price": float(5 + ad_id % 40),
+        "discount": None,
+        "brand_title": BRANDS[ad_id % len(BRANDS)],
+        "is_for_swap": False,
+        "url": "https://www.vinted.fr/items/{}-robe".format(ad_id),
+        "promoted": ad_id % 5 == 0,
+        "favourite_count": ad_id % 50,
+        "view_count": ad_id % 300,
+        "size_title": "{} / 38 / 10".format(SIZES[ad_id % len(SIZES)]),
+        "user": {"id": 1000 + ad_id % 7, "login": "vendeuse{}".format(ad_id % 7)},
+        "photo": {
+            "url": "https://images1.vinted.net/t/{}/f800/img.jpeg".format(ad_id),
+            "high_resolution": {"timestamp": 1640995200 + ad_id * 3600},
+        },
+    }
+
+
+def make_raw_ad_record(ad_id):
+    """Ad page as written to the typed raw layer"""
+    record = {
+        field.name: ad_id % 30
+        for field in raw_schema_ads
+        if field.name.endswith("_count")
+    }
+    posted_at = pd.Timestamp(1640995200 + ad_id * 3600, unit="s", tz="UTC")
+    user_id = 1000 + ad_id % 7
+    record.update(
+        {
+            "ad_id": ad_id,
+            "ad_title": "Robe portefeuille {}".format(ad_id),
+            "ad_description": "Robe fleurie, portée {} fois".format(ad_id % 3),
+            "user_id": user_id,
+            "user_login": "vendeuse{}".format(ad_id % 7),
+            "user_feedback_reputation": 0.9,
+            "user_created_at": "2021-03-01T10:00:00+01:00",
+            "user_last_loged_on_ts": "2022-05-03T20:01:00+02:00",
+            "user_city": "Lyon",
+            "user_country_id": 16,
+            "user_country_code": "FR",
+            "user_country_title": "France",
+            "user_bundle_discount": {"enabled": ad_id % 2 == 0},
+            "user_business": False,
+            "user_about": "",
+            "user_profile_url": "https://www.vinted.fr/member/{}".format(user_id),
+            "user_has_promoted_closet": False,
+            "details_Marque": BRANDS[ad_id % len(BRANDS)],
+            "details_Taille": "{} / 38 / 10".format(SIZES[ad_id % len(SIZES)]),
+            "details_État": "Très bon état",
+            "details_Couleur": "Bleu",
+            "details_Modes de paiement": "CARTE BANCAIRE",
+            "details_Nombre de vues": str(ad_id % 300),
+            "details_Intéressés·ées": "{} membres".format(ad_id % 50),
+            "details_Ajouté": posted_at.isoformat(),
+        }
+    )
+    return record
+
+
+def write_raw_parts(path, schema, make_record, ad_ids, part_size):
+    """Write the records of ad_ids to a typed raw dataset, part_size rows per part"""
+    with ParquetSink(path, row_group_size=part_size, schema=schema) as sink:
+        for ad_id in ad_ids:
+            sink.write(ad_id, make_record(ad_id))
+
+
+@pytest.fixture
+def data_paths(tmp_path, monkeypatch):
+    """Point the raw and preprocessed data paths to a temporary data directory"""
+    raw_path = tmp_path / "raw"
+    preprocessed_path = tmp_path / "preprocessed"
+    preprocessed_path.mkdir()
+    paths = {
+        "RAW_PAGES_PATH": raw_path / "pages_data.csv",
+        "RAW_ADS_PATH": raw_path / "ads_data.csv",
+        "RAW_PAGES_DATASET_PATH": raw_path / "pages",
+        "RAW_ADS_DATASET_PATH": raw_path / "ads",
+        "PREP_PAGES_PATH": preprocessed_path / "pages_data.parquet.gz",
+        "PREP_ADS_PATH": preprocessed_path / "ads_data.parquet.gz",
+        "PREP_PAGES_DATASET_PATH": preprocessed_path / "pages",
+        "PREP_ADS_DATASET_PATH": preprocessed_path / "ads",
+        "PREP_ADS_TEXT_INDEX_PATH": preprocessed_path / "ads_text_index.npz",
+        "PREP_PAGES_ROLLUPS_PATH": preprocessed_path / "pages_daily_rollups.parquet",
+    }
+    for name, path in paths.items():
+        monkeypatch.setattr(cst_paths, name, str(path))
+    return cst_paths
+
+
+@pytest.fixture
+def raw_layer(data_paths):
+    """Typed raw layer of 3 parts of pages and ads, returns the ad ids"""
+    ad_ids = list(range(1, 901))
+    write_raw_parts(
+        data_paths.RAW_PAGES_DATASET_PATH,
+        raw_schema_pages,
+        make_raw_page_record,
+        ad_ids,
+        300,
+    )
+    write_raw_parts(
+        data_paths.RAW_ADS_DATASET_PATH, raw_schema_ads, make_raw_ad_record, ad_ids, 300
+    )
+    return ad_ids
@@ -0,0 +1,15 @@
+from src.benchmark import scrape_pages_scenario
+from src.scraper import AsyncVintedScraper
+from tests.conftest import get_catalog_pages
+
+
+def test_pages_scenario_counts_the_pages_fetched(catalog_server):
+    scope_url = catalog_server(get_catalog_pages(3))
+
+    result, items = scrape_pages_scenario(
+        "pages_concurrent", AsyncVintedScraper, {}, scope_url, 5, 4
+    )
+
+    assert result["pages"] == 3
+    assert result["items"] == len(items) == 3 * 24
+    assert result["peak_rss_mb"] > 0
@@ -0,0 +1,111 @@
+import pandas as pd
+import pytest
+
+import app
+from src.comparables import ComparablesIndex
+
+BRANDS = ["Zara", "Maje"]
+SIZES = ["S", "M"]
+
+
+def make_listings_df(ad_ids, first_day="2022-01-01"):
+    """Listings of 2 brands x 2 sizes x 1 condition: 4 partitions"""
+    return pd.DataFrame(
+        {
+            "ad_id": [str(ad_id) for ad_id in ad_ids],
+            "price": [float(5 + ad_id % 40) for ad_id in ad_ids],
+            "brand": [BRANDS[ad_id % 2] for ad_id in ad_ids],
+            "size": [SIZES[ad_id // 2 % 2] for ad_id in ad_ids],
+            "condition": "Très bon état",
+            "photo_timestamp": [
+                pd.Timestamp(first_day) + pd.Timedelta(hours=ad_id) for ad_id in ad_ids
+            ],
+            "view_count": [ad_id % 300 for ad_id in ad_ids],
+            "favourite_count": [ad_id % 17 for ad_id in ad_ids],
+            "user_positive_feedback_count": [ad_id % 23 for ad_id in ad_ids],
+        }
+    )
+
+
+def get_listing(listings_df, ad_id):
+    listing = listings_df.set_index("ad_id").loc[str(ad_id)].to_dict()
+    listing["photo_timestamp"] = listing["photo_timestamp"].isoformat()
+    return listing
+
+
+def test_identical_listing_is_its_own_nearest_comparable():
+    listings_df = make_listings_df(range(400))
+    index = ComparablesIndex().build(listings_df)
+
+    result = index.query(get_listing(listings_df, 123), k=5)
+
+    assert result["n"] == 5
+    assert result["ad_ids"][0] == "123"
+    assert result["distances"][0] == pytest.approx(0.0)
+    assert index.reference_date == listings_df["photo_timestamp"].max()
+
+
+def test_saved_index_answers_the_same_queries(tmp_path):
+    listings_df = make_listings_df(range(400))
+    index = ComparablesIndex().build(listings_df, "v1")
+    path = str(tmp_path / "comparables_index.pkl")
+    index.save(path)
+
+    loaded = ComparablesIndex.load(path)
+
+    assert loaded.source_version == "v1"
+    assert len(loaded) == len(index) == 400
+    listing = get_listing(listings_df, 42)
+    assert loaded.query(listing, k=10) == index.query(listing, k=10)
+
+
+def test_update_rebuilds_only_the_changed_partition():
+    listings_df = make_listings_df(range(400))
+    index = ComparablesIndex().build(listings_df)
+    partitions = dict(index.partitions)
+
+    # newer listings of a single partition (Zara, S)
+    new_df = make_listings_df(range(400, 440), first_day="2022-03-01")
+    new_df = new_df[(new_df["brand"] == "Zara") & (new_df["size"] == "S")]
+    n_rebuilt = index.update(pd.concat([listings_df, new_df], ignore_index=True))
+
+    assert n_rebuilt == 1
+    changed = [
+        key for key, partition in index.partitions.items()
+        if partition is not partitions[key]
+    ]
+    assert changed == [("Zara", "S", "Très bon état")]
+    assert len(index) == 400 + len(new_df)
+
+
+def test_small_partition_falls_back_to_the_same_brand_and_size():
+    listings_df = make_listings_df(range(400))
+    listings_df.loc[listings_df.index[:3], "condition"] = "Neuf avec étiquette"
+    index = ComparablesIndex().build(listings_df)
+    listing = get_listing(listings_df, 0)
+
+    result = index.query(listing, k=10)
+
+    assert result["n"] == 10
+    assert result["ad_ids"][0] == "0"
+    brand_size_df = listings_df[
+        (listings_df["brand"] == listing["brand"])
+        & (listings_df["size"] == listing["size"])
+    ]
+    assert set(result["ad_ids"]) <= set(brand_size_df["ad_id"])
+    assert index.query(dict(listing, brand="Sézane"), k=10)["n"] == 0
+    with pytest.raises(ValueError):
+        index.query(listing, k=0)
+
+
+def test_comparables_route_rejects_k_below_1(monkeypatch):
+    index = ComparablesIndex().build(make_listings_df(range(40)))
+    monkeypatch.setattr(app, "get_comparables_index", lambda: index)
+    client = app.server.test_client()
+    listing = {"brand": "Zara", "size": "S", "condition": "Très bon état"}
+
+    assert client.post("/comparables?k=0", json=listing).status_code == 400
+    assert client.post("/comparables?k=-3", json=listing).status_code == 400
+    response = client.post("/comparables?k=3", json=listing)
+    assert response.status_code == 200
+    assert response.get_json()["n"] == 3
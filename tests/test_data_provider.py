@@ -0,0 +1,66 @@
+import os
+import time
+
+import pandas as pd
+
+from src.data_provider import DataProvider
+
+
+def write_pages(path, n_rows, mtime_ns):
+    brands = [["Zara", "Maje", None][i % 3] for i in range(n_rows)]
+    pd.DataFrame(
+        {
+            "ad_id": [str(i) for i in range(n_rows)],
+            "brand": pd.Categorical(brands),
+            "price": [float(5 + i % 40) for i in range(n_rows)],
+            "view_count": [i % 300 for i in range(n_rows)],
+            "favourite_count": [i % 50 for i in range(n_rows)],
+            "photo_timestamp": pd.Timestamp("2022-01-01")
+            + pd.to_timedelta(range(n_rows), unit="h"),
+        }
+    ).to_parquet(path)
+    # distinct mtimes even on filesystems with a coarse timestamp resolution
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_provider_reloads_when_the_file_changes(tmp_path):
+    path = str(tmp_path / "pages_data.parquet")
+    write_pages(path, 30, 10 ** 18)
+    loads = []
+    provider = DataProvider(
+        path, poll_interval=0, on_load=loads.append, ipc_dir=str(tmp_path / "arrow")
+    )
+    assert provider.health()["status"] == "not loaded"
+
+    snapshot = provider.get()
+    assert provider.get() is snapshot
+    assert snapshot.brand_index.count("Zara") == 10
+    assert not provider.reload_if_changed()
+
+    write_pages(path, 60, 2 * 10 ** 18)
+    assert provider.reload_if_changed()
+
+    new_snapshot = provider.get()
+    assert new_snapshot.version != snapshot.version
+    assert new_snapshot.brand_index.count("Zara") == 20
+    assert loads == [snapshot, new_snapshot]
+    assert provider.health()["n_rows"] == 60
+    # the previous snapshot stays usable by callbacks still holding it
+    assert len(snapshot.df) == 30
+
+
+def test_watcher_keeps_the_snapshot_when_a_reload_fails(tmp_path):
+    path = str(tmp_path / "pages_data.parquet")
+    write_pages(path, 30, 10 ** 18)
+    provider = DataProvider(path, poll_interval=0.05, ipc_dir=str(tmp_path / "arrow"))
+    snapshot = provider.get()
+
+    with open(path, "wb") as pages_file:
+        pages_file.write(b"not parquet")
+    deadline = time.monotonic() + 5
+    while provider.reload_errors == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert provider.reload_errors > 0
+    assert provider.get() is snapshot
+    assert provider.health()["status"] == "ok"
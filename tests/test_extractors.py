@@ -0,0 +1,56 @@
+import pytest
+
+from src.extractors import ScanExtractor, SoupExtractor
+from tests.conftest import read_fixture
+
+CATALOG_PAGES = ["catalog_page.html", "catalog_page_short.html"]
+AD_PAGES = ["ad_page.html", "ad_page_minimal.html"]
+
+
+def fail_on_fallback(*args):
+    raise AssertionError("ScanExtractor fell back to the full DOM")
+
+
+@pytest.mark.parametrize("fixture", CATALOG_PAGES)
+def test_scan_extractor_matches_soup_on_catalog_pages(fixture, monkeypatch):
+    html = read_fixture(fixture)
+    expected = SoupExtractor().get_page_data(html)
+
+    monkeypatch.setattr(SoupExtractor, "get_page_data", fail_on_fallback)
+    assert ScanExtractor().get_page_data(html) == expected
+
+
+@pytest.mark.parametrize("fixture", AD_PAGES)
+def test_scan_extractor_matches_soup_on_ad_pages(fixture, monkeypatch):
+    html = read_fixture(fixture)
+    expected = SoupExtractor().get_ad_data(html)
+
+    monkeypatch.setattr(SoupExtractor, "get_ad_data", fail_on_fallback)
+    assert ScanExtractor().get_ad_data(html) == expected
+
+
+def test_ad_page_fields():
+    ad = ScanExtractor().get_ad_data(read_fixture("ad_page.html"))
+
+    assert ad["ad_description"] == "Portée deux fois.\nTaille un peu grand — idéal <M>."
+    assert ad["user_bundle_discount"]["enabled"] is True
+    assert ad["details_Marque"] == "Zara"
+    assert ad["details_Taille"] == "M / 38 / 10"
+    assert ad["details_Ajouté"] == "2022-05-01T14:23:08+02:00"
+
+
+def test_catalog_page_items():
+    items = ScanExtractor().get_page_data(read_fixture("catalog_page.html"))
+
+    assert len(items) == 24
+    assert all(str(item["id"]) == ad_id for ad_id, item in items.items())
+
+
+def test_scan_extractor_falls_back_to_soup():
+    html = read_fixture("catalog_page.html").replace(
+        b'data-js-react-on-rails-store="MainStore"',
+        b"data-js-react-on-rails-store='MainStore'",
+    )
+
+    assert ScanExtractor().get_page_data(html) == SoupExtractor().get_page_data(html)
+    assert len(ScanExtractor().get_page_data(html)) == 24
@@ -0,0 +1,66 @@
+import os
+
+from src.figure_cache import FigureCache
+
+
+def make_cached_callback(cache, calls):
+    @cache.memoize
+    def build_figure(brand):
+        calls.append(brand)
+        return {"data": [{"type": "indicator", "value": len(brand)}], "brand": brand}
+
+    return build_figure
+
+
+def test_least_recently_used_figures_are_evicted():
+    cache = FigureCache(max_size=2, version="v1")
+    calls = []
+    build_figure = make_cached_callback(cache, calls)
+
+    build_figure("Zara")
+    build_figure("Maje")
+    build_figure("Zara")
+    build_figure("Sézane")  # evicts Maje, the least recently used
+    build_figure("Zara")
+    build_figure("Maje")
+
+    assert calls == ["Zara", "Maje", "Sézane", "Maje"]
+    assert cache.stats()["size"] == 2
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_new_version_drops_the_figures():
+    cache = FigureCache(version="v1")
+    calls = []
+    build_figure = make_cached_callback(cache, calls)
+
+    build_figure("Zara")
+    cache.set_version("v2")
+    build_figure("Zara")
+
+    assert calls == ["Zara", "Zara"]
+
+
+def test_figures_evicted_from_memory_are_read_from_disk(tmp_path):
+    cache_dir = str(tmp_path / "figures")
+    cache = FigureCache(max_size=1, cache_dir=cache_dir, version="v1")
+    calls = []
+    build_figure = make_cached_callback(cache, calls)
+
+    zara_figure = build_figure("Zara")
+    build_figure("Maje")
+    assert build_figure("Zara") == zara_figure
+    assert calls == ["Zara", "Maje"]
+    assert cache.disk_hits == 1
+
+    # another worker sharing the directory reads the figures from disk
+    other_calls = []
+    other_cache = FigureCache(cache_dir=cache_dir, version="v1")
+    assert make_cached_callback(other_cache, other_calls)("Maje")["brand"] == "Maje"
+    assert other_calls == []
+
+    other_cache.set_version("v2")
+    assert os.listdir(cache_dir) == []
+    make_cached_callback(other_cache, other_calls)("Maje")
+    assert other_calls == ["Maje"]
+    assert os.listdir(cache_dir) == ["v2"]
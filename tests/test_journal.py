@@ -0,0 +1,36 @@
+import os
+
+from src.config.raw_schemas import raw_schema_pages
+from src.journal import ScrapeJob
+from src.loader import load_raw_vinted_dataset
+from tests.conftest import get_catalog_pages
+
+
+def test_published_job_is_read_from_the_raw_layer(catalog_server, tmp_path):
+    raw_pages_path = str(tmp_path / "raw" / "pages")
+    raw_ads_path = str(tmp_path / "raw" / "ads")
+    for n_pages, job_name in [(2, "robes"), (3, "jupes")]:
+        scope_url = catalog_server(get_catalog_pages(n_pages))
+        job = ScrapeJob.create(
+            str(tmp_path / job_name), scope_url, max_pages=n_pages, scrape_ads=False
+        )
+        job.run()
+        job.publish(raw_pages_path, raw_ads_path)
+
+    # A part being written by a sink is not read
+    with open(os.path.join(raw_pages_path, "part-00000.parquet.tmp"), "wb") as f:
+        f.write(b"PAR1")
+
+    pages_df = load_raw_vinted_dataset(raw_pages_path, raw_schema_pages)
+    assert len(pages_df) == (2 + 3) * 24
+    assert list(pages_df.columns) == raw_schema_pages.names
+
+    assert job.publish(raw_pages_path, raw_ads_path) == 0
+    assert len(load_raw_vinted_dataset(raw_pages_path, raw_schema_pages)) == 5 * 24
+
+
+def test_load_empty_raw_layer(tmp_path):
+    pages_df = load_raw_vinted_dataset(str(tmp_path), raw_schema_pages)
+
+    assert pages_df.empty
+    assert list(pages_df.columns) == raw_schema_pages.names
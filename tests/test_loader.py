@@ -0,0 +1,118 @@
+import os
+
+import pandas as pd
+
+from src.loader import (
+    iter_raw_vinted_chunks,
+    preprocess_save_raw_vinted_data_chunked,
+    preprocess_save_raw_vinted_data_incremental,
+)
+from src.config.raw_schemas import raw_schema_ads, raw_schema_pages
+from src.text_index import TextIndex
+from tests.conftest import make_raw_page_record, write_raw_parts
+
+
+def test_parquet_chunks_have_a_running_index(data_paths, raw_layer):
+    chunks = list(
+        iter_raw_vinted_chunks(
+            "parquet", None, data_paths.RAW_ADS_DATASET_PATH, raw_schema_ads, 200
+        )
+    )
+
+    assert len(chunks) == 6
+    index = pd.concat(chunks).index
+    assert index.is_unique
+    assert list(index) == list(range(len(raw_layer)))
+
+
+def test_chunked_preprocessing_of_the_parquet_raw_layer(data_paths, raw_layer):
+    preprocess_save_raw_vinted_data_chunked(
+        raw_format="parquet", chunk_size=250, max_workers=2
+    )
+
+    pages_df = pd.read_parquet(data_paths.PREP_PAGES_PATH)
+    ads_df = pd.read_parquet(data_paths.PREP_ADS_PATH)
+    assert len(pages_df) == len(ads_df) == len(raw_layer)
+    assert ads_df.index.is_unique
+    assert sorted(ads_df["ad_id"].astype(int)) == raw_layer
+
+    text_index = TextIndex.load(data_paths.PREP_ADS_TEXT_INDEX_PATH)
+    assert len(text_index.ad_ids) == len(raw_layer)
+
+
+def test_incremental_outputs_keep_the_declared_dtypes(data_paths, raw_layer):
+    preprocess_save_raw_vinted_data_incremental()
+    incremental_dfs = [
+        pd.read_parquet(data_paths.PREP_PAGES_PATH),
+        pd.read_parquet(data_paths.PREP_ADS_PATH),
+    ]
+    preprocess_save_raw_vinted_data_chunked(raw_format="parquet", chunk_size=300)
+    full_dfs = [
+        pd.read_parquet(data_paths.PREP_PAGES_PATH),
+        pd.read_parquet(data_paths.PREP_ADS_PATH),
+    ]
+
+    for incremental_df, full_df in zip(incremental_dfs, full_dfs):
+        assert len(incremental_df) == len(full_df) == len(raw_layer)
+        assert isinstance(incremental_df["ad_id"].dtype, pd.StringDtype)
+        assert incremental_df.dtypes.astype(str).to_dict() == full_df.dtypes.astype(
+            str
+        ).to_dict()
+
+
+def get_dataset_files(path):
+    """{partition directory: {file name: mtime}} of a partitioned dataset"""
+    files = {}
+    for root, _, names in os.walk(path):
+        for name in names:
+            if name.endswith(".parquet"):
+                mtime = os.stat(os.path.join(root, name)).st_mtime_ns
+                files.setdefault(os.path.relpath(root, path), {})[name] = mtime
+    return files
+
+
+def test_incremental_upsert_into_existing_data(data_paths, raw_layer):
+    preprocess_save_raw_vinted_data_incremental()
+    files_before = get_dataset_files(data_paths.PREP_PAGES_DATASET_PATH)
+
+    def make_updated_record(ad_id):
+        record = make_raw_page_record(ad_id)
+        record["price"] = 999.0
+        if ad_id == 6:
+            record["brand_title"] = "Maje"  # was Sézane
+        return record
+
+    # ads 5 (Maje) and 6, posted in January 2022
+    write_raw_parts(
+        data_paths.RAW_PAGES_DATASET_PATH,
+        raw_schema_pages,
+        make_updated_record,
+        [5, 6],
+        2,
+    )
+    preprocess_save_raw_vinted_data_incremental()
+
+    pages_df = pd.read_parquet(data_paths.PREP_PAGES_PATH)
+    assert len(pages_df) == len(raw_layer)
+    assert pages_df["ad_id"].is_unique
+    updated_df = pages_df.set_index("ad_id").loc[["5", "6"]]
+    assert list(updated_df["price"]) == [999.0, 999.0]
+    assert list(updated_df["brand"].astype(str)) == ["Maje", "Maje"]
+    assert (pages_df.loc[~pages_df["ad_id"].isin(["5", "6"]), "price"] < 999).all()
+
+    files_after = get_dataset_files(data_paths.PREP_PAGES_DATASET_PATH)
+    changed = {
+        partition
+        for partition in set(files_before) | set(files_after)
+        if files_before.get(partition) != files_after.get(partition)
+    }
+    assert changed == {
+        os.path.join("brand=Maje", "month=2022-01"),
+        os.path.join("brand=S%C3%A9zane", "month=2022-01"),
+    }
+
+    # nothing new: nothing rewritten
+    outputs_mtime = os.stat(data_paths.PREP_PAGES_PATH).st_mtime_ns
+    preprocess_save_raw_vinted_data_incremental()
+    assert get_dataset_files(data_paths.PREP_PAGES_DATASET_PATH) == files_after
+    assert os.stat(data_paths.PREP_PAGES_PATH).st_mtime_ns == outputs_mtime
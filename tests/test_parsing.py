@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from src.parsing import extract_literal_fields, parse_literals
+
+# cells of the raw csv, as written by the repr of the scraped dicts
+EDGE_CASE_CELLS = [
+    repr({"id": 1, "login": "l'atelier", "business": False, "photo": None}),
+    repr({"id": 2, "login": 'say "hi"', "business": True, "photo": {"id": 7}}),
+    repr({"id": 3, "login": "back\\slash", "business": False, "photo": None}),
+    repr({"id": 4, "login": "tab\there\nnewline", "business": False, "photo": None}),
+    repr({"id": 5, "login": "éà ✓", "business": False, "photo": {"id": None}}),
+    repr({"id": 6, "login": "it's \"both\"", "business": False, "photo": None}),
+    repr({"id": 7, "login": None, "business": None, "photo": {"x": {"y": [1, 2]}}}),
+    repr({"id": 8, "login": "ratio", "business": False, "score": 0.5}),
+]
+
+
+def eval_fields(series, fields):
+    """Previous implementation of the raw dict columns: eval then json_normalize"""
+    records_df = pd.json_normalize(
+        series.apply(lambda value: {} if value is np.nan else eval(value))
+    )
+    records_df.index = series.index
+    return records_df.reindex(columns=fields)
+
+
+def test_parse_literals_matches_eval():
+    values = EDGE_CASE_CELLS + ["{'nested': {'a': {'b': None}}, 'empty': {}}"]
+
+    assert parse_literals(values) == [eval(value) for value in values]
+
+
+def test_extract_literal_fields_matches_eval():
+    series = pd.Series(EDGE_CASE_CELLS * 2 + [np.nan], index=range(100, 117))
+    fields = ["id", "login", "business", "photo.id", "photo.x.y", "score"]
+
+    expected = eval_fields(series, fields)
+    parsed = extract_literal_fields(series, fields)
+
+    pd.testing.assert_frame_equal(parsed, expected)
+
+
+def test_extract_literal_fields_of_complete_columns_matches_eval():
+    series = pd.Series(
+        [repr({"id": i, "enabled": i % 2 == 0, "fraction": i / 4}) for i in range(5)]
+    )
+    fields = ["id", "enabled", "fraction"]
+
+    pd.testing.assert_frame_equal(
+        extract_literal_fields(series, fields), eval_fields(series, fields)
+    )
+
+
+def test_bundle_status_matches_eval():
+    series = pd.Series(
+        ["{'enabled': True, 'discounts': []}", np.nan, "{'enabled': False}"] * 3
+    )
+
+    expected = series.apply(
+        lambda value: False if value is np.nan else eval(value)["enabled"]
+    )
+    parsed = extract_literal_fields(series, ["enabled"], missing=False)["enabled"]
+
+    pd.testing.assert_series_equal(parsed, expected, check_names=False)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from src.loader import preprocess_save_raw_vinted_data_chunked
+from src.pricing import PricingEngine
+
+
+def test_engine_is_refitted_when_the_data_changes(data_paths, raw_layer, tmp_path):
+    preprocess_save_raw_vinted_data_chunked(raw_format="parquet", chunk_size=300)
+    engine_path = str(tmp_path / "pricing_engine.pkl")
+    pages_path, ads_path = data_paths.PREP_PAGES_PATH, data_paths.PREP_ADS_PATH
+
+    engine = PricingEngine.load_or_fit(engine_path, pages_path, ads_path, "v1")
+    assert engine.source_version == "v1"
+    loaded = PricingEngine.load_or_fit(engine_path, pages_path, ads_path, "v1")
+    assert loaded.reference_date == engine.reference_date
+
+    pages_df = pd.read_parquet(pages_path)
+    pages_df["photo_timestamp"] += pd.Timedelta(days=10)
+    pages_df.to_parquet(pages_path)
+    refitted = PricingEngine.load_or_fit(engine_path, pages_path, ads_path, "v2")
+    assert refitted.source_version == "v2"
+    assert refitted.reference_date == engine.reference_date + pd.Timedelta(days=10)
+    assert PricingEngine.load(engine_path).source_version == "v2"
+
+
+def test_listing_age_defaults_to_the_training_reference_date(
+    data_paths, raw_layer, tmp_path
+):
+    preprocess_save_raw_vinted_data_chunked(raw_format="parquet", chunk_size=300)
+    engine = PricingEngine().fit(
+        pd.read_parquet(data_paths.PREP_PAGES_PATH),
+        pd.read_parquet(data_paths.PREP_ADS_PATH),
+    )
+    listings = [
+        {"brand": "Zara", "photo_timestamp": "2022-01-20T00:00:00"},
+        {"brand": "Maje", "photo_timestamp": "2022-02-01T00:00:00"},
+    ]
+
+    prices = engine.predict(listings)
+    assert np.allclose(prices, engine.predict(listings, engine.reference_date))
+    assert np.isfinite(prices).all()
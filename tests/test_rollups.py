@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from src.rollups import DailyRollups, SKETCH_EDGES, compute_daily_rollups
+
+
+def test_prices_outside_the_sketch_range():
+    prices = [5.0, 20.0, 19999.0, 20000.0, 25000.0, np.nan, -1.0]
+    pages_df = pd.DataFrame(
+        {
+            "brand": ["Zara"] * len(prices),
+            "photo_timestamp": pd.Timestamp("2022-01-01 10:00"),
+            "price": prices,
+            "view_count": 1,
+            "favourite_count": 0,
+        }
+    )
+
+    rollups = compute_daily_rollups(pages_df)
+
+    sketch = rollups["price_sketch"].iloc[0]
+    assert len(sketch) == len(SKETCH_EDGES) - 1
+    # high prices are clamped into the last bucket, missing and negative ones left out
+    assert sketch.sum() == 5
+    assert sketch[-1] == 3
+    assert rollups["price_max"].iloc[0] == 25000.0
+
+    summary = DailyRollups(rollups).summarise(
+        "Zara", pd.Timestamp("2022-01-01"), pd.Timestamp("2022-01-01"), (0.2, 1.0)
+    )
+    low, high = summary["price_quantiles"].values()
+    assert 4 < low < 6
+    assert high == SKETCH_EDGES[-1]
+
+
+def test_price_mean_leaves_out_missing_prices():
+    days = pd.to_datetime(["2022-01-01", "2022-01-02"])
+    pages_df = pd.DataFrame(
+        {
+            "brand": "Zara",
+            "photo_timestamp": days.append(days),
+            "price": [10.0, 30.0, np.nan, np.nan],
+            "view_count": 1,
+            "favourite_count": 0,
+        }
+    )
+    rollups = compute_daily_rollups(pages_df)
+    assert list(rollups["n_ads"]) == [2, 2]
+    assert list(rollups["n_prices"]) == [1, 1]
+
+    summary = DailyRollups(rollups).summarise(
+        "Zara", pd.Timestamp("2022-01-01"), pd.Timestamp("2022-01-02")
+    )
+    assert summary["n_ads"] == 4
+    assert summary["price_mean"] == 20.0
+
+    # rollups saved before the price count
+    legacy = DailyRollups(rollups.drop(columns="n_prices"))
+    assert legacy.summarise("Zara", "2022-01-01", "2022-01-02")["price_mean"] == 10.0
@@ -0,0 +1,169 @@
+import time
+
+import pandas as pd
+import pytest
+
+from src.extractors import ScanExtractor
+from src.journal import ScrapeJob
+from src.scraper import AsyncVintedScraper, ParallelVintedAdScraper, VintedScraper
+from src.seen_index import SeenAdsIndex
+from src.session import VintedSession
+from src.sink import ParquetSink
+from src.throttling import RequestFailed
+from tests.conftest import get_catalog_pages, make_session, read_fixture
+
+N_PAGES = 10
+LATENCY = 0.1
+
+
+def scrape_pages(scraper):
+    start = time.perf_counter()
+    scraper.get_pages_in_scope()
+    return time.perf_counter() - start
+
+
+def test_async_scraper_matches_sequential_scraper(catalog_server):
+    scope_url = catalog_server(get_catalog_pages(3))
+
+    sequential = VintedScraper(scope_url, 3, session=make_session())
+    concurrent = AsyncVintedScraper(scope_url, 3, session=make_session())
+    sequential.get_pages_in_scope()
+    concurrent.get_pages_in_scope()
+
+    assert len(concurrent.items_df) == 3 * 24
+    pd.testing.assert_frame_equal(concurrent.items_df, sequential.items_df)
+
+
+def test_async_scraper_overlaps_page_latency(catalog_server):
+    scope_url = catalog_server(get_catalog_pages(N_PAGES), latency=LATENCY)
+
+    sequential_seconds = scrape_pages(
+        VintedScraper(scope_url, N_PAGES, session=make_session())
+    )
+    concurrent_seconds = scrape_pages(
+        AsyncVintedScraper(
+            scope_url, N_PAGES, max_concurrency=N_PAGES, session=make_session(N_PAGES)
+        )
+    )
+
+    assert sequential_seconds >= N_PAGES * LATENCY
+    assert concurrent_seconds < sequential_seconds / 3
+
+
+def test_async_scraper_reports_failed_pages(catalog_server):
+    scope_url = catalog_server(get_catalog_pages(2))
+    scraper = AsyncVintedScraper(scope_url, 3, session=make_session())
+    scraper.session.controller.max_retries = 0
+
+    scraper.get_pages_in_scope()
+
+    assert len(scraper.items_df) == 2 * 24
+    assert list(scraper.failed_pages) == ["{}&page=3".format(scope_url)]
+
+
+class CountingSession(VintedSession):
+    def __init__(self, **session_kwargs):
+        super().__init__(**session_kwargs)
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+        return super().get(url)
+
+
+def test_async_scraper_stops_requesting_after_known_page(catalog_server, tmp_path):
+    pages = get_catalog_pages(20)
+    scope_url = catalog_server(pages)
+    seen_index = SeenAdsIndex(str(tmp_path / "seen.sqlite"))
+    seen_index.update_seen({str(ad_id): {} for ad_id in pages[1]})
+    session = CountingSession()
+    scraper = AsyncVintedScraper(
+        scope_url, 20, max_concurrency=4, session=session, seen_index=seen_index
+    )
+
+    scraper.get_pages_in_scope()
+
+    assert len(scraper.items_df) == 2 * 24
+    assert len(session.urls) <= 4 + 1
+    assert scraper.fetches_avoided == 20 - len(session.urls)
+
+
+def test_pages_are_recorded_as_seen_on_commit(catalog_server, tmp_path):
+    scope_url = catalog_server(get_catalog_pages(2))
+    seen_index = SeenAdsIndex(str(tmp_path / "seen.sqlite"))
+    scraper = AsyncVintedScraper(
+        scope_url, 2, session=make_session(), seen_index=seen_index
+    )
+
+    urls = [url for url, _ in scraper.iter_pages_by_url()]
+    assert len(seen_index) == 0
+
+    scraper.commit_seen(urls[:1])
+    assert len(seen_index) == 24
+    scraper.commit_seen()
+    assert len(seen_index) == 2 * 24
+
+
+def test_scrape_job_records_seen_ads_once_flushed(
+    catalog_server, tmp_path, monkeypatch
+):
+    scope_url = catalog_server(get_catalog_pages(3))
+    seen_index_path = str(tmp_path / "seen.sqlite")
+    job = ScrapeJob.create(
+        str(tmp_path / "job"),
+        scope_url,
+        max_pages=3,
+        scrape_ads=False,
+        row_group_size=2 * 24,
+        seen_index_path=seen_index_path,
+    )
+    flush = ParquetSink.flush
+
+    def flush_once(sink):
+        if sink.n_parts:
+            raise KeyboardInterrupt
+        flush(sink)
+
+    monkeypatch.setattr(ParquetSink, "flush", flush_once)
+    with pytest.raises(KeyboardInterrupt):
+        job.run()
+
+    assert job.inspect()["pages_rows"] == 2 * 24
+    assert len(SeenAdsIndex(seen_index_path)) == 2 * 24
+
+
+def test_parallel_ad_scraper_keeps_input_order_and_reports_failures(stub_server):
+    ad_html = read_fixture("ad_page.html")
+
+    def respond(path, n_request):
+        ad = path.rsplit("/", 1)[-1]
+        if ad == "missing":
+            return 404, {}, b""
+        if ad == "broken":
+            return 200, {"Content-Type": "text/html"}, b"<html><body></body></html>"
+        # the first ads answer last
+        time.sleep(0.02 * (10 - int(ad)))
+        return 200, {"Content-Type": "text/html"}, ad_html
+
+    server = stub_server(respond)
+    ads = ["0", "1", "missing", "2", "3", "broken", "4", "5", "6", "7"]
+    session = make_session()
+    session.controller.max_retries = 0
+    scraper = ParallelVintedAdScraper(
+        ["{}/items/{}".format(server.url, ad) for ad in ads],
+        ["id-{}".format(ad) for ad in ads],
+        max_workers=4,
+        parse_workers=2,
+        rate=1000,
+        session=session,
+    )
+
+    results = list(scraper.iter_ads())
+
+    expected_ad = ScanExtractor().get_ad_data(ad_html)
+    assert [id_ for id_, _ in results] == [
+        "id-{}".format(ad) for ad in ads if ad not in ("missing", "broken")
+    ]
+    assert all(ad_dict == expected_ad for _, ad_dict in results)
+    assert sorted(scraper.failed_ads) == ["id-broken", "id-missing"]
+    assert isinstance(scraper.failed_ads["id-missing"], RequestFailed)
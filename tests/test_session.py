@@ -0,0 +1,42 @@
+from src.session import VintedSession
+from tests.conftest import make_catalog_page
+
+BODY = make_catalog_page([1, 2, 3])
+
+
+def test_unchanged_page_is_served_from_the_cache(stub_server, tmp_path):
+    def respond(path, n_request):
+        if n_request == 1:
+            headers = {"Content-Type": "text/html", "ETag": '"v1"'}
+            return 200, headers, BODY
+        return 304, {"ETag": '"v1"'}, b""
+
+    server = stub_server(respond)
+    session = VintedSession(cache_dir=str(tmp_path / "cache"))
+    url = server.url + "/vetements?page=1"
+
+    first = session.get(url)
+    assert first.content == BODY
+    assert (session.hits, session.misses) == (0, 1)
+
+    second = session.get(url)
+    assert second.status_code == 200
+    assert second.content == BODY
+    assert second.headers["ETag"] == '"v1"'
+    assert server.n_requests == 2
+
+    stats = session.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_rate"] == 0.5
+    assert stats["retries"] == 0
+
+
+def test_responses_without_validators_are_not_cached(stub_server, tmp_path):
+    server = stub_server(lambda path, n_request: (200, {}, BODY))
+    session = VintedSession(cache_dir=str(tmp_path / "cache"))
+
+    session.get(server.url + "/vetements")
+    session.get(server.url + "/vetements")
+
+    assert session.stats()["hits"] == 0
+    assert session.stats()["misses"] == 2
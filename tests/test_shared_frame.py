@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_provider import DataSnapshot
+from src.loader import preprocess_save_raw_vinted_data_chunked
+from src.shared_frame import load_shared_frame
+
+SORT_BY = [("brand", "ascending"), ("photo_timestamp", "ascending")]
+
+
+def test_snapshot_of_pipeline_output_with_category_columns(
+    data_paths, raw_layer, tmp_path
+):
+    preprocess_save_raw_vinted_data_chunked(raw_format="parquet", chunk_size=250)
+    assert isinstance(
+        pd.read_parquet(data_paths.PREP_PAGES_PATH)["brand"].dtype,
+        pd.CategoricalDtype,
+    )
+
+    snapshot = DataSnapshot(data_paths.PREP_PAGES_PATH, str(tmp_path / "arrow"))
+
+    df = snapshot.df
+    assert len(df) == len(raw_layer)
+    assert isinstance(df["brand"].dtype, pd.CategoricalDtype)
+    brands = df["brand"].astype(str)
+    assert brands.is_monotonic_increasing
+    for brand in snapshot.brand_index.brands:
+        brand_df = snapshot.brand_index.get_brand_df(brand)
+        assert (brand_df["brand"] == brand).all()
+        assert brand_df["photo_timestamp"].is_monotonic_increasing
+    assert sum(map(snapshot.brand_index.count, snapshot.brand_index.brands)) == len(df)
+
+
+def get_memory_mb():
+    """(RSS, PSS) of this process: PSS splits shared pages between their users"""
+    with open("/proc/self/smaps_rollup") as f:
+        fields = dict(line.split(":", 1) for line in f if ":" in line)
+    return (
+        int(fields["Rss"].split()[0]) / 1024,
+        int(fields["Pss"].split()[0]) / 1024,
+    )
+
+
+def load_frame_worker(path, shared, ipc_dir, queue, barrier):
+    rss, pss = get_memory_mb()
+    if shared:
+        df = load_shared_frame(path, "v1", SORT_BY, ipc_dir)
+    else:
+        df = pd.read_parquet(path)
+    df["price"].sum(), df["photo_timestamp"].max()
+    # all workers hold the frame while every one of them measures
+    barrier.wait()
+    new_rss, new_pss = get_memory_mb()
+    queue.put((new_rss - rss, new_pss - pss))
+    barrier.wait()
+
+
+def measure_workers(n_workers, path, shared, ipc_dir):
+    """Total RSS and PSS taken by n_workers processes loading the frame"""
+    spawn = multiprocessing.get_context("spawn")
+    queue, barrier = spawn.Queue(), spawn.Barrier(n_workers)
+    workers = [
+        spawn.Process(
+            target=load_frame_worker, args=(path, shared, ipc_dir, queue, barrier)
+        )
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    memory = [queue.get(timeout=120) for _ in workers]
+    for worker in workers:
+        worker.join()
+    return sum(rss for rss, _ in memory), sum(pss for _, pss in memory)
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/self/smaps_rollup"), reason="needs /proc smaps_rollup"
+)
+def test_shared_frame_memory_does_not_grow_with_workers(tmp_path):
+    n_rows = 2_000_000
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "pages_data.parquet")
+    pd.DataFrame(
+        {
+            "ad_id": np.arange(n_rows),
+            "brand": pd.Categorical(rng.choice(["Zara", "Maje", "Sézane"], n_rows)),
+            "price": rng.uniform(1, 200, n_rows),
+            "favourite_count": rng.integers(0, 100, n_rows),
+            "photo_timestamp": pd.Timestamp("2022-01-01")
+            + pd.to_timedelta(rng.integers(0, 365 * 86400, n_rows), unit="s"),
+        }
+    ).to_parquet(path)
+    ipc_dir = str(tmp_path / "arrow")
+    load_shared_frame(path, "v1", SORT_BY, ipc_dir)
+
+    _, private_pss_1 = measure_workers(1, path, False, ipc_dir)
+    _, private_pss_8 = measure_workers(8, path, False, ipc_dir)
+    shared_rss_1, shared_pss_1 = measure_workers(1, path, True, ipc_dir)
+    shared_rss_8, shared_pss_8 = measure_workers(8, path, True, ipc_dir)
+
+    # private copies add up, mapped pages are counted once across the workers
+    assert private_pss_8 > 6 * private_pss_1
+    assert shared_rss_8 > 6 * shared_rss_1
+    assert shared_pss_8 < 3 * shared_pss_1
+    assert shared_pss_8 < private_pss_8 / 4
@@ -0,0 +1,68 @@
+import os
+
+from src.scraper import VintedAdScraper
+from src.sink import ParquetSink, list_parts, read_parquet_sink
+from tests.conftest import make_session, read_fixture
+
+
+def make_records(ids):
+    return [(id_, {"ad_id": id_, "title": "Robe {}".format(id_)}) for id_ in ids]
+
+
+def get_part_names(path):
+    return [os.path.basename(part) for part in list_parts(path)]
+
+
+def test_reopened_sink_appends_new_parts(tmp_path):
+    path = str(tmp_path / "ads")
+    with ParquetSink(path, row_group_size=10) as sink:
+        sink.write_records(make_records(range(25)))
+    assert sink.n_parts == 3
+
+    flushed = []
+    sink = ParquetSink(
+        path, row_group_size=10, on_flush=lambda part, rows: flushed.append(rows)
+    )
+    assert (sink.n_parts, sink.rows_written) == (3, 25)
+    with sink:
+        sink.write_records(make_records(range(25, 37)))
+
+    assert get_part_names(path) == ["part-{:05d}.parquet".format(i) for i in range(5)]
+    assert flushed == [35, 37]
+    ads_df = read_parquet_sink(path)
+    assert list(ads_df["ad_id"]) == list(range(37))
+
+
+def test_truncate_drops_rows_after_the_first_n_rows(tmp_path):
+    path = str(tmp_path / "ads")
+    with ParquetSink(path, row_group_size=10) as sink:
+        sink.write_records(make_records(range(25)))
+        sink.truncate(15)
+        assert (sink.n_parts, sink.rows_written) == (2, 15)
+        # rewritten rows go to the parts following the kept ones
+        sink.write_records(make_records(range(15, 20)))
+
+    assert get_part_names(path) == ["part-{:05d}.parquet".format(i) for i in range(3)]
+    assert list(read_parquet_sink(path)["ad_id"]) == list(range(20))
+    assert (sink.n_parts, sink.rows_written) == (3, 20)
+
+
+def test_iter_ads_streams_ads_into_the_sink(stub_server, tmp_path):
+    ad_html = read_fixture("ad_page.html")
+    server = stub_server(lambda path, n_request: (200, {}, ad_html))
+    ads_ids = [11, 12, 13]
+    scraper = VintedAdScraper(
+        ["{}/items/{}".format(server.url, id_) for id_ in ads_ids],
+        ads_ids,
+        session=make_session(),
+    )
+    path = str(tmp_path / "ads")
+
+    with ParquetSink(path, row_group_size=2) as sink:
+        sink.write_records(scraper.iter_ads())
+
+    assert get_part_names(path) == ["part-00000.parquet", "part-00001.parquet"]
+    ads_df = read_parquet_sink(path)
+    assert list(ads_df.index) == ads_ids
+    assert ads_df["ad_title"].nunique() == 1
+    assert server.n_requests == 3
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+import app
+from src.text_index import TextIndex
+
+
+def make_ads_df(index):
+    return pd.DataFrame(
+        {
+            "ad_id": [11, 12, 13, 14],
+            "ad_title": ["Robe Zara", "Jean Levi's", "Robe longue", "Pull"],
+            "ad_description": ["Robe fleurie", "Jean droit", "Robe d'été", "Laine"],
+        },
+        index=index,
+    )
+
+
+def test_documents_are_row_positions_with_duplicate_index_labels():
+    text_index = TextIndex.build(make_ads_df([0, 1, 0, 1]))
+
+    positions, _ = text_index.search("robe")
+    assert sorted(positions) == [0, 2]
+    positions, _ = text_index.search("jean")
+    assert list(positions) == [1]
+    assert len(text_index.doc_lengths) == 4
+    assert list(text_index.ad_ids) == ["11", "12", "13", "14"]
+
+
+def test_saved_index_of_other_ads_is_rebuilt(tmp_path, monkeypatch):
+    ads_df = make_ads_df(range(4))
+    text_index_path = str(tmp_path / "ads_text_index.npz")
+    monkeypatch.setattr(app, "TEXT_INDEX_PATH", text_index_path)
+    TextIndex.build(ads_df.iloc[::-1]).save(text_index_path)
+
+    text_index = app.get_text_index(ads_df)
+
+    assert list(text_index.ad_ids) == ["11", "12", "13", "14"]
+    positions, _ = text_index.search("jean")
+    assert list(positions) == [1]
+
+    TextIndex.build(ads_df).save(text_index_path)
+    saved = app.get_text_index(ads_df)
+    assert np.array_equal(saved.postings, text_index.postings)
@@ -0,0 +1,90 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.session import VintedSession
+from src.throttling import AimdLimiter, RequestController, RequestFailed
+
+OK = (200, {"Content-Type": "text/html"}, b"<html></html>")
+
+
+def throttle_first(n_throttled, retry_after="0"):
+    def respond(path, n_request):
+        if n_request <= n_throttled:
+            return 429, {"Retry-After": retry_after}, b""
+        return OK
+
+    return respond
+
+
+def make_session(limiter=None, max_retries=5):
+    controller = RequestController(
+        max_retries=max_retries, backoff_base=0.01, limiter=limiter
+    )
+    return VintedSession(pool_maxsize=8, controller=controller)
+
+
+def test_waits_for_retry_after(stub_server):
+    server = stub_server(throttle_first(1, retry_after="1"))
+    session = make_session()
+
+    start = time.perf_counter()
+    response = session.get(server.url + "/items/1")
+
+    assert response.status_code == 200
+    assert time.perf_counter() - start >= 1
+    assert session.stats()["retries"] == 1
+    assert session.stats()["throttled"] == 1
+
+
+def test_gives_up_after_max_retries(stub_server):
+    server = stub_server(throttle_first(10))
+    session = make_session(max_retries=2)
+
+    with pytest.raises(RequestFailed) as error:
+        session.get(server.url + "/items/1")
+
+    assert error.value.response.status_code == 429
+    assert server.n_requests == 3
+
+
+def test_burst_of_429_decreases_the_limit_once(stub_server):
+    server = stub_server(throttle_first(8), latency=0.05)
+    limiter = AimdLimiter(initial=8)
+    session = make_session(limiter)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        urls = ["{}/items/{}".format(server.url, i) for i in range(8)]
+        responses = list(executor.map(session.get, urls))
+
+    assert [response.status_code for response in responses] == [200] * 8
+    assert session.stats()["throttled"] == 8
+    assert session.stats()["retries"] == 8
+    assert limiter.decreases == 1
+    assert 4 <= limiter.limit < 8
+
+
+def test_limiter_decreases_again_in_a_new_window():
+    limiter = AimdLimiter(initial=8)
+    with limiter as first_ticket:
+        pass
+    assert limiter.on_throttle(first_ticket)
+    assert not limiter.on_throttle(first_ticket)
+
+    with limiter as next_ticket:
+        pass
+    assert limiter.on_throttle(next_ticket)
+    assert limiter.limit == 2
+    assert limiter.decreases == 2
+
+
+def test_limiter_grows_additively_on_success():
+    limiter = AimdLimiter(initial=4, max_limit=5)
+    for _ in range(4):
+        limiter.on_success()
+    assert 4.9 < limiter.limit <= 5
+
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.limit == 5